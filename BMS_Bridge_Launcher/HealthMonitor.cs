@@ -1,5 +1,6 @@
 // HealthMonitor.cs - Extracted health monitoring logic
 using System;
+using System.Net;
 using System.Net.Http;
 using System.Threading.Tasks;
 using System.Windows.Forms;
@@ -12,6 +13,7 @@ namespace BMS_Bridge_Launcher
         private readonly HttpClient httpClient;
         private readonly Timer pollTimer;
         private readonly string healthEndpoint;
+        private string lastETag;
         
         public event EventHandler<ServerHealthState> HealthUpdated;
         public event EventHandler<string> ErrorOccurred;
@@ -53,12 +55,22 @@ namespace BMS_Bridge_Launcher
         {
             try
             {
-                var response = await httpClient.GetAsync(healthEndpoint);
+                var request = new HttpRequestMessage(HttpMethod.Get, healthEndpoint);
+                // The server answers 304 Not Modified while the health state is unchanged.
+                if (lastETag != null)
+                    request.Headers.TryAddWithoutValidation("If-None-Match", lastETag);
+
+                var response = await httpClient.SendAsync(request);
                 
-                if (response.IsSuccessStatusCode)
+                if (response.StatusCode == HttpStatusCode.NotModified && lastETag != null)
+                {
+                    OnHealthUpdated(LastKnownState);
+                }
+                else if (response.IsSuccessStatusCode)
                 {
                     string json = await response.Content.ReadAsStringAsync();
                     var healthState = JsonConvert.DeserializeObject<ServerHealthState>(json);
+                    lastETag = response.Headers.ETag?.ToString();
                     
                     LastKnownState = healthState;
                     OnHealthUpdated(healthState);
@@ -71,12 +83,15 @@ namespace BMS_Bridge_Launcher
                         server_message = $"API returned status {response.StatusCode}" 
                     };
                     
+                    lastETag = null;
                     LastKnownState = errorState;
                     OnHealthUpdated(errorState);
                 }
             }
             catch (HttpRequestException ex)
             {
+                // The server may have restarted; do not revalidate against a stale ETag.
+                lastETag = null;
                 // Connection failed - this is expected during startup
                 OnErrorOccurred($"Health check failed: {ex.Message}");
             }
@@ -102,6 +117,8 @@ namespace BMS_Bridge_Launcher
         /// </summary>
         public void ManuallySetState(ServerHealthState newState)
         {
+            // LastKnownState no longer matches the server's body, so the next poll must fetch it in full.
+            lastETag = null;
             LastKnownState = newState;
             // We also fire the event to ensure the UI updates through the standard pipeline.
             OnHealthUpdated(newState);
@@ -5,12 +5,13 @@ import platform
 import struct
 import threading
 import time
-from typing import Dict, Any, Optional
+from typing import AbstractSet, Dict, Any, List, Mapping, NamedTuple, Optional, Tuple
 from enum import Enum
 import logging
 
 import psutil
-from falcon_memreader import FlightData, FlightData2, StringData
+from falcon_memreader import DrawingData, FlightData, FlightData2, IntellivibeData, OSBData, StringData
+from adapters.struct_decoder import StructDecoder
 
 logger = logging.getLogger(__name__)
 
@@ -66,10 +67,10 @@ class CircuitBreaker:
                 self.state = CircuitBreakerState.OPEN
                 logger.warning(f"Circuit breaker is now OPEN after {self.failure_count} failures.")
 
-# --- 2. Class for data conversion (remains unchanged) ---
+# --- 2. Class for data conversion (reference implementation, superseded by StructDecoder) ---
 
 class BMSDataConverter:
-    # This class remains the same as in our last working version
+    # Kept as the reference for StructDecoder's output and for the decoder benchmark
     @staticmethod
     def convert_value(value: Any) -> Any:
         if isinstance(value, ctypes.Array):
@@ -97,17 +98,62 @@ class BMSDataConverter:
 
 # --- 3. Main adapter class with the Circuit Breaker ---
 
+class FlightSnapshot(NamedTuple):
+    """
+    One consistent copy of FlightData + FlightData2 (and of the extra areas asked for) with the StringData taken at
+    the same time. Never modified once taken, so any thread may decode or keep it without the read lock.
+    """
+    seq: int                        # Counts the snapshots taken by one adapter
+    taken_at: float                 # time.monotonic()
+    sampled_at: float               # time.time() of the same instant, for clients
+    raw: bytes                      # FlightData + FlightData2
+    extra_raw: Mapping[str, bytes]  # Extra area name -> copy
+    strings: Optional[Dict[str, str]]  # None if StringData was not readable
+    strings_raw: Optional[bytes]    # The used part of the StringData area; the same object until StringAreaTime changes
+
 class BMSAdapter:
     BMS_EXECUTABLE = "Falcon BMS.exe"
+    MAX_SUBSET_DECODERS = 32
+    _STRING_HEADER = struct.Struct("<3I")  # VersionNum, NoOfStrings, dataSize
+    _STRING_ENTRY = struct.Struct("<2I")   # strId, strLength (the string and a NUL follow)
+    _STRING_AREA_TIME = struct.Struct("<I")
+    _DRAWING_LENGTH = struct.Struct("<I")  # VersionNum, then before each command string its length (a NUL follows)
+    # Optional areas, each published as one nested field. They are mapped on first use and only decoded
+    # while some client subscribes to them by name; a plain "everything" subscription does not include them.
+    EXTRA_AREAS = {"osb": (OSBData.name, ctypes.sizeof(OSBData)), "intellivibe": (IntellivibeData.name, ctypes.sizeof(IntellivibeData)),
+                   "drawing": (DrawingData.name, DrawingData.area_size_max)}
+    EXTRA_AREA_RETRY = 5.0  # An area that is not there (older BMS, not in 3D) is looked for again this often
+    COPY_RETRIES = 3  # Attempts at a copy that BMS did not write to meanwhile
 
     def __init__(self, failure_threshold: int, reset_timeout: int):
         self.flight_data_area: Optional[mmap.mmap] = None
         self.flight_data_2_area: Optional[mmap.mmap] = None
         self.string_data_area: Optional[mmap.mmap] = None
         self._is_connected = False
-        self.converter = BMSDataConverter()
+        # Decoders are compiled once per layout and read straight from the mmap.
+        self.flight_data_decoder = StructDecoder(FlightData)
+        self.flight_data_2_decoder = StructDecoder(FlightData2)
+        self._subset_decoders: Dict[AbstractSet[str], Tuple[StructDecoder, StructDecoder]] = {}
+        self._extra_decoders = {"osb": StructDecoder(OSBData), "intellivibe": StructDecoder(IntellivibeData)}
+        self._extra_areas: Dict[str, mmap.mmap] = {}
+        self._extra_retry_at: Dict[str, float] = {}
+        # StringData (copied and decoded) and the FlightData2.StringAreaTime it was read at; the strings rarely change.
+        self._strings: Optional[Dict[str, str]] = None
+        self._strings_raw: Optional[bytes] = None
+        self._strings_time: Optional[int] = None
         self.circuit_breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = None  # services.metrics.PipelineMetrics, set by the app to time reads and decodes
         self._process_check_cache = {'running': False, 'time': 0}
+        # Copying out of the mmaps (and connect/close) is serialized; decoding a snapshot needs no lock.
+        self._read_lock = threading.Lock()
+        # Newest snapshot. Only the sampler's tick takes snapshots; everyone else reads this one. It is replaced by a
+        # single reference assignment, so readers see either the old or the new one, never one half built, and need
+        # no lock (see latest_snapshot).
+        self._snapshot: Optional[FlightSnapshot] = None
+        self._snapshot_seq = 0
+        self.torn_reads = 0     # Copies that changed while they were taken, and were taken again
+        self.torn_accepted = 0  # ...and those still changing after COPY_RETRIES attempts, used anyway
+        self.torn_dropped = 0   # DrawingData copies whose lengths never agreed, left out of the snapshot
 
     def is_bms_process_running(self) -> bool:
         """Checks if the BMS process is running, with a 5-second cache for the result."""
@@ -146,71 +192,250 @@ class BMSAdapter:
     def is_connected(self) -> bool:
         return self._is_connected
 
+    def field_names(self) -> List[str]:
+        """Names of all FlightData/FlightData2 fields published by get_all_data."""
+        return self.flight_data_decoder.fields + self.flight_data_2_decoder.fields
+
+    def field_specs(self) -> Dict[str, Tuple[str, List[int]]]:
+        return published_field_specs(self.flight_data_decoder, self.flight_data_2_decoder)
+
+    def _decoders_for(self, fields: Optional[AbstractSet[str]]) -> Tuple[StructDecoder, StructDecoder]:
+        """Returns the decoders for a field subset, compiling them on first use."""
+        if fields is None: return self.flight_data_decoder, self.flight_data_2_decoder
+        decoders = self._subset_decoders.get(fields)
+        if decoders is None:
+            if len(self._subset_decoders) >= self.MAX_SUBSET_DECODERS: self._subset_decoders.clear()
+            decoders = self._subset_decoders[fields] = (StructDecoder(FlightData, fields=fields), StructDecoder(FlightData2, fields=fields))
+        return decoders
+
     def close(self):
-        for area in [self.flight_data_area, self.flight_data_2_area, self.string_data_area]:
+        for area in [self.flight_data_area, self.flight_data_2_area, self.string_data_area, *self._extra_areas.values()]:
             if area and not area.closed: area.close()
+        self._extra_areas.clear()
+        self._extra_retry_at.clear()
+        self._strings = self._strings_raw = None
+        self._snapshot = None
         self._is_connected = False
         logger.info("BMS Shared Memory connection closed.")
 
 
-    def _read_string_data(self) -> Optional[Dict[str, str]]:
+    def _copy_consistent(self, area: mmap.mmap, end: Optional[int] = None) -> bytes:
+        """
+        Copies area[:end] and compares it with the area once more. BMS writes without any lock, so a difference means it
+        wrote during the copy, which may then mix two frames (a torn read); the copy is taken again.
+        """
+        for _ in range(self.COPY_RETRIES):
+            copy = area[:end]
+            if area[:end] == copy: return copy  # A second slice and a memcmp: far cheaper than comparing through a memoryview
+            self.torn_reads += 1
+        self.torn_accepted += 1
+        return area[:end]
+
+    def _string_area_length(self, area) -> int:
+        """Bytes of StringData in use (in the area or a copy of it): the header, then per string its id, length, bytes and NUL."""
+        _, num_strings, _ = self._STRING_HEADER.unpack(area[:self._STRING_HEADER.size])
+        end = self._STRING_HEADER.size
+        for _ in range(num_strings):
+            if end + self._STRING_ENTRY.size > len(area): return len(area) + 1  # Runs past it: torn, or not StringData at all
+            end += self._STRING_ENTRY.size + self._STRING_ENTRY.unpack(area[end:end + self._STRING_ENTRY.size])[1] + 1
+        return end
+
+    def _copy_string_area(self) -> bytes:
+        """A consistent copy of the used part of StringData. A copy whose own lengths disagree with the length it was taken at is torn too."""
+        area = self.string_data_area
+        for _ in range(self.COPY_RETRIES):
+            end = min(self._string_area_length(area), len(area))
+            copy = self._copy_consistent(area, end)
+            if self._string_area_length(copy) == end: return copy
+            self.torn_reads += 1
+        self.torn_accepted += 1
+        return copy
+
+    def _drawing_area_length(self, area) -> int:
+        """Bytes of DrawingData in use (in the area or a copy of it): the version, then per command string its length, bytes and NUL."""
+        end = self._DRAWING_LENGTH.size
+        for _ in DrawingData.id:
+            if end + self._DRAWING_LENGTH.size > len(area): return len(area) + 1  # Runs past it: torn
+            end += self._DRAWING_LENGTH.size + self._DRAWING_LENGTH.unpack(area[end:end + self._DRAWING_LENGTH.size])[0] + 1
+        return end
+
+    def _copy_drawing_area(self, area: mmap.mmap) -> Optional[bytes]:
+        """
+        A consistent copy of the used part of DrawingData, checked like _copy_string_area. None if no copy's lengths
+        agree within COPY_RETRIES: a truncated drawing is not published, the snapshot goes without it.
+        """
+        for _ in range(self.COPY_RETRIES):
+            end = self._drawing_area_length(area)
+            if end <= len(area):
+                copy = self._copy_consistent(area, end)
+                if self._drawing_area_length(copy) == end: return copy
+            self.torn_reads += 1
+        self.torn_dropped += 1
+        return None
+
+    def _read_string_data(self, area_time: int) -> Tuple[Optional[bytes], Optional[Dict[str, str]]]:
+        """
+        Copies and decodes the StringData area, or returns the previous (copy, strings) if FlightData2.StringAreaTime
+        (`area_time`) has not changed.
+        """
         if not self.string_data_area or self.string_data_area.closed:
-            return None
+            return None, None
+
+        if self._strings is not None and area_time == self._strings_time:
+            return self._strings_raw, self._strings
 
         try:
-            self.string_data_area.seek(0)
-            
-            version_num = struct.unpack('I', self.string_data_area.read(4))[0]
-            num_strings = struct.unpack('I', self.string_data_area.read(4))[0]
-            data_size = struct.unpack('I', self.string_data_area.read(4))[0]
-            
+            raw = self._copy_string_area()
+            _, num_strings, _ = self._STRING_HEADER.unpack_from(raw, 0)
             strings = {}
-            for key in StringData.id:
-                str_id = struct.unpack('I', self.string_data_area.read(4))[0]
-                str_length = struct.unpack('I', self.string_data_area.read(4))[0]
-                str_data = self.string_data_area.read(str_length + 1).decode('utf-8', errors='ignore').rstrip('\x00')
-                strings[key] = str_data
-                
-            return strings
+            offset = self._STRING_HEADER.size
+            for key, _ in zip(StringData.id, range(num_strings)):
+                str_id, str_length = self._STRING_ENTRY.unpack_from(raw, offset)
+                offset += self._STRING_ENTRY.size
+                strings[key] = raw[offset:offset + str_length].decode('utf-8', errors='ignore').rstrip('\x00')
+                offset += str_length + 1  # Each string is stored with its NUL terminator
         except struct.error:
             logger.warning("Failed to unpack StringData, memory layout might have changed.")
             self.close()
+            return None, None
+
+        self._strings_raw, self._strings, self._strings_time = raw, strings, area_time
+        return raw, strings
+
+    def _extra_area(self, name: str) -> Optional[mmap.mmap]:
+        """The mapped extra area, opening it on first use; None if BMS does not provide it (retried later)."""
+        area = self._extra_areas.get(name)
+        if area is not None and not area.closed: return area
+        if time.monotonic() < self._extra_retry_at.get(name, 0.0): return None
+        tag_name, size = self.EXTRA_AREAS[name]
+        try:
+            area = self._extra_areas[name] = mmap.mmap(-1, size, tag_name, access=mmap.ACCESS_READ)
+            logger.info(f"Opened shared memory area {tag_name}.")
+            return area
+        except OSError as e:
+            logger.debug(f"Shared memory area {tag_name} not available: {e}")
+            self._extra_retry_at[name] = time.monotonic() + self.EXTRA_AREA_RETRY
             return None
 
-    def _get_all_data_internal(self) -> Dict[str, Any]:
-        """Internal method that reads the data."""
+    def _read_extra_areas(self, fields: Optional[AbstractSet[str]]) -> Dict[str, bytes]:
+        """Copies the subscribed extra areas. For the 1 MB drawing area only the part in use is copied."""
+        copies = {}
+        if fields is None: return copies
+        for name in self.EXTRA_AREAS.keys() & fields:
+            area = self._extra_area(name)
+            if area is None: continue
+            if name != "drawing":
+                copies[name] = self._copy_consistent(area)
+                continue
+            drawing = self._copy_drawing_area(area)
+            if drawing is not None: copies[name] = drawing
+        return copies
+
+    def _decode_extra_areas(self, copies: Dict[str, bytes]) -> Dict[str, Any]:
+        result = {}
+        for name, raw in copies.items():
+            try:
+                result[name] = decode_drawing(raw) if name == "drawing" else self._extra_decoders[name].decode(raw)
+            except struct.error:
+                logger.warning(f"Failed to unpack shared memory area {self.EXTRA_AREAS[name][0]}, memory layout might have changed.")
+        return result
+
+    def _take_snapshot_locked(self, fields: Optional[AbstractSet[str]]) -> FlightSnapshot:
+        """Copies the areas (and StringData, if it changed). Called with the read lock held."""
         if not self._is_connected:
             raise ConnectionError("Not connected to BMS Shared Memory.")
-        
+        started = time.perf_counter()
         try:
-            self.flight_data_area.seek(0)
-            self.flight_data_2_area.seek(0)
-            flight_data_struct = FlightData.from_buffer_copy(self.flight_data_area.read(ctypes.sizeof(FlightData)))
-            flight_data_2_struct = FlightData2.from_buffer_copy(self.flight_data_2_area.read(ctypes.sizeof(FlightData2)))
-            
-            dict1 = self.converter.convert_struct_to_dict(flight_data_struct)
-            dict2 = self.converter.convert_struct_to_dict(flight_data_2_struct)
-            dict3 = self._read_string_data()
-            if dict3 is None:
-                logger.debug("StringData shared memory area not available or failed to read.")
-                dict3 = {}
-            return {**dict1, **dict2, **dict3} 
+            raw = self._copy_consistent(self.flight_data_area) + self._copy_consistent(self.flight_data_2_area)
+            extra_raw = self._read_extra_areas(fields)
+            strings_raw, strings = self._read_string_data(self._STRING_AREA_TIME.unpack_from(raw, self.flight_data_decoder.size + FlightData2.StringAreaTime.offset)[0])
+            if self.metrics: self.metrics.read.observe(time.perf_counter() - started)
         except Exception as e:
             logger.warning(f"Failed to read from Shared Memory, closing connection: {e}")
             self.close()
             raise ConnectionError(f"Failed to read BMS data: {e}")
+        self._snapshot_seq += 1
+        snapshot = FlightSnapshot(self._snapshot_seq, time.monotonic(), time.time(), raw, extra_raw, strings, strings_raw)
+        self._snapshot = snapshot
+        return snapshot
 
-    def get_all_data(self) -> Optional[Dict[str, Any]]:
-        """Public method for getting data, protected by the Circuit Breaker."""
-        if not self._is_connected:
+    def take_snapshot(self, fields: Optional[AbstractSet[str]] = None) -> Optional[FlightSnapshot]:
+        """
+        Copies the current shared memory state into a new snapshot, or returns None while BMS is unavailable. `fields`
+        only decides which extra areas are copied. Only the copy holds the read lock; protected by the Circuit Breaker.
+        Blocking. Called by the sampler's tick only; other readers use latest_snapshot().
+        """
+        with self._read_lock:
+            if not self._is_connected:
+                try:
+                    self.connect()
+                except ConnectionError as e:
+                    logger.debug(f"Connection attempt failed: {e}")
+                    return None
             try:
-                self.connect()
+                return self.circuit_breaker.call(self._take_snapshot_locked, fields)
             except ConnectionError as e:
-                logger.debug(f"Connection attempt failed: {e}")
+                logger.debug(f"Data read failed: {e}")
                 return None
 
-        try:
-            return self.circuit_breaker.call(self._get_all_data_internal)
-        except ConnectionError as e:
-            logger.debug(f"Data read failed: {e}")
-            return None
\ No newline at end of file
+    def latest_snapshot(self) -> Optional[FlightSnapshot]:
+        """The newest snapshot any caller took (None after a disconnect). No lock and no shared memory read."""
+        return self._snapshot
+
+    def decode_snapshot(self, snapshot: FlightSnapshot, fields: Optional[AbstractSet[str]] = None) -> Dict[str, Any]:
+        """Decodes `fields` (None = everything but the extra areas) from a snapshot. Touches no shared memory, so takes no lock."""
+        started = time.perf_counter()
+        flight_data_decoder, flight_data_2_decoder = self._decoders_for(fields)
+        data = {**flight_data_decoder.decode(snapshot.raw), **flight_data_2_decoder.decode(snapshot.raw, flight_data_decoder.size)}
+        if fields is None or not fields.isdisjoint(StringData.id):
+            if snapshot.strings is None:
+                logger.debug("StringData shared memory area not available or failed to read.")
+            else:
+                data.update(snapshot.strings if fields is None else {key: value for key, value in snapshot.strings.items() if key in fields})
+        if fields is not None and snapshot.extra_raw:
+            data.update(self._decode_extra_areas({name: raw for name, raw in snapshot.extra_raw.items() if name in fields}))
+        if self.metrics: self.metrics.decode.observe(time.perf_counter() - started)
+        return data
+
+    def get_all_data(self, fields: Optional[AbstractSet[str]] = None) -> Optional[Dict[str, Any]]:
+        """A fresh snapshot, decoded; None while BMS is unavailable. Blocking; safe to call from any thread."""
+        snapshot = self.take_snapshot(fields)
+        return self.decode_snapshot(snapshot, fields) if snapshot else None
+
+    def decode_changed(self, snapshot: FlightSnapshot, fields: Optional[AbstractSet[str]], last_raw: Optional[bytes]) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+        """
+        Decodes a snapshot unless its FlightData + FlightData2 bytes (and those of the extra areas in `fields`) equal
+        `last_raw` (sim paused, or sampled faster than BMS updates). Returns (raw, data), data None when unchanged.
+        StringAreaTime is part of FlightData2, so string changes are caught too.
+        """
+        extras = [raw for name, raw in snapshot.extra_raw.items() if fields is not None and name in fields]
+        raw = b"".join((snapshot.raw, *extras)) if extras else snapshot.raw
+        if raw == last_raw: return raw, None
+        return raw, self.decode_snapshot(snapshot, fields)
+
+    def get_changed_data(self, fields: Optional[AbstractSet[str]], last_raw: Optional[bytes]) -> Tuple[Optional[bytes], Optional[Dict[str, Any]], float]:
+        """
+        take_snapshot + decode_changed. Returns (raw, data, sampled_at): raw is None when shared memory is unavailable,
+        data is None when raw is unchanged, and sampled_at is the Unix time of the copy.
+        """
+        snapshot = self.take_snapshot(fields)
+        if snapshot is None: return None, None, time.time()
+        return (*self.decode_changed(snapshot, fields, last_raw), snapshot.sampled_at)
+
+def published_field_specs(flight_data_decoder: StructDecoder, flight_data_2_decoder: StructDecoder) -> Dict[str, Tuple[str, List[int]]]:
+    """
+    Struct code and dimensions of every published field; StringData entries and the extra areas are JSON ("s").
+    A function rather than only BMSAdapter.field_specs, for server workers, which have no adapter.
+    """
+    return {**flight_data_decoder.specs, **flight_data_2_decoder.specs, **{key: ("s", []) for key in StringData.id},
+            **{name: ("s", []) for name in BMSAdapter.EXTRA_AREAS}}
+
+def decode_drawing(raw: bytes) -> Dict[str, str]:
+    """DrawingData command strings from a copy of the area (BMSAdapter's, or the one server workers get from the frame ring)."""
+    result, offset = {}, BMSAdapter._DRAWING_LENGTH.size
+    for key in DrawingData.id:
+        length = BMSAdapter._DRAWING_LENGTH.unpack_from(raw, offset)[0]
+        offset += BMSAdapter._DRAWING_LENGTH.size
+        result[key] = raw[offset:offset + length].decode('utf-8', errors='ignore').rstrip('\x00')
+        offset += length + 1
+    return result
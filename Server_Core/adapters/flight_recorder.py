@@ -0,0 +1,214 @@
+# File: adapters/flight_recorder.py
+import logging
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Capture file (.bmsrec):
+#   header  : magic, format version, FlightData size, FlightData2 size, chunk size, created (unix time)
+#   records : kind (u8), 3 pad bytes, payload length (u32), timestamp (f64, unix time), payload
+#             FRAME   = raw FlightData + FlightData2, exactly as in shared memory
+#             STRINGS = the used part of the StringData area; written when it changes and at the start of every file
+# The file grows in chunks through one writable mapping and is truncated to its content on close.
+#
+# Index (.bmsrec.idx), one fixed-size entry per frame, so frame N is at N * ENTRY.size:
+#   timestamp (f64), offset of the frame record, offset of the STRINGS record in effect (0 = none yet)
+FILE_MAGIC = b"BMSREC\x00\x01"
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct("<8sIIIId")
+RECORD_HEADER = struct.Struct("<B3xId")
+INDEX_ENTRY = struct.Struct("<dQQ")
+KIND_FRAME = 1
+KIND_STRINGS = 2
+EXTENSION = ".bmsrec"
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + ".idx")
+
+class CaptureWriter:
+    """
+    Appends records to one capture file. Records are packed straight into the mapping (pack_into plus slice
+    copies from the shared memory areas), and index entries collect in a preallocated buffer, so a frame
+    allocates nothing per call. Not thread-safe; BMSAdapter calls it under its read lock.
+    """
+    INDEX_BATCH = 256  # Index entries buffered before they are written out
+
+    def __init__(self, path: Path, flight_data_size: int, flight_data_2_size: int, chunk_size: int):
+        self.path = path
+        self.frame_size = flight_data_size + flight_data_2_size
+        self.chunk_size = chunk_size
+        self.frames = 0
+        self._file = open(path, "w+b")
+        self._file.truncate(chunk_size)
+        self._map = mmap.mmap(self._file.fileno(), chunk_size)
+        FILE_HEADER.pack_into(self._map, 0, FILE_MAGIC, FORMAT_VERSION, flight_data_size, flight_data_2_size, chunk_size, time.time())
+        self.position = FILE_HEADER.size
+        self._strings_offset = 0
+        self._index_file = open(index_path(path), "wb")
+        self._index_buffer = bytearray(INDEX_ENTRY.size * self.INDEX_BATCH)
+        self._index_used = 0
+
+    def _reserve(self, size: int):
+        """Grows the file (and the mapping) by whole chunks until `size` more bytes fit."""
+        if self.position + size <= len(self._map): return
+        new_size = len(self._map)
+        while self.position + size > new_size: new_size += self.chunk_size
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(new_size)
+        self._map = mmap.mmap(self._file.fileno(), new_size)
+
+    def append_strings(self, timestamp: float, strings: Buffer):
+        self._reserve(RECORD_HEADER.size + len(strings))
+        RECORD_HEADER.pack_into(self._map, self.position, KIND_STRINGS, len(strings), timestamp)
+        self._strings_offset = self.position
+        start = self.position + RECORD_HEADER.size
+        self._map[start:start + len(strings)] = strings
+        self.position = start + len(strings)
+
+    def append_frame(self, timestamp: float, flight_data: Buffer, flight_data_2: Buffer):
+        self._reserve(RECORD_HEADER.size + self.frame_size)
+        RECORD_HEADER.pack_into(self._map, self.position, KIND_FRAME, self.frame_size, timestamp)
+        start = self.position + RECORD_HEADER.size
+        middle = start + len(flight_data)
+        self._map[start:middle] = flight_data
+        self._map[middle:middle + len(flight_data_2)] = flight_data_2
+        INDEX_ENTRY.pack_into(self._index_buffer, self._index_used, timestamp, self.position, self._strings_offset)
+        self._index_used += INDEX_ENTRY.size
+        if self._index_used == len(self._index_buffer): self._flush_index()
+        self.position = start + self.frame_size
+        self.frames += 1
+
+    def _flush_index(self):
+        with memoryview(self._index_buffer) as view:
+            self._index_file.write(view[:self._index_used])
+        self._index_used = 0
+
+    def close(self):
+        if self._map.closed: return
+        self._flush_index()
+        self._index_file.close()
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self.position)
+        self._file.close()
+
+class FlightRecorder:
+    """
+    Recorder mode for BMSAdapter: writes frames into a directory of capture files and starts a new file once
+    the current one would exceed `max_file_size`. Every file begins with the StringData in effect, so each
+    one can be replayed on its own.
+    """
+    def __init__(self, directory: Path, flight_data_size: int, flight_data_2_size: int, max_file_size: int, chunk_size: int = 4 * 1024 * 1024):
+        self.directory = directory
+        self.flight_data_size = flight_data_size
+        self.flight_data_2_size = flight_data_2_size
+        self.max_file_size = max_file_size
+        self.chunk_size = min(chunk_size, max_file_size)
+        self.frames_recorded = 0
+        self.files_written = 0
+        self._writer: Optional[CaptureWriter] = None
+        self._strings: Optional[bytes] = None
+
+    @property
+    def current_file(self) -> Optional[Path]:
+        return self._writer.path if self._writer else None
+
+    def _open_next(self, timestamp: float):
+        if self._writer: self._writer.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
+        path = self.directory / f"session-{stamp}-{self.files_written:03d}{EXTENSION}"
+        self._writer = CaptureWriter(path, self.flight_data_size, self.flight_data_2_size, self.chunk_size)
+        self.files_written += 1
+        logger.info(f"Recording flight data to {path}.")
+        if self._strings is not None: self._writer.append_strings(timestamp, self._strings)
+
+    def record(self, flight_data: Buffer, flight_data_2: Buffer, strings: Optional[bytes] = None, timestamp: Optional[float] = None):
+        """Appends one frame, read at Unix time `timestamp` (default now); `strings` is the StringData content if it changed since the last call."""
+        timestamp = timestamp or time.time()
+        if strings is not None: self._strings = strings
+        needed = RECORD_HEADER.size * 2 + self.flight_data_size + self.flight_data_2_size + (len(strings) if strings is not None else 0)
+        if self._writer is None or (self._writer.frames and self._writer.position + needed > self.max_file_size):
+            self._open_next(timestamp)  # Writes the current strings itself
+        elif strings is not None:
+            self._writer.append_strings(timestamp, strings)
+        self._writer.append_frame(timestamp, flight_data, flight_data_2)
+        self.frames_recorded += 1
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+            logger.info(f"Closed recording {self._writer.path} ({self._writer.frames} frames).")
+            self._writer = None
+
+class CaptureReader:
+    """
+    Random access to a capture file: frame N is found through the index in O(1), a timestamp by binary search.
+    If the index is missing or shorter than the file (recording was killed), it is rebuilt by scanning the records.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.flight_data_size, self.flight_data_2_size, _, self.created = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != FILE_MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} flight recording.")
+        self.frame_size = self.flight_data_size + self.flight_data_2_size
+        self._index = self._load_index()
+        self.frame_count = len(self._index) // INDEX_ENTRY.size
+
+    def _load_index(self) -> bytes:
+        try:
+            index = index_path(self.path).read_bytes()
+        except OSError:
+            index = b""
+        index = index[:len(index) - len(index) % INDEX_ENTRY.size]
+        if index:
+            _, last_offset, _ = INDEX_ENTRY.unpack_from(index, len(index) - INDEX_ENTRY.size)
+            if last_offset + RECORD_HEADER.size + self.frame_size == len(self._map): return index  # Closed cleanly
+        logger.info(f"Rebuilding the frame index of {self.path}.")
+        return b"".join(INDEX_ENTRY.pack(timestamp, offset, strings_offset) for timestamp, offset, strings_offset in self._scan())
+
+    def _scan(self) -> Iterator[Tuple[float, int, int]]:
+        position, strings_offset = FILE_HEADER.size, 0
+        while position + RECORD_HEADER.size <= len(self._map):
+            kind, length, timestamp = RECORD_HEADER.unpack_from(self._map, position)
+            if kind not in (KIND_FRAME, KIND_STRINGS) or position + RECORD_HEADER.size + length > len(self._map): break  # Preallocated tail
+            if kind == KIND_STRINGS: strings_offset = position
+            else: yield timestamp, position, strings_offset
+            position += RECORD_HEADER.size + length
+
+    def timestamp(self, frame: int) -> float:
+        return INDEX_ENTRY.unpack_from(self._index, frame * INDEX_ENTRY.size)[0]
+
+    def find(self, timestamp: float) -> int:
+        """Index of the last frame recorded at or before `timestamp` (0 if it is before the first one)."""
+        low, high = 0, self.frame_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) <= timestamp: low = middle + 1
+            else: high = middle
+        return max(low - 1, 0)
+
+    def read(self, frame: int) -> Tuple[float, bytes, Optional[int]]:
+        """(timestamp, FlightData + FlightData2 bytes, offset of the StringData record in effect) of one frame."""
+        timestamp, offset, strings_offset = INDEX_ENTRY.unpack_from(self._index, frame * INDEX_ENTRY.size)
+        start = offset + RECORD_HEADER.size
+        return timestamp, self._map[start:start + self.frame_size], strings_offset or None
+
+    def read_strings(self, strings_offset: int) -> bytes:
+        _, length, _ = RECORD_HEADER.unpack_from(self._map, strings_offset)
+        start = strings_offset + RECORD_HEADER.size
+        return self._map[start:start + length]
+
+    def close(self):
+        if not self._map.closed: self._map.close()
+        self._file.close()
@@ -0,0 +1,210 @@
+# File: adapters/frame_ring.py
+import logging
+import marshal
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import AbstractSet, Any, Dict, FrozenSet, List, Optional, Tuple
+
+from adapters.bms_adapter import BMSAdapter, FlightSnapshot, decode_drawing, published_field_specs
+from adapters.struct_decoder import StructDecoder
+from falcon_memreader import FlightData, FlightData2, StringData
+
+logger = logging.getLogger(__name__)
+
+# Frame ring (one named shared memory block, written by the publisher process only):
+#   header : magic, slot count, slot capacity, head = number of the last complete frame (u64),
+#            publisher heartbeat (f64, unix time), BMS connected (u8), then per extra area (BMSAdapter.EXTRA_AREAS,
+#            in that order) the unix time until which some worker wants it (f64)
+#   slots  : frame N lives in slot N % slot count: seq (u64), sampled_at (f64), payload length (u32), payload
+#   payload: length of the flight data (u32), drawing present (u8), the marshalled flight data (with the wanted
+#            OSB and Intellivibe areas decoded), then the raw DrawingData copy (see pack_frame)
+# Each slot is a seqlock: its seq is 2N - 1 while frame N is being written and 2N once it is complete. A reader
+# copies the payload and checks the seq again, so a copy the publisher overwrote meanwhile is detected and retried.
+# With several slots that only happens to a reader a whole ring behind, never to one reading the newest frame.
+RING_MAGIC = b"BMSRING3"
+WANTED_AREAS = tuple(BMSAdapter.EXTRA_AREAS)
+RING_HEADER = struct.Struct(f"<8sIIQdB7x{len(WANTED_AREAS)}d")
+SLOT_HEADER = struct.Struct("<QdI4x")
+FRAME_HEADER = struct.Struct("<IB3x")
+_U64 = struct.Struct("<Q")
+_WANTED = struct.Struct(f"<{len(WANTED_AREAS)}d")
+_STATUS = struct.Struct("<dB")
+_HEAD_OFFSET = 16
+_STATUS_OFFSET = 24
+_WANTED_OFFSET = 40
+
+def pack_frame(data: bytes, drawing: Optional[bytes]) -> bytes:
+    """A ring payload: marshalled flight data plus, while a worker wants it, the DrawingData area as BMS wrote it."""
+    return FRAME_HEADER.pack(len(data), drawing is not None) + data + (drawing or b"")
+
+def unpack_frame(payload: bytes) -> Tuple[bytes, Optional[bytes]]:
+    length, has_drawing = FRAME_HEADER.unpack_from(payload, 0)
+    start = FRAME_HEADER.size
+    return payload[start:start + length], payload[start + length:] if has_drawing else None
+
+class FrameRing:
+    """
+    A ring of fixed-size frame slots in named shared memory. The server's main process creates it (and unlinks it
+    when done); the publisher process and the server workers attach to it by name. Only the publisher writes.
+    """
+    READ_RETRIES = 8
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        magic, self.slot_count, self.slot_size, *_ = RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != RING_MAGIC:
+            self.close()
+            raise ValueError(f"Shared memory block {self.name} is not a frame ring.")
+        self.head = self.newest_frame()
+        self.torn_reads = 0  # Copies discarded because the slot was rewritten while being read
+
+    @classmethod
+    def create(cls, slot_count: int, slot_size: int) -> "FrameRing":
+        shm = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + slot_count * (SLOT_HEADER.size + slot_size))
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, slot_count, slot_size, 0, 0.0, 0, *(0.0 for _ in WANTED_AREAS))
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        # The publisher and the workers are children of the creating process and share its resource tracker,
+        # so attaching does not hand the block's lifetime to them; the creator's close() unlinks it.
+        return cls(shm=shared_memory.SharedMemory(name=name), owner=False)
+
+    def newest_frame(self) -> int:
+        return _U64.unpack_from(self._shm.buf, _HEAD_OFFSET)[0]
+
+    def _slot_offset(self, frame: int) -> int:
+        return RING_HEADER.size + (frame % self.slot_count) * (SLOT_HEADER.size + self.slot_size)
+
+    def publish(self, payload: bytes, sampled_at: float) -> int:
+        """Writes the next frame and makes it the newest. Returns its number."""
+        if len(payload) > self.slot_size:
+            raise ValueError(f"Frame of {len(payload)} bytes does not fit a {self.slot_size} byte ring slot.")
+        frame = self.head + 1
+        offset, buf = self._slot_offset(frame), self._shm.buf
+        SLOT_HEADER.pack_into(buf, offset, 2 * frame - 1, sampled_at, len(payload))  # Odd seq: readers of this slot retry
+        start = offset + SLOT_HEADER.size
+        buf[start:start + len(payload)] = payload
+        _U64.pack_into(buf, offset, 2 * frame)
+        _U64.pack_into(buf, _HEAD_OFFSET, frame)
+        self.head = frame
+        return frame
+
+    def set_status(self, connected: bool):
+        """Publisher heartbeat, written every tick whether or not a frame was published."""
+        _STATUS.pack_into(self._shm.buf, _STATUS_OFFSET, time.time(), int(connected))
+
+    def status(self) -> Tuple[float, bool]:
+        """(last publisher heartbeat, BMS connected)."""
+        heartbeat, connected = _STATUS.unpack_from(self._shm.buf, _STATUS_OFFSET)
+        return heartbeat, bool(connected)
+
+    def want_areas(self, areas: AbstractSet[str], seconds: float):
+        """Worker side: asks the publisher to include the extra `areas` for the next `seconds`. The last worker to ask wins, so keep asking."""
+        until, now = list(_WANTED.unpack_from(self._shm.buf, _WANTED_OFFSET)), time.time()
+        for index, name in enumerate(WANTED_AREAS):
+            if name in areas: until[index] = now + seconds
+        _WANTED.pack_into(self._shm.buf, _WANTED_OFFSET, *until)
+
+    def wanted_areas(self) -> FrozenSet[str]:
+        """Publisher side: the extra areas some worker's clients subscribe to."""
+        now = time.time()
+        return frozenset(name for name, until in zip(WANTED_AREAS, _WANTED.unpack_from(self._shm.buf, _WANTED_OFFSET)) if until > now)
+
+    def read_latest(self, after: int = 0) -> Optional[Tuple[int, float, bytes]]:
+        """(frame number, sampled_at, payload) of the newest frame, or None if there is none newer than `after`."""
+        buf = self._shm.buf
+        for _ in range(self.READ_RETRIES):
+            frame = self.newest_frame()
+            if frame == 0 or frame == after: return None
+            offset = self._slot_offset(frame)
+            seq, sampled_at, length = SLOT_HEADER.unpack_from(buf, offset)
+            if seq == 2 * frame:
+                start = offset + SLOT_HEADER.size
+                payload = bytes(buf[start:start + min(length, self.slot_size)])
+                if _U64.unpack_from(buf, offset)[0] == seq: return frame, sampled_at, payload
+            self.torn_reads += 1  # Overwritten before or while it was copied; the head has moved on
+        return None
+
+    def close(self):
+        self._shm.close()
+        if self.owner: self._shm.unlink()
+
+class RingFrameSource:
+    """
+    Server worker side of the ring: stands in for BMSAdapter (take_snapshot, decode_changed, latest_snapshot,
+    field_names, field_specs), serving the frames the publisher decoded; a worker never opens BMS shared memory.
+    A snapshot's raw bytes are the marshalled flight data, unmarshalled once when they change; each sampler read only
+    picks its subscribed fields out of it. The extra areas are only there while some worker asks for them (see
+    FrameRing.want_areas): OSB and Intellivibe decoded among the flight data, the drawing area raw as the snapshot's
+    extra area, decoded here for the clients that subscribe to it.
+    """
+    STALE_AFTER = 3.0  # Seconds without a publisher heartbeat before BMS counts as unavailable
+    AREA_REQUEST_TTL = 2.0  # The publisher drops an extra area this long after the last worker asked for it
+
+    def __init__(self, ring: FrameRing):
+        self.ring = ring
+        flight_data_decoder, flight_data_2_decoder = StructDecoder(FlightData), StructDecoder(FlightData2)
+        self._field_names = flight_data_decoder.fields + flight_data_2_decoder.fields
+        self._field_specs = published_field_specs(flight_data_decoder, flight_data_2_decoder)
+        self.frame = 0
+        self._snapshot: Optional[FlightSnapshot] = None
+        self._data: Optional[Dict[str, Any]] = None  # Unmarshalled payload of self._snapshot
+
+    def field_names(self) -> List[str]:
+        return self._field_names
+
+    def field_specs(self) -> Dict[str, Tuple[str, List[int]]]:
+        return self._field_specs
+
+    def _publisher_alive(self) -> bool:
+        heartbeat, connected = self.ring.status()
+        return connected and time.time() - heartbeat < self.STALE_AFTER
+
+    def take_snapshot(self, fields: Optional[AbstractSet[str]] = None) -> Optional[FlightSnapshot]:
+        """
+        The newest frame as a snapshot (sampled_at is the publisher's read time); None while BMS is unavailable.
+        Asking for an extra area in `fields` keeps the publisher including it.
+        """
+        wanted = BMSAdapter.EXTRA_AREAS.keys() & fields if fields else None
+        if wanted: self.ring.want_areas(wanted, self.AREA_REQUEST_TTL)
+        if not self._publisher_alive(): return None
+        latest = self.ring.read_latest(self.frame)
+        if latest is not None:
+            self.frame, sampled_at, payload = latest
+            raw, drawing = unpack_frame(payload)
+            previous = self._snapshot
+            if previous is None or raw != previous.raw:  # Only the drawing area may have changed
+                self._data = marshal.loads(raw)
+                strings = {key: self._data[key] for key in StringData.id if key in self._data}
+            else:
+                strings = previous.strings
+            self._snapshot = FlightSnapshot(self.frame, time.monotonic(), sampled_at, raw, {"drawing": drawing} if drawing is not None else {}, strings, None)
+        return self._snapshot
+
+    def latest_snapshot(self) -> Optional[FlightSnapshot]:
+        return self._snapshot
+
+    def decode_changed(self, snapshot: FlightSnapshot, fields: Optional[AbstractSet[str]], last_raw: Optional[bytes]) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+        """Same contract as BMSAdapter.decode_changed, for the snapshot take_snapshot returned last."""
+        drawing = snapshot.extra_raw.get("drawing") if fields is not None and "drawing" in fields else None
+        raw = snapshot.raw + drawing if drawing is not None else snapshot.raw
+        if raw == last_raw: return raw, None
+        if fields is None:  # Everything but the extra areas, as from BMSAdapter
+            data = {key: value for key, value in self._data.items() if key not in BMSAdapter.EXTRA_AREAS}
+        else:
+            data = {key: value for key, value in self._data.items() if key in fields}
+        if drawing is not None:
+            try:
+                data["drawing"] = decode_drawing(drawing)
+            except struct.error:
+                logger.warning("Failed to unpack the drawing area from the frame ring.")
+        return raw, data
+
+    def stats(self) -> Dict[str, Any]:
+        heartbeat, connected = self.ring.status()
+        return {"ring": self.ring.name, "frame": self.frame, "publisher_head": self.ring.newest_frame(), "torn_reads": self.ring.torn_reads,
+                "bms_connected": connected, "heartbeat_age": round(time.time() - heartbeat, 3) if heartbeat else None}
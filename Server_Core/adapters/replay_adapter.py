@@ -0,0 +1,151 @@
+# File: adapters/replay_adapter.py
+import bisect
+import ctypes
+import logging
+import mmap
+import time
+from pathlib import Path
+from typing import AbstractSet, Any, Dict, List, Optional, Tuple
+
+from adapters.bms_adapter import BMSAdapter, FlightSnapshot
+from adapters.flight_recorder import EXTENSION, CaptureReader
+from falcon_memreader import FlightData, FlightData2, StringData
+
+logger = logging.getLogger(__name__)
+
+class ReplayAdapter(BMSAdapter):
+    """
+    Serves a recording (one .bmsrec file, or a directory of rotated ones played in order) as if BMS were running.
+    The recorded frames are copied into anonymous mappings that stand in for the shared memory areas, so all of
+    BMSAdapter's reading and decoding runs unchanged, on any platform.
+
+    `speed` is the playback rate (1 = real time); 0 plays as fast as the server reads: one frame per snapshot.
+    At the end the replay starts over if `loop` is set, otherwise it holds the last frame, like a paused sim.
+    """
+    def __init__(self, path: Path, speed: float = 1.0, loop: bool = True, start: float = 0.0, failure_threshold: int = 5, reset_timeout: int = 60):
+        super().__init__(failure_threshold, reset_timeout)
+        self.path = path
+        self.speed = max(speed, 0.0)
+        self.loop = loop
+        self._start_offset = start
+        self._readers: List[CaptureReader] = []
+        self._first_frames: List[int] = []  # Global number of each file's first frame
+        self._file_starts: List[float] = []  # Timestamp of each file's first frame
+        self.frame_count = 0
+        self.frame = -1  # Frame currently in the areas
+        self._unserved = False  # The frame was loaded by a connect or seek and no snapshot has been taken of it yet
+        self._strings_key: Optional[Tuple[int, int]] = None  # (file, record offset) of the StringData currently loaded
+        self._clock_origin = 0.0  # Monotonic time at which playback was at _position_origin
+        self._position_origin = 0.0
+        self.loops = 0
+
+    def is_bms_process_running(self) -> bool:
+        return True
+
+    def _open_readers(self):
+        files = sorted(self.path.glob(f"*{EXTENSION}")) if self.path.is_dir() else [self.path]
+        if not files: raise ConnectionError(f"No recordings ({EXTENSION}) found in {self.path}")
+        try:
+            readers = [CaptureReader(file) for file in files]
+        except (OSError, ValueError) as e:
+            raise ConnectionError(f"Cannot open recording: {e}")
+        self._readers = [reader for reader in readers if reader.frame_count]
+        if not self._readers: raise ConnectionError(f"Recording {self.path} contains no frames")
+        self._first_frames, total = [], 0
+        for reader in self._readers:
+            self._first_frames.append(total)
+            total += reader.frame_count
+        self.frame_count = total
+        self._file_starts = [reader.timestamp(0) for reader in self._readers]
+        logger.info(f"Replaying {total} frames ({self.duration():.0f} s) from {len(self._readers)} file(s) in {self.path}, speed {self.speed or 'max'}.")
+
+    def _connect_internal(self):
+        if not self._readers: self._open_readers()
+        self.flight_data_area = mmap.mmap(-1, ctypes.sizeof(FlightData))
+        self.flight_data_2_area = mmap.mmap(-1, ctypes.sizeof(FlightData2))
+        self.string_data_area = mmap.mmap(-1, StringData.area_size_max)
+        self._strings_key = None
+        self.frame = -1
+        self._is_connected = True
+        self._seek_locked(self._start_offset)  # connect() already runs under the read lock
+
+    def _extra_area(self, name: str) -> Optional[mmap.mmap]:
+        return None  # Not part of recordings
+
+    def _locate(self, frame: int) -> Tuple[CaptureReader, int, int]:
+        file = bisect.bisect_right(self._first_frames, frame) - 1
+        return self._readers[file], frame - self._first_frames[file], file
+
+    def _timestamp(self, frame: int) -> float:
+        reader, local, _ = self._locate(frame)
+        return reader.timestamp(local)
+
+    def duration(self) -> float:
+        """Recorded seconds from the first to the last frame (gaps between files included)."""
+        return self._timestamp(self.frame_count - 1) - self._timestamp(0) if self.frame_count else 0.0
+
+    def seek(self, seconds: float):
+        """Continues playback from `seconds` after the first frame."""
+        with self._read_lock:
+            self._start_offset = seconds
+            if self._is_connected: self._seek_locked(seconds)
+
+    def _seek_locked(self, seconds: float):
+        self._position_origin = self._timestamp(0) + max(seconds, 0.0)
+        self._clock_origin = time.monotonic()
+        self._load(self._find(self._position_origin))
+        self._unserved = True
+
+    def _find(self, timestamp: float) -> int:
+        # The files are in time order, so first pick the file, then binary search inside it.
+        file = max(bisect.bisect_right(self._file_starts, timestamp) - 1, 0)
+        return self._first_frames[file] + self._readers[file].find(timestamp)
+
+    def _load(self, frame: int):
+        """Copies one recorded frame (and its StringData, if different) into the stand-in areas."""
+        if frame == self.frame or not self._is_connected: return
+        reader, local, file = self._locate(frame)
+        _, raw, strings_offset = reader.read(local)
+        split = reader.flight_data_size
+        self.flight_data_area[:split] = raw[:split]
+        self.flight_data_2_area[:len(raw) - split] = raw[split:]
+        if strings_offset and (file, strings_offset) != self._strings_key:
+            strings = reader.read_strings(strings_offset)
+            self.string_data_area[:len(strings)] = strings
+            self._strings_key = (file, strings_offset)
+            self._strings = None  # Invalidate BMSAdapter's decoded strings
+        self.frame = frame
+
+    def _sync(self):
+        """Moves the areas to the frame due now; in max-speed mode steps one frame instead, once the current one was served."""
+        if self.speed == 0:
+            frame = self.frame if self._unserved else self.frame + 1
+        else:
+            position = self._position_origin + (time.monotonic() - self._clock_origin) * self.speed
+            frame = self.frame_count if position > self._timestamp(self.frame_count - 1) else self._find(position)
+        if frame >= self.frame_count:
+            if not self.loop:
+                self._load(self.frame_count - 1)  # Hold the last frame
+                return
+            self.loops += 1
+            frame = 0
+            self._position_origin, self._clock_origin = self._timestamp(0), time.monotonic()
+        self._load(frame)
+
+    def _take_snapshot_locked(self, fields: Optional[AbstractSet[str]]) -> FlightSnapshot:
+        if self._is_connected:
+            self._sync()  # Only the sampler's tick takes snapshots
+            self._unserved = False
+        return super()._take_snapshot_locked(fields)
+
+    def close(self):
+        super().close()
+        for reader in self._readers: reader.close()
+        self._readers = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._read_lock:
+            position = self._timestamp(self.frame) - self._timestamp(0) if self._readers and self.frame >= 0 else None
+            return {"path": str(self.path), "speed": self.speed, "loop": self.loop, "frame": self.frame, "frame_count": self.frame_count,
+                    "position": round(position, 3) if position is not None else None, "duration": round(self.duration(), 3) if self._readers else None,
+                    "loops": self.loops}
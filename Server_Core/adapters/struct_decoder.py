@@ -0,0 +1,123 @@
+# File: adapters/struct_decoder.py
+import ctypes
+import struct
+from operator import itemgetter
+from typing import AbstractSet, Any, Dict, List, Optional, Tuple
+
+_FLOAT_CODES = {4: "f", 8: "d"}
+_SIGNED_CODES = {1: "b", 2: "h", 4: "i", 8: "q"}
+_UNSIGNED_CODES = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+def decode_c_string(raw: bytes) -> str:
+    """Mirrors ctypes' c_char array `.value`: everything up to the first NUL byte."""
+    return raw.split(b"\x00", 1)[0].decode("utf-8", errors="ignore")
+
+def _array_shape(ctype) -> Tuple[List[int], Any]:
+    """Splits a (possibly nested) ctypes array type into its dimensions (outermost first) and element type."""
+    dims = []
+    while issubclass(ctype, ctypes.Array):
+        dims.append(ctype._length_)
+        ctype = ctype._type_
+    return dims, ctype
+
+def _scalar_code(ctype) -> str:
+    """Maps a ctypes simple type to a struct code with the same size as on this platform."""
+    type_code = ctype._type_
+    size = ctypes.sizeof(ctype)
+    if type_code in "fd": return _FLOAT_CODES[size]
+    if type_code == "?": return "?"
+    if type_code in "bhilq": return _SIGNED_CODES[size]
+    if type_code in "BHILQ": return _UNSIGNED_CODES[size]
+    raise TypeError(f"Unsupported ctypes field type: {ctype.__name__}")
+
+def _tuple_getter(indices: List[int]):
+    """itemgetter that always returns a tuple, even for zero or one index."""
+    if len(indices) > 1: return itemgetter(*indices)
+    return lambda values: tuple(values[i] for i in indices)
+
+class StructDecoder:
+    """
+    Decodes a ctypes.Structure layout straight from a buffer (bytes, memoryview or mmap).
+    The layout is compiled once into a single struct.Struct, so a read is one `unpack_from`
+    with no intermediate ctypes instance. Output matches BMSDataConverter.convert_struct_to_dict.
+    If `fields` is given, every other field is compiled as padding and never unpacked.
+    """
+    def __init__(self, structure, max_array_size: int = 100, fields: Optional[AbstractSet[str]] = None):
+        self.structure = structure
+        self.size = ctypes.sizeof(structure)
+        self.fields: List[str] = []
+        # Per published field: (struct code, dimensions). Strings have code "s" and their char dimension removed;
+        # nested structures also have code "s", as they can only be sent as JSON.
+        self.specs: Dict[str, Tuple[str, List[int]]] = {}
+        fmt, position, index, padding = ["<"], 0, 0, 0
+        scalar_names, scalar_indices = [], []
+        # Each array plan: (name, first value index, outer length, inner length or 0, is string)
+        self._array_plans: List[Tuple[str, int, int, int, bool]] = []
+        # Each nested structure plan: (name, byte offset, array length or 0, element decoder)
+        self._nested_plans: List[Tuple[str, int, int, "StructDecoder"]] = []
+
+        for name, ctype in structure._fields_:
+            field = getattr(structure, name)
+            padding += field.offset - position
+            position = field.offset + field.size
+
+            dims, element = _array_shape(ctype)
+            is_char = element is ctypes.c_char
+            # Same rule as the legacy converter: very large arrays are not published. A plain
+            # char array is read by ctypes as bytes, not as an array, so it is never skipped.
+            too_large = dims and dims[0] > max_array_size and not (is_char and len(dims) == 1)
+            if too_large or name.startswith("_") or (fields is not None and name not in fields):
+                padding += field.size
+                continue
+            self.fields.append(name)
+            if isinstance(element, type) and issubclass(element, ctypes.Structure):
+                # Left out of the flat struct as padding; decoded element by element at its offset.
+                if len(dims) > 1: raise TypeError(f"Unsupported array shape for field {name}: {dims}")
+                padding += field.size
+                self.specs[name] = ("s", list(dims))
+                self._nested_plans.append((name, field.offset, dims[0] if dims else 0, StructDecoder(element, max_array_size)))
+                continue
+            if padding: fmt.append(f"{padding}x"); padding = 0
+
+            if is_char:
+                # The innermost char dimension is a string; a bare c_char is a 1-byte string.
+                str_len = dims.pop() if dims else 1
+                code, count = f"{str_len}s", 1
+            else:
+                code, count = _scalar_code(element), 1
+            for dim in dims: count *= dim
+            self.specs[name] = ("s" if is_char else code, list(dims))
+            fmt.append(f"{count}{code}" if code[-1] != "s" else code * count)
+
+            if not dims and not is_char:
+                scalar_names.append(name); scalar_indices.append(index)
+            elif not dims:
+                self._array_plans.append((name, index, 0, 0, True))
+            elif len(dims) == 1:
+                self._array_plans.append((name, index, dims[0], 0, is_char))
+            elif len(dims) == 2 and not is_char:
+                self._array_plans.append((name, index, dims[0], dims[1], False))
+            else:
+                raise TypeError(f"Unsupported array shape for field {name}: {dims}")
+            index += count
+
+        padding += self.size - position
+        if padding: fmt.append(f"{padding}x")
+        self._struct = struct.Struct("".join(fmt))
+        self._scalar_names = tuple(scalar_names)
+        self._scalar_getter = _tuple_getter(scalar_indices)
+
+    def decode(self, buffer, offset: int = 0) -> Dict[str, Any]:
+        values = self._struct.unpack_from(buffer, offset)
+        result = dict(zip(self._scalar_names, self._scalar_getter(values)))
+        for name, start, outer, inner, is_string in self._array_plans:
+            if is_string:
+                result[name] = decode_c_string(values[start]) if not outer else [decode_c_string(raw) for raw in values[start:start + outer]]
+            elif not inner:
+                result[name] = list(values[start:start + outer])
+            else:
+                result[name] = [list(values[row:row + inner]) for row in range(start, start + outer * inner, inner)]
+        for name, field_offset, length, decoder in self._nested_plans:
+            start = offset + field_offset
+            result[name] = decoder.decode(buffer, start) if not length else [decoder.decode(buffer, start + i * decoder.size) for i in range(length)]
+        return result
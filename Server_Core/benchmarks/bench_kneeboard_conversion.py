@@ -0,0 +1,72 @@
+# File: benchmarks/bench_kneeboard_conversion.py
+"""
+Benchmark: KneeboardService.refresh_kneeboards on synthetic DDS fixtures.
+Compares a single process with the process pool, then the skip paths (nothing changed / one file changed).
+
+Run from Server_Core:  python benchmarks/bench_kneeboard_conversion.py [--size 2048x1024]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw
+
+from config.settings import ConfigManager
+from services.kneeboard_service import DDS_COUNT, INIT_DDS, KneeboardService
+
+def make_page(width: int, height: int, rng: random.Random) -> Image.Image:
+    """A kneeboard-like image: light background, text-like strokes, a little noise."""
+    img = Image.effect_noise((width, height), 12).convert("RGB")
+    img = Image.blend(img, Image.new("RGB", (width, height), (235, 232, 220)), 0.85)
+    draw = ImageDraw.Draw(img)
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.line((x, y, x + rng.randrange(20, 200), y), fill=(20, 20, 20), width=2)
+    return img
+
+def make_fixtures(dds_dir: Path, width: int, height: int, seed: int = 0):
+    """DDS_COUNT synthetic DDS files, DXT1 like the BMS ones."""
+    rng = random.Random(seed)
+    dds_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(INIT_DDS, INIT_DDS + DDS_COUNT):
+        make_page(width, height, rng).save(dds_dir / f"{i}.dds", format="DDS", pixel_format="DXT1")
+
+def timed_refresh(service: KneeboardService) -> float:
+    started = time.perf_counter()
+    result = service.refresh_kneeboards()
+    if not result.get("success"): raise RuntimeError(result)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Kneeboard DDS conversion")
+    parser.add_argument("--size", default="2048x1024", help="Fixture size WIDTHxHEIGHT (each DDS holds a left and a right page)")
+    parser.add_argument("--workers", type=int, default=0, help="Pool size for the parallel case (0 = one per CPU)")
+    args = parser.parse_args()
+    width, height = map(int, args.size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        dds_dir = base_dir / "dds"
+        make_fixtures(dds_dir, width, height)
+        config_manager = ConfigManager(base_dir)
+        service = KneeboardService(base_dir, config_manager)
+        service.dds_dir = dds_dir
+        config = config_manager.load_config()
+
+        print(f"{DDS_COUNT} files of {width}x{height}, {os.cpu_count()} CPUs")
+        for label, workers in (("1 process", 1), ("process pool", args.workers)):
+            config_manager.update_cached_paths(kneeboard_manifest={})
+            config.kneeboard_conversion_workers = workers
+            print(f"{'cold, ' + label:<26} {timed_refresh(service) * 1000:>9.0f} ms")
+        print(f"{'unchanged':<26} {timed_refresh(service) * 1000:>9.1f} ms")
+        os.utime(dds_dir / f"{INIT_DDS}.dds")
+        print(f"{'one file touched':<26} {timed_refresh(service) * 1000:>9.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# File: benchmarks/bench_kneeboard_encoding.py
+"""
+Benchmark: encode time and size of one kneeboard page for each output profile and width variant.
+
+Run from Server_Core:  python benchmarks/bench_kneeboard_encoding.py [--size 1024x1024]
+"""
+import argparse
+import io
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+
+from bench_kneeboard_conversion import make_page
+from config.settings import KneeboardImageFormat
+from services.kneeboard_service import OutputProfile
+
+PROFILES = [
+    ("png, level 6 (old default)", KneeboardImageFormat.PNG, 6, 80),
+    ("png, level 1", KneeboardImageFormat.PNG, 1, 80),
+    ("webp lossless", KneeboardImageFormat.WEBP_LOSSLESS, 1, 80),
+    ("webp q80", KneeboardImageFormat.WEBP, 1, 80),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Kneeboard page encoding per output profile")
+    parser.add_argument("--size", default="1024x1024", help="Page size WIDTHxHEIGHT before width scaling (half of a DDS)")
+    parser.add_argument("--scale", type=float, default=1.4, help="kneeboard_scale_width")
+    parser.add_argument("--widths", default="720,1280", help="Variant widths")
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per case (best is reported)")
+    args = parser.parse_args()
+    width, height = map(int, args.size.lower().split("x"))
+    widths = [int(w) for w in args.widths.split(",") if w]
+
+    page = make_page(width, height, random.Random(0)).resize((int(width * args.scale), height), Image.Resampling.LANCZOS)
+    variants = {"full": page}
+    for w in widths:
+        if w < page.width: variants[f"{w}w"] = page.resize((w, round(page.height * w / page.width)), Image.Resampling.LANCZOS)
+
+    print(f"page {page.width}x{page.height}")
+    print(f"{'profile':<28} {'variant':>7} {'ms/page':>8} {'bytes':>9}")
+    for label, image_format, png_level, webp_quality in PROFILES:
+        options = OutputProfile(image_format.value, args.scale, png_level, webp_quality, tuple(widths)).save_options()
+        for name, image in variants.items():
+            buffer = io.BytesIO()
+            encode = lambda: (buffer.seek(0), buffer.truncate(), image.save(buffer, **options))
+            seconds = min(timeit.repeat(encode, number=1, repeat=args.repeat))
+            print(f"{label:<28} {name:>7} {seconds * 1000:>8.1f} {buffer.tell():>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# File: benchmarks/bench_snapshot_consistency.py
+"""
+Stress test: torn reads of FlightData/FlightData2 with and without BMSAdapter's verified snapshot copies.
+
+A writer process rewrites two file-backed mmaps (standing in for the BMS areas) back to back as fast as it can,
+each with one memcpy; every frame fills the areas with one repeated u32 counter, so a copy holding more than one
+value is torn. Reader threads take snapshots through BMSAdapter while the main thread
+checks plain slice copies the same way. (The writer is a process because copies made by threads of one
+interpreter never overlap: each slice copy runs under the GIL.)
+
+The re-check catches a write that runs while the copy is taken, i.e. on another core. A writer preempted in the
+middle of a frame leaves a torn state that stays put, which no reader-side check can tell from a real frame; on a
+single core that is the only way to tear, so there "torn delivered" stays about the same for both kinds of copy.
+
+Run from Server_Core:  python benchmarks/bench_snapshot_consistency.py [--seconds 5] [--readers 4]
+"""
+import argparse
+import ctypes
+import mmap
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from falcon_memreader import FlightData, FlightData2
+from adapters.bms_adapter import BMSAdapter
+
+SIZES = (ctypes.sizeof(FlightData), ctypes.sizeof(FlightData2))
+def writer(paths, stop):
+    files = [open(path, "r+b") for path in paths]
+    areas = [mmap.mmap(f.fileno(), size) for f, size in zip(files, SIZES)]
+    frame = 0
+    while not stop.is_set():
+        frame += 1
+        for area in areas:
+            area[:len(area) - len(area) % 4] = frame.to_bytes(4, "little") * (len(area) // 4)  # One memcpy per area, like BMS
+    for area in areas: area.close()
+    for f in files: f.close()
+
+def is_torn(raw: bytes) -> bool:
+    """True if either area in a FlightData + FlightData2 copy holds words of more than one frame."""
+    first, second = raw[:SIZES[0] - SIZES[0] % 4], raw[SIZES[0]:SIZES[0] + SIZES[1] - SIZES[1] % 4]
+    return any(len(set(memoryview(part).cast("I"))) > 1 for part in (first, second))
+
+def main():
+    parser = argparse.ArgumentParser(description="Torn reads: plain copies vs. BMSAdapter snapshots")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each phase")
+    parser.add_argument("--readers", type=int, default=4, help="Threads taking snapshots concurrently")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [Path(directory) / name for name in ("FlightData", "FlightData2")]
+        for path, size in zip(paths, SIZES): path.write_bytes(bytes(size))
+        files = [open(path, "rb") for path in paths]
+        adapter = BMSAdapter(failure_threshold=5, reset_timeout=60)
+        adapter.flight_data_area, adapter.flight_data_2_area = (mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) for f, size in zip(files, SIZES))
+        adapter._is_connected = True  # Mapped by hand instead of by tag name
+
+        stop = multiprocessing.Event()
+        process = multiprocessing.Process(target=writer, args=(paths, stop), daemon=True)
+        process.start()
+        time.sleep(0.2)
+
+        # Phase 1: plain copies, as the adapter took them before.
+        plain = plain_torn = 0
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            plain_torn += is_torn(adapter.flight_data_area[:] + adapter.flight_data_2_area[:])
+            plain += 1
+
+        # Phase 2: verified snapshots from several threads; decoding happens outside the lock.
+        counts = [[0, 0] for _ in range(args.readers)]  # Snapshots, torn snapshots per thread
+        def reader(index):
+            end = time.monotonic() + args.seconds
+            while time.monotonic() < end:
+                snapshot = adapter.take_snapshot(frozenset())
+                counts[index][0] += 1
+                counts[index][1] += is_torn(snapshot.raw)
+                adapter.decode_snapshot(snapshot, frozenset({"kias", "currentTime"}))
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        for thread in threads: thread.start()
+        lock_free = 0
+        while any(thread.is_alive() for thread in threads):
+            if adapter.latest_snapshot() is not None: lock_free += 1
+        for thread in threads: thread.join()
+
+        stop.set()
+        process.join()
+        snapshots, snapshot_torn = sum(c[0] for c in counts), sum(c[1] for c in counts)
+        print(f"{'copy':<20} {'reads':>9} {'torn delivered':>15} {'retries':>8} {'gave up':>8}")
+        print(f"{'plain slice':<20} {plain:>9} {plain_torn:>15} {'-':>8} {'-':>8}")
+        print(f"{'verified snapshot':<20} {snapshots:>9} {snapshot_torn:>15} {adapter.torn_reads:>8} {adapter.torn_accepted:>8}")
+        print(f"latest_snapshot() calls served without the lock meanwhile: {lock_free}  ({os.cpu_count()} CPUs)")
+        adapter.close()
+        for f in files: f.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# File: benchmarks/bench_struct_decoder.py
+"""
+Microbenchmark: per-frame decode time of StructDecoder vs. the legacy BMSDataConverter path.
+
+Run from Server_Core:  python benchmarks/bench_struct_decoder.py [--frames 5000]
+"""
+import argparse
+import ctypes
+import mmap
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from falcon_memreader import FlightData, FlightData2
+from adapters.bms_adapter import BMSDataConverter
+from adapters.struct_decoder import StructDecoder
+
+def make_area(structure, seed: int) -> mmap.mmap:
+    """An anonymous mmap filled with deterministic pseudo-random bytes (no NaN floats)."""
+    rng = random.Random(seed)
+    size = ctypes.sizeof(structure)
+    area = mmap.mmap(-1, size)
+    area.write(bytes(rng.randrange(0, 0x40) for _ in range(size)))
+    return area
+
+def legacy_decode(area: mmap.mmap, structure) -> dict:
+    area.seek(0)
+    return BMSDataConverter.convert_struct_to_dict(structure.from_buffer_copy(area.read(ctypes.sizeof(structure))))
+
+def main():
+    parser = argparse.ArgumentParser(description="StructDecoder vs. BMSDataConverter")
+    parser.add_argument("--frames", type=int, default=5000, help="Frames decoded per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per case (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'layout':<12} {'bytes':>6} {'legacy us/frame':>16} {'decoder us/frame':>17} {'speedup':>8}")
+    for seed, structure in enumerate((FlightData, FlightData2)):
+        area = make_area(structure, seed)
+        decoder = StructDecoder(structure)
+        if decoder.decode(area) != legacy_decode(area, structure):
+            raise SystemExit(f"{structure.__name__}: decoder output differs from BMSDataConverter")
+
+        legacy = min(timeit.repeat(lambda: legacy_decode(area, structure), number=args.frames, repeat=args.repeat))
+        fast = min(timeit.repeat(lambda: decoder.decode(area), number=args.frames, repeat=args.repeat))
+        legacy_us, fast_us = legacy / args.frames * 1e6, fast / args.frames * 1e6
+        print(f"{structure.__name__:<12} {decoder.size:>6} {legacy_us:>16.1f} {fast_us:>17.1f} {legacy_us / fast_us:>7.1f}x")
+        area.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# File: benchmarks/bench_wire_formats.py
+"""
+Benchmark: encode time and frame size of each /ws/flight_data wire format for one full frame.
+msgpack and cbor are only measured if their packages are installed.
+
+Run from Server_Core:  python benchmarks/bench_wire_formats.py [--frames 2000]
+"""
+import argparse
+import ctypes
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from falcon_memreader import FlightData, FlightData2, StringData
+from adapters.bms_adapter import BMSAdapter
+from services.flight_frame import FlightFrame
+from services.wire_formats import PackedLayouts, WireFormat
+
+def make_frame_data(adapter: BMSAdapter, seed: int = 0) -> dict:
+    """A realistic merged frame dict: decoded pseudo-random areas plus typical directory strings."""
+    rng = random.Random(seed)
+    area = lambda structure: bytes(rng.randrange(0, 0x40) for _ in range(ctypes.sizeof(structure)))
+    strings = {key: f"C:\\Falcon BMS 4.37\\User\\{key}" for key in StringData.id}
+    return {**adapter.flight_data_decoder.decode(area(FlightData)), **adapter.flight_data_2_decoder.decode(area(FlightData2)), **strings}
+
+def main():
+    parser = argparse.ArgumentParser(description="Wire format encode time and size")
+    parser.add_argument("--frames", type=int, default=2000, help="Frames encoded per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per case (best is reported)")
+    args = parser.parse_args()
+
+    adapter = BMSAdapter(failure_threshold=5, reset_timeout=60)
+    layouts = PackedLayouts(adapter.field_specs())
+    data = make_frame_data(adapter)
+    baseline = None
+
+    print(f"{'format':<10} {'us/frame':>9} {'bytes':>7} {'vs json':>8}")
+    for wire_format in WireFormat:
+        if not wire_format.is_available:
+            print(f"{wire_format.value:<10} {'(not installed)':>26}")
+            continue
+        # A fresh frame per call, so the per-frame payload cache does not hide the encoding cost.
+        encode = lambda: FlightFrame(1, data, None, True, layouts).encode("full", None, wire_format)
+        seconds = min(timeit.repeat(encode, number=args.frames, repeat=args.repeat)) / args.frames
+        size = len(encode())
+        baseline = baseline or (seconds, size)
+        print(f"{wire_format.value:<10} {seconds * 1e6:>9.1f} {size:>7} {size / baseline[1]:>7.0%}")
+
+if __name__ == "__main__":
+    main()
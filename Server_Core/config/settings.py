@@ -1,9 +1,11 @@
 # File: config/settings.py
+from enum import Enum
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field, validator
 from pydantic_settings import BaseSettings
 import logging
+import time
 
 # We will use standard logging, but take inspiration from structlog concepts
 logger = logging.getLogger(__name__)
@@ -17,19 +19,52 @@ class KneeboardConfig(BaseModel):
     left: List[KneeboardItem] = []
     right: List[KneeboardItem] = []
 
+class KneeboardImageFormat(str, Enum):
+    PNG = "png"
+    WEBP = "webp"                    # Lossy, smallest
+    WEBP_LOSSLESS = "webp_lossless"
+
+class TickOverrunPolicy(str, Enum):
+    SKIP = "skip"          # Drop the missed ticks and stay on the original schedule
+    CATCH_UP = "catch_up"  # Run the missed ticks back to back (bounded), keeping the average rate
+
+class CachedPaths(BaseModel):
+    """State remembered between runs (config/cached_paths.json), not user settings."""
+    briefing_file_path: Optional[str] = None
+    # DDS file name -> (size, mtime_ns, output profile) it was last converted with
+    kneeboard_manifest: Dict[str, Tuple[int, int, str]] = {}
+
 # ------------------------------------
 
 class ServerConfig(BaseSettings):
     """Server configuration with validation."""
     server_host: str = Field(default="0.0.0.0", description="Server host")
     server_port: int = Field(default=8000, ge=1024, le=65535, description="Server port")
+    server_workers: int = Field(default=1, ge=1, le=32, description="Server processes; above 1, one publisher process reads BMS shared memory for all of them")
     allowed_image_extensions: List[str] = Field(default=[".png", ".jpg", ".jpeg", ".webp"])
     websocket_update_interval: float = Field(default=0.1, ge=0.05, le=1.0)
+    sampler_overrun_policy: TickOverrunPolicy = Field(default=TickOverrunPolicy.SKIP, description="What the sampler does with ticks missed because a read overran")
+    sampler_adaptive: bool = Field(default=False, description="Follow the sim's own FlightData update rate, between sampler_min_interval and websocket_update_interval")
+    sampler_min_interval: float = Field(default=0.02, ge=0.01, le=1.0, description="Shortest sampling interval adaptive mode may use")
+    drawing_stream_interval: float = Field(default=0.033, ge=0.016, le=1.0, description="Minimum seconds between /ws/drawing frames (rate cap)")
+    websocket_keyframe_interval: int = Field(default=50, ge=1, description="Ticks between full keyframes in delta stream mode")
     kneeboard_scale_width: float = Field(default=1.4, ge=0.5, le=3.0, description="Kneeboard width scaling factor (1.4 = 140%)")
+    kneeboard_image_format: KneeboardImageFormat = Field(default=KneeboardImageFormat.PNG, description="Output format of converted kneeboard pages")
+    kneeboard_png_compress_level: int = Field(default=1, ge=0, le=9, description="zlib level for PNG pages (1 = fast, 9 = smallest)")
+    kneeboard_webp_quality: int = Field(default=80, ge=1, le=100, description="WebP quality (lossy) or effort (lossless)")
+    kneeboard_variant_widths: List[int] = Field(default=[720, 1280], description="Extra downscaled page widths for smaller screens")
+    kneeboard_conversion_workers: int = Field(default=0, ge=0, le=16, description="Processes for DDS to PNG conversion (0 = one per CPU)")
     
     max_websocket_connections: int = Field(default=10, ge=1)
+    blocking_io_workers: int = Field(default=4, ge=1, le=32, description="Worker threads for shared memory, filesystem and parsing work")
     circuit_breaker_failure_threshold: int = Field(default=5, ge=3)
     circuit_breaker_reset_timeout: int = Field(default=60, ge=30, description="Seconds before retrying a broken connection")
+    briefing_poll_interval: float = Field(default=2.0, ge=0.5, le=5.0, description="Seconds between briefings directory scans where inotify is unavailable")
+    static_rescan_interval: float = Field(default=5.0, ge=1.0, le=60.0, description="Seconds between checks of the static folders for changed files")
+    recorder_enabled: bool = Field(default=False, description="Record shared memory frames to recorder_directory for later replay")
+    recorder_directory: str = Field(default="recordings", description="Where recordings go, relative to the server folder")
+    recorder_interval: float = Field(default=0.02, ge=0.005, le=1.0, description="Seconds between recorded frames (0.02 = 50 Hz)")
+    recorder_max_file_mb: int = Field(default=256, ge=1, le=4096, description="Size at which a new recording file is started")
     file_cache_ttl_seconds: int = Field(default=300, ge=60, description="Time to cache briefing and kneeboard data")
 
     kneeboards: KneeboardConfig = Field(default_factory=KneeboardConfig)
@@ -52,24 +87,54 @@ class SecurityConfig(BaseModel):
         return v
 
 class ConfigManager:
-    """Manages loading and saving of application configuration."""
+    """
+    Manages loading and saving of application configuration. settings.json is re-read when its mtime or
+    size changes (the launcher edits it while the server runs); `version` increases with every reload.
+    """
+    CHECK_INTERVAL = 1.0  # Seconds between stat() calls on settings.json
+
     def __init__(self, base_dir: Path):
         self.config_file = base_dir / "config" / "settings.json"
         self.security_config_file = base_dir / "config" / "security.json"
+        self.cache_file = base_dir / "config" / "cached_paths.json"
         self._config: Optional[ServerConfig] = None
         self._security_config: Optional[SecurityConfig] = None
+        self._cached_paths: Optional[CachedPaths] = None
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self.version = 0
+
+    def _stat_config_file(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.config_file.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
 
     def load_config(self) -> ServerConfig:
-        if self._config:
+        now = time.monotonic()
+        if self._config and now - self._checked_at < self.CHECK_INTERVAL:
+            return self._config
+        self._checked_at = now
+        stamp = self._stat_config_file()
+        if self._config and stamp == self._file_stamp:
             return self._config
         try:
-            if self.config_file.exists():
-                self._config = ServerConfig.model_validate_json(self.config_file.read_text())
+            if stamp is not None:
+                config = ServerConfig.model_validate_json(self.config_file.read_text())
+                if self._config: logger.info(f"{self.config_file.name} changed on disk, configuration reloaded.")
+                self._config, self._file_stamp = config, stamp
             else:
                 self._config = ServerConfig()
                 self.save_config()
+            self.version += 1
             return self._config
         except Exception as e:
+            if self._config:
+                # Most likely caught halfway through a write; keep the last good config and retry on the next change.
+                logger.error(f"Failed to reload config, keeping the previous one: {e}")
+                self._file_stamp = stamp
+                return self._config
             logger.error(f"Failed to load config, using defaults: {e}")
             return ServerConfig()
 
@@ -78,6 +143,7 @@ class ConfigManager:
         try:
             self.config_file.parent.mkdir(parents=True, exist_ok=True)
             self.config_file.write_text(self._config.model_dump_json(indent=2))
+            self._file_stamp = self._stat_config_file()
         except Exception as e:
             logger.error(f"Failed to save config: {e}")
 
@@ -94,4 +160,25 @@ class ConfigManager:
         except Exception as e:
             logger.error(f"Failed to load security config: {e}")
             self._security_config = SecurityConfig()
-        return self._security_config
\ No newline at end of file
+        return self._security_config
+
+    def get_cached_paths(self) -> CachedPaths:
+        if self._cached_paths:
+            return self._cached_paths
+        try:
+            self._cached_paths = CachedPaths.model_validate_json(self.cache_file.read_text()) if self.cache_file.exists() else CachedPaths()
+        except Exception as e:
+            logger.error(f"Failed to load path cache, starting empty: {e}")
+            self._cached_paths = CachedPaths()
+        return self._cached_paths
+
+    def update_cached_paths(self, briefing_file_path: Optional[str] = None, kneeboard_manifest: Optional[Dict[str, Tuple[int, int, str]]] = None):
+        """Updates the given entries (None = keep) and writes config/cached_paths.json."""
+        cached = self.get_cached_paths()
+        if briefing_file_path is not None: cached.briefing_file_path = briefing_file_path
+        if kneeboard_manifest is not None: cached.kneeboard_manifest = kneeboard_manifest
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_file.write_text(cached.model_dump_json(indent=2))
+        except Exception as e:
+            logger.error(f"Failed to save path cache: {e}")
@@ -1,17 +1,15 @@
 # File: Server_Core/main.py - CORRECTED STARTUP SEQUENCE
 import asyncio
 import logging
+import math
+import os
 import uvicorn
 import sys
-import glob
-import os
 import multiprocessing
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-import socket
-from enum import Enum
+from typing import List, Dict, Any, Optional, Union
 
 import argparse
 import platform
@@ -20,23 +18,51 @@ import ctypes
 import structlog
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse
+from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 
-from bs4 import BeautifulSoup
-
 from config.settings import ConfigManager
-from adapters.bms_adapter import BMSAdapter
+from adapters.bms_adapter import BMSAdapter, CircuitBreakerState
+from adapters.frame_ring import FrameRing, RingFrameSource
+from adapters.replay_adapter import ReplayAdapter
 from services.briefing_service import BriefingService
+from services.kneeboard_service import KneeboardService
+from services.kneeboard_list_service import KneeboardListService
+from services.html_briefing_service import HtmlBriefingService
+from services.briefing_watcher import BriefingWatcher
 from services.path_service import PathService
+from services.websocket_manager import WebSocketManager
+from services.flight_data_sampler import FlightDataSampler
+from services.drawing_stream import DrawingStream
+from services.recording_service import RecordingService
+from services.frame_publisher import FramePublisher, run_publisher
+from services.flight_frame import StreamMode
+from services.wire_formats import WireFormat, negotiate_format
+from services.blocking_executor import BlockingExecutor
+from services.loop_monitor import EventLoopMonitor
+from services.health_service import HealthService, ServerAddressResolver
+from services.static_assets import StaticAssetIndex
+from services.http_cache import etag_matches, http_date, is_not_modified, pick_encoding
+from services.subscriptions import SubscriptionCatalog
+from services.metrics import MetricsRegistry
+from falcon_memreader import StringData
 # --------------------------------------------------
 
-# --- 0. Command-line argument parsing for hiding the console ---
-def hide_console_window_if_requested():
+# --- 0. Command-line argument parsing (console hiding, replay of a recording instead of live BMS) ---
+def parse_command_line() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="BMS Bridge Server")
     parser.add_argument('--hide-console', action='store_true', help='If specified, the console window will be hidden on startup.')
+    parser.add_argument('--replay', type=Path, metavar='PATH', help='Serve a flight recording (.bmsrec file or directory) instead of live BMS shared memory.')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='Playback rate for --replay: 1 = real time, N = N times faster, 0 = as fast as it is read.')
+    parser.add_argument('--replay-start', type=float, default=0.0, metavar='SECONDS', help='Start --replay this many seconds into the recording.')
+    parser.add_argument('--replay-once', action='store_true', help='Hold the last frame at the end of --replay instead of starting over.')
     args, _ = parser.parse_known_args()
-    if args.hide_console and platform.system() == "Windows":
+    return args
+
+ARGS = parse_command_line()
+
+def hide_console_window_if_requested():
+    if ARGS.hide_console and platform.system() == "Windows":
         try:
             hwnd = ctypes.windll.kernel32.GetConsoleWindow()
             if hwnd:
@@ -55,24 +81,12 @@ def get_base_path():
         return Path(__file__).resolve().parent
 BASE_DIR = get_base_path()
 
-class ServerStatus(str, Enum): RUNNING = "RUNNING"; WARNING = "WARNING"; ERROR = "ERROR"
-class BmsStatus(str, Enum): CONNECTED = "CONNECTED"; NOT_CONNECTED = "NOT_CONNECTED"
-
-def get_server_ip() -> str:
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM); s.connect(("8.8.8.8", 80)); ip = s.getsockname()[0]; s.close(); return ip
-    except Exception: return "127.0.0.1"
+# Set for the worker processes when server_workers > 1: name of the frame ring the publisher process writes.
+FRAME_RING_ENV = "BMS_BRIDGE_FRAME_RING"
 
 class KneeboardItemResponse(BaseModel): path: str; type: str
 class KneeboardListResponse(BaseModel): success: bool; items: List[KneeboardItemResponse] = []
-
-class WebSocketManager:
-    def __init__(self, max_connections: int): self.max_connections = max_connections; self.active_connections: List[WebSocket] = []
-    async def connect(self, websocket: WebSocket) -> bool:
-        if len(self.active_connections) >= self.max_connections: await websocket.close(code=1008, reason="Too many connections"); return False
-        await websocket.accept(); self.active_connections.append(websocket); logger.info("WebSocket connected", count=len(self.active_connections)); return True
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections: self.active_connections.remove(websocket); logger.info("WebSocket disconnected", count=len(self.active_connections))
+class ReplaySeekRequest(BaseModel): position: float  # Seconds after the recording's first frame
 
 class BMSBridgeApp:
     def __init__(self, base_dir: Path):
@@ -80,17 +94,84 @@ class BMSBridgeApp:
         self.config_manager = ConfigManager(base_dir)
         self.config = self.config_manager.load_config()
         self.security_config = self.config_manager.get_security_config()
-        self.bms_adapter = BMSAdapter(failure_threshold=self.config.circuit_breaker_failure_threshold, reset_timeout=self.config.circuit_breaker_reset_timeout)
+        self.metrics = MetricsRegistry()
+        # As one of several workers, everything BMS comes from the publisher process (which also owns any replay):
+        # a worker has no adapter and never opens shared memory.
+        ring_name = os.environ.get(FRAME_RING_ENV)
+        self.bms_adapter: Optional[BMSAdapter] = None
+        self.frame_source = RingFrameSource(FrameRing.attach(ring_name)) if ring_name else None
+        if self.frame_source is None:
+            if ARGS.replay:
+                self.bms_adapter = ReplayAdapter(ARGS.replay, ARGS.replay_speed, not ARGS.replay_once, ARGS.replay_start,
+                                                 self.config.circuit_breaker_failure_threshold, self.config.circuit_breaker_reset_timeout)
+            else:
+                self.bms_adapter = BMSAdapter(failure_threshold=self.config.circuit_breaker_failure_threshold, reset_timeout=self.config.circuit_breaker_reset_timeout)
+            self.bms_adapter.metrics = self.metrics.pipeline
+        self.bms_source: Union[BMSAdapter, RingFrameSource] = self.frame_source or self.bms_adapter
         self.briefing_service = BriefingService(self.config_manager)
         self.path_service = PathService()
-        self.websocket_manager = WebSocketManager(self.config.max_websocket_connections)
+        self.kneeboard_service = KneeboardService(base_dir, self.config_manager)
+        self.html_briefing_service = HtmlBriefingService()
+        self.subscription_catalog = SubscriptionCatalog(self.bms_source.field_names(), StringData.id, BMSAdapter.EXTRA_AREAS)
+        self.websocket_manager = WebSocketManager(self.config.max_websocket_connections, self.subscription_catalog, self.metrics.pipeline)
+        # Execution model: handlers stay on the event loop; anything that blocks goes through this pool.
+        self.executor = BlockingExecutor(self.config.blocking_io_workers)
+        self.loop_monitor = EventLoopMonitor()
+        self.static_assets = StaticAssetIndex(base_dir, self.security_config.allowed_static_paths, base_dir / "templates" / "index.html", self.executor, self.config.static_rescan_interval)
+        self.kneeboard_list_service = KneeboardListService(self.config_manager, self.static_assets)
+        self.health_service = HealthService(self.config.server_port, ServerAddressResolver())
+        self.flight_data_sampler = FlightDataSampler(self.bms_source, self.websocket_manager, self.executor, self.config.websocket_update_interval, self.config.websocket_keyframe_interval,
+                                                     self.metrics.pipeline, self.config.sampler_overrun_policy, self.config.sampler_adaptive, self.config.sampler_min_interval)
+        # The sampler's tick is the one reader of shared memory; these two ride on its snapshots.
+        self.drawing_stream = DrawingStream(self.bms_source, self.flight_data_sampler.consumers, self.config.drawing_stream_interval, self.config.max_websocket_connections)
+        self.recording_service = RecordingService(self.flight_data_sampler.consumers, self.executor, base_dir / self.config.recorder_directory, self.config.recorder_interval,
+                                                  self.config.recorder_max_file_mb * 1024 * 1024)
+        self.briefing_watcher = BriefingWatcher(self.path_service, self.bms_source, self.briefing_service, self.html_briefing_service, self.websocket_manager, self.executor, self.config.briefing_poll_interval)
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Gauges and counters for /api/metrics; they read existing state only when scraped."""
+        metrics, sampler, adapter = self.metrics, self.flight_data_sampler, self.bms_adapter
+        metrics.gauge("bms_bridge_event_loop_lag_seconds", "Event loop lag: last measurement and maximum since start.",
+                      lambda: {(("stat", "last"),): self.loop_monitor.last_lag, (("stat", "max"),): self.loop_monitor.max_lag})
+        metrics.gauge("bms_bridge_websocket_connections", "Connected WebSocket clients per channel.",
+                      lambda: {(("channel", "flight_data"),): len(self.websocket_manager.active_connections), (("channel", "status"),): len(self.websocket_manager.status_clients),
+                              (("channel", "drawing"),): len(self.drawing_stream.clients)})
+        metrics.gauge("bms_bridge_bms_connected", "1 while BMS shared memory is readable.", lambda: int(sampler.bms_connected))
+        if adapter:  # Workers have none; the publisher process owns the breaker
+            metrics.gauge("bms_bridge_circuit_breaker_state", "Shared memory circuit breaker; 1 for the current state.",
+                          lambda: {(("state", state.value),): int(adapter.circuit_breaker.state == state) for state in CircuitBreakerState})
+        metrics.gauge("bms_bridge_blocking_executor_in_flight", "Calls running or queued on the blocking worker threads.", lambda: self.executor.stats()["in_flight"])
+        metrics.counter("bms_bridge_frames_total", "Sampler reads that were published, or skipped because shared memory had not changed.",
+                        lambda: {(("result", "published"),): sampler.frames_published, (("result", "skipped"),): sampler.frames_skipped})
+        metrics.gauge("bms_bridge_sampler_rate_hz", "Sampler tick rate: target (1 / current interval) and achieved over the last ticks.",
+                      lambda: {(("rate", "target"),): 1 / sampler.scheduler.interval, (("rate", "achieved"),): sampler.scheduler.achieved_rate() or 0.0})
+        metrics.counter("bms_bridge_sampler_ticks_missed_total", "Sampler deadlines dropped because a tick overran.", lambda: sampler.scheduler.missed)
+        if adapter:
+            metrics.counter("bms_bridge_shm_torn_reads_total", "Shared memory copies BMS wrote to while they were taken: retried, used anyway after the retries, or dropped (drawing area).",
+                            lambda: {(("result", "retried"),): adapter.torn_reads, (("result", "accepted"),): adapter.torn_accepted,
+                                     (("result", "dropped"),): adapter.torn_dropped})
+        metrics.counter("bms_bridge_drawing_frames_total", "Frames published on /ws/drawing.", lambda: self.drawing_stream.frames_published)
+        caches = {"briefing_text": self.briefing_service, "briefing_html": self.html_briefing_service, "kneeboard_dds": self.kneeboard_service,
+                  "kneeboard_list": self.kneeboard_list_service, "static_assets": self.static_assets}
+        metrics.counter("bms_bridge_cache_lookups_total", "Cache lookups by result: hit = served or kept without rebuilding.",
+                        lambda: {labels: value for name, cache in caches.items()
+                                 for labels, value in (((("cache", name), ("result", "hit")), cache.hits), ((("cache", name), ("result", "miss")), cache.misses))})
 
 app_instance: Optional[BMSBridgeApp] = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global app_instance; logger.info("Application starting up..."); app_instance = BMSBridgeApp(BASE_DIR); yield
+    global app_instance; logger.info("Application starting up..."); app_instance = BMSBridgeApp(BASE_DIR)
+    await app_instance.executor.run(app_instance.static_assets.rebuild)
+    app_instance.loop_monitor.start(); app_instance.static_assets.start(); app_instance.flight_data_sampler.start(); app_instance.drawing_stream.start(); app_instance.briefing_watcher.start()
+    if app_instance.config.recorder_enabled and not app_instance.frame_source: app_instance.recording_service.start()  # Else the publisher records
+    yield
     logger.info("Application shutting down..."); 
-    if app_instance: app_instance.bms_adapter.close()
+    if app_instance:
+        await app_instance.recording_service.stop(); await app_instance.static_assets.stop(); await app_instance.briefing_watcher.stop(); await app_instance.drawing_stream.stop(); await app_instance.flight_data_sampler.stop(); await app_instance.loop_monitor.stop()
+        app_instance.executor.shutdown()
+        if app_instance.bms_adapter: app_instance.bms_adapter.close()
+        if app_instance.frame_source: app_instance.frame_source.ring.close()
 def get_app() -> BMSBridgeApp:
     if app_instance is None: raise HTTPException(status_code=503, detail="Application is not initialized")
     return app_instance
@@ -100,98 +181,183 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
 
 @app.get("/api/health")
 async def health_check(request: Request, app_inst: BMSBridgeApp = Depends(get_app)):
-    flight_data = app_inst.bms_adapter.get_all_data()
-    bms_connected = app_inst.bms_adapter.is_connected()
-    bms_connected = flight_data is not None
-    return {
-        "server_status": ServerStatus.RUNNING if bms_connected else ServerStatus.WARNING,
-        "bms_status": BmsStatus.CONNECTED if bms_connected else BmsStatus.NOT_CONNECTED,
-        "server_address": f"http://{get_server_ip()}:{app_inst.config.server_port}",
-        "server_message": "OK" if bms_connected else "BMS Shared Memory not available. Is the simulator in 3D?"
-    }
+    # Served from the sampler's latest read; polling this never touches shared memory.
+    body, etag = app_inst.health_service.get(app_inst.flight_data_sampler.bms_connected)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag): return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/kneeboards/{board_name}", response_model=KneeboardListResponse)
-async def get_kneeboard_list(board_name: str, app_inst: BMSBridgeApp = Depends(get_app)):
+async def get_kneeboard_list(board_name: str, request: Request, app_inst: BMSBridgeApp = Depends(get_app)):
     if board_name not in ["left", "right"]: raise HTTPException(status_code=404, detail="Board not found. Use 'left' or 'right'.")
-    kneeboard_config = app_inst.config_manager.load_config().kneeboards
-    raw_list = getattr(kneeboard_config, board_name, [])
-    response_items = [KneeboardItemResponse(path=f"/user_data/kneeboards/{Path(item.path).name}", type="pdf" if Path(item.path).suffix.lower() == ".pdf" else "image") for item in raw_list if item.enabled]
-    return KneeboardListResponse(success=True, items=response_items)
+    body, etag = app_inst.kneeboard_list_service.get(board_name)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag): return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/kneeboards/{board_name}/bms", response_model=KneeboardListResponse)
+async def get_bms_kneeboard_pages(board_name: str, width: Optional[int] = None, app_inst: BMSBridgeApp = Depends(get_app)):
+    """Pages converted from the BMS kneeboard DDS files. `width` (screen pixels) picks the smallest variant that still fills it."""
+    if board_name not in ["left", "right"]: raise HTTPException(status_code=404, detail="Board not found. Use 'left' or 'right'.")
+    result = await app_inst.executor.run(app_inst.kneeboard_service.refresh_kneeboards)
+    if not result.get("success"): return JSONResponse(status_code=404, content=result)
+    if not result.get("cached"): await app_inst.executor.run(app_inst.static_assets.rebuild)  # Index the new pages right away
+    pages = await app_inst.executor.run(app_inst.kneeboard_service.list_pages, board_name.capitalize(), width)
+    return KneeboardListResponse(success=True, items=[KneeboardItemResponse(path=app_inst.static_assets.versioned_url(page), type="image") for page in pages])
 
 @app.get("/api/briefing")
 async def get_briefing(app_inst: BMSBridgeApp = Depends(get_app)):
-    result = app_inst.briefing_service.get_briefing_data(app_inst.bms_adapter)
+    result = app_inst.briefing_service.get_briefing_data()
     if not result.get("success"): return JSONResponse(status_code=404, content=result)
     return JSONResponse(content=result)
 
+@app.get("/api/flight_data/fields")
+async def get_flight_data_fields(app_inst: BMSBridgeApp = Depends(get_app)):
+    catalog = app_inst.subscription_catalog
+    return {"fields": sorted(catalog.known_fields), "groups": catalog.describe()}
+
+@app.get("/api/flight_data/layout")
+async def get_flight_data_layout(fields: str = "", groups: str = "", app_inst: BMSBridgeApp = Depends(get_app)):
+    """Byte layout of `format=packed` frames for a subscription (same fields/groups syntax as the WebSocket)."""
+    try: field_set = app_inst.subscription_catalog.resolve([f for f in fields.split(",") if f], [g for g in groups.split(",") if g])
+    except ValueError as e: raise HTTPException(status_code=400, detail=str(e))
+    return app_inst.flight_data_sampler.packed_layouts.get(field_set).describe()
+
+@app.get("/api/diagnostics/connections")
+async def get_connection_diagnostics(app_inst: BMSBridgeApp = Depends(get_app)):
+    manager = app_inst.websocket_manager
+    return {"active": len(manager.active_connections), "status": len(manager.status_clients), "max_connections": manager.max_connections, "sampler": app_inst.flight_data_sampler.stats(), "connections": manager.describe(),
+            "drawing": app_inst.drawing_stream.stats(), "frame_ring": app_inst.frame_source.stats() if app_inst.frame_source else None}
+
+@app.get("/api/diagnostics/event_loop")
+async def get_event_loop_diagnostics(app_inst: BMSBridgeApp = Depends(get_app)):
+    return {"event_loop": app_inst.loop_monitor.stats(), "blocking_executor": app_inst.executor.stats()}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics(app_inst: BMSBridgeApp = Depends(get_app)):
+    # Prometheus text exposition format.
+    return PlainTextResponse(app_inst.metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/diagnostics/recorder")
+async def get_recorder_diagnostics(app_inst: BMSBridgeApp = Depends(get_app)):
+    return app_inst.recording_service.stats()
+
+def get_replay_adapter(app_inst: BMSBridgeApp) -> ReplayAdapter:
+    if app_inst.frame_source: raise HTTPException(status_code=404, detail="With server_workers > 1 the replay runs in the frame publisher process; use a single worker to inspect or seek it.")
+    if not isinstance(app_inst.bms_adapter, ReplayAdapter): raise HTTPException(status_code=404, detail="Not replaying a recording (start with --replay).")
+    return app_inst.bms_adapter
+
+@app.get("/api/diagnostics/replay")
+async def get_replay_diagnostics(app_inst: BMSBridgeApp = Depends(get_app)):
+    return await app_inst.executor.run(get_replay_adapter(app_inst).stats)
+
+@app.post("/api/diagnostics/replay/seek")
+async def seek_replay(request: ReplaySeekRequest, app_inst: BMSBridgeApp = Depends(get_app)):
+    """Jumps playback to `position`; playback continues from there at the replay speed."""
+    adapter = get_replay_adapter(app_inst)
+    if not math.isfinite(request.position) or request.position < 0: raise HTTPException(status_code=400, detail="'position' must be a number of seconds, 0 or more.")
+    await app_inst.executor.run(adapter.seek, request.position)
+    return await app_inst.executor.run(adapter.stats)
+
 @app.websocket("/ws/flight_data")
 async def websocket_flight_data(websocket: WebSocket, app_inst: BMSBridgeApp = Depends(get_app)):
-    if not await app_inst.websocket_manager.connect(websocket): return
+    # Optional query parameters: mode=full|delta|status (status: no frames, only events and a status per second), fields=a,b,c and groups=ded,rwr (the initial subscription),
+    # interval=<seconds> (this client's minimum time between frames), format=json|msgpack|cbor|packed
+    # (or a bms.<format> subprotocol). Frames carry seq and sampled_at; {"type": "ack", "seq": N} after showing
+    # one feeds the per-client latency stats.
+    query = websocket.query_params
     try:
-        while True:
-            data = app_inst.bms_adapter.get_all_data()
-            await websocket.send_json({"success": bool(data), "data": data or None, "error": "No data from BMS" if not data else ""})
-            await asyncio.sleep(app_inst.config.websocket_update_interval)
-    except WebSocketDisconnect: app_inst.websocket_manager.disconnect(websocket)
-    except Exception as e: logger.error(f"WebSocket error: {e}"); app_inst.websocket_manager.disconnect(websocket)
+        mode = StreamMode(query.get("mode", StreamMode.FULL.value))
+        fields = app_inst.subscription_catalog.resolve([f for f in query.get("fields", "").split(",") if f], [g for g in query.get("groups", "").split(",") if g])
+        interval = float(query.get("interval", 0.0))
+        if not math.isfinite(interval): raise ValueError("'interval' must be a finite number of seconds.")
+        wire_format, subprotocol = negotiate_format(query.get("format"), websocket.scope.get("subprotocols", []))
+        if wire_format == WireFormat.PACKED and mode == StreamMode.DELTA: raise ValueError("The packed format always sends complete frames; use mode=full.")
+    except ValueError as e:  # Also covers SubscriptionError
+        await websocket.close(code=1008, reason=str(e)[:120]); return
+    client = await app_inst.websocket_manager.connect(websocket, mode, fields, interval, wire_format, subprotocol)
+    if not client: return
+    tasks = [asyncio.create_task(client.send_loop()), asyncio.create_task(client.receive_loop(app_inst.websocket_manager.handle_message))]
+    try:
+        # A new client gets the last sampled frame right away instead of waiting a full tick.
+        if mode != StreamMode.STATUS and app_inst.flight_data_sampler.latest_frame: client.offer(app_inst.flight_data_sampler.latest_frame)
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if (e := task.exception()) and not isinstance(e, WebSocketDisconnect): logger.error(f"WebSocket error: {e}")
+    finally:
+        for task in tasks: task.cancel()
+        app_inst.websocket_manager.disconnect(client)
 
-@app.get("/api/briefing/html", response_class=HTMLResponse)
-async def get_html_briefing(app_inst: BMSBridgeApp = Depends(get_app)):
+@app.websocket("/ws/drawing")
+async def websocket_drawing(websocket: WebSocket, app_inst: BMSBridgeApp = Depends(get_app)):
+    # Binary HUD/RWR/HMS command buffers (see DrawingFrame). Optional query parameter: interval=<seconds>,
+    # never below drawing_stream_interval.
     try:
-        briefings_dir = app_inst.path_service.find_briefings_dir(app_inst.bms_adapter)
-        if not briefings_dir or not briefings_dir.is_dir():
-            raise HTTPException(status_code=404, detail="BMS Briefings directory not found. Is Falcon BMS installed?")
-        
-        search_pattern = str(briefings_dir / "*.html")
-        html_files = glob.glob(search_pattern)
-
-        if not html_files:
-            logger.warning(f"No HTML briefing files found in: {briefings_dir}")
-            raise HTTPException(status_code=404, detail="No HTML briefing files found.")
-
-        latest_briefing_path = max(html_files, key=os.path.getmtime)
-        logger.info(f"Serving HTML briefing from: {latest_briefing_path}")
-
-        with open(latest_briefing_path, 'r', encoding='utf-8', errors='ignore') as f:
-            soup = BeautifulSoup(f, 'lxml')
-        
-        body_tag = soup.find('body')
-        
-        if not body_tag:
-            logger.error(f"Could not find <body> tag in briefing file: {latest_briefing_path}")
-            raise HTTPException(status_code=500, detail="Could not find <body> tag in briefing file.")
-            
-        body_content = body_tag.decode_contents()
-        
-        return HTMLResponse(content=body_content)
-
-    except HTTPException:
-        raise
-    except Exception:
-        logger.error("An unexpected error occurred in get_html_briefing", exc_info=True)
-        raise HTTPException(status_code=500, detail="An internal server error occurred while processing the briefing.")
+        interval = float(websocket.query_params.get("interval", 0.0))
+        if not math.isfinite(interval): raise ValueError("'interval' must be a finite number of seconds.")
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)[:120]); return
+    stream = app_inst.drawing_stream
+    client = await stream.connect(websocket, interval)
+    if not client: return
+    tasks = [asyncio.create_task(client.send_loop()), asyncio.create_task(client.receive_loop(stream.handle_message))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if (e := task.exception()) and not isinstance(e, WebSocketDisconnect): logger.error(f"Drawing WebSocket error: {e}")
+    finally:
+        for task in tasks: task.cancel()
+        stream.disconnect(client)
+
+@app.get("/api/briefing/html", response_class=HTMLResponse)
+async def get_html_briefing(request: Request, app_inst: BMSBridgeApp = Depends(get_app)):
+    # Kept current by BriefingWatcher; nothing is read or parsed here.
+    briefing = app_inst.html_briefing_service.get()
+    headers = {"ETag": briefing.etag, "Last-Modified": http_date(briefing.last_modified), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if is_not_modified(request, briefing.etag, briefing.last_modified): return Response(status_code=304, headers=headers)
+    encoding = pick_encoding(request, app_inst.html_briefing_service.ENCODINGS)
+    if encoding: headers["Content-Encoding"] = encoding
+    return HTMLResponse(content=briefing.variants[encoding], headers=headers)
 
 @app.get("/{filepath:path}")
-async def serve_static_or_app(filepath: str = "", app_inst: BMSBridgeApp = Depends(get_app)):
-    logger.info(f"--- Static File Request Received --- path: {filepath}")
-    if not filepath: logger.info("Filepath empty, serving index.html"); return FileResponse(BASE_DIR / "templates" / "index.html")
+async def serve_static_or_app(request: Request, filepath: str = "", v: Optional[str] = None, app_inst: BMSBridgeApp = Depends(get_app)):
+    assets = app_inst.static_assets
+    asset = assets.get(filepath) if filepath else None
+    if filepath and asset is None:
+        asset = await app_inst.executor.run(assets.add, filepath)  # New since the last rescan, or not a file at all
+    if asset is None:
+        body, etag = assets.index_page()
+        if not body: return FileResponse(BASE_DIR / "templates" / "index.html")
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag): return Response(status_code=304, headers=headers)
+        return HTMLResponse(content=body, headers=headers)
+    # A ?v=<hash> URL names one exact version of the file, so it can be cached for good; plain URLs revalidate.
+    headers = {"ETag": asset.etag, "Cache-Control": "public, max-age=31536000, immutable" if v == asset.version else "no-cache"}
+    if etag_matches(request, asset.etag): return Response(status_code=304, headers=headers)
+    if not asset.variants: return FileResponse(asset.path, media_type=asset.media_type, headers=headers)
+    headers["Vary"] = "Accept-Encoding"
+    encoding = pick_encoding(request, assets.ENCODINGS)
+    if encoding: headers["Content-Encoding"] = encoding
+    return Response(content=asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+def serve_with_workers(config):
+    """server_workers > 1: one publisher process reads BMS shared memory into the frame ring, uvicorn workers serve clients from it."""
+    ring = FrameRing.create(FramePublisher.RING_SLOTS, FramePublisher.RING_SLOT_SIZE)
+    replay = (ARGS.replay, ARGS.replay_speed, not ARGS.replay_once, ARGS.replay_start) if ARGS.replay else None
+    publisher = multiprocessing.Process(target=run_publisher, args=(BASE_DIR, ring.name, replay), name="bms-frame-publisher", daemon=True)
+    publisher.start()
+    os.environ[FRAME_RING_ENV] = ring.name  # Inherited by the workers
     try:
-        base_dir = BASE_DIR.resolve(); full_path = (base_dir / filepath).resolve()
-        logger.info(f"Resolved absolute path: {full_path}")
-        if not str(full_path).startswith(str(base_dir)): logger.warning(f"SECURITY: Path traversal attempt! Requested path: {full_path}"); raise HTTPException(status_code=403)
-        is_allowed = any(str(full_path).startswith(str((base_dir / p).resolve())) for p in app_inst.security_config.allowed_static_paths)
-        if is_allowed and full_path.is_file():
-            logger.info(f">>> Serving STATIC FILE: {full_path}")
-            return FileResponse(full_path, media_type="application/javascript" if full_path.suffix == ".mjs" else None)
-        logger.warning(f"Path not allowed or not a file. Allowed: {is_allowed}, Is file: {full_path.is_file()}")
-    except Exception as e: logger.error("Exception in static file serving", exc_info=True)
-    logger.warning(">>> Fallback: Serving INDEX.HTML")
-    return FileResponse(BASE_DIR / "templates" / "index.html")
-
-    
+        uvicorn.run("main:app", app_dir=str(BASE_DIR), host=config.server_host, port=config.server_port, workers=config.server_workers, log_config="log_config.yaml")
+    finally:
+        publisher.terminate(); publisher.join(5)
+        ring.close()
+
 if __name__ == "__main__":
     multiprocessing.freeze_support()
     config = ConfigManager(BASE_DIR).load_config()
+    if config.server_workers > 1:
+        serve_with_workers(config); sys.exit(0)
     uvicorn.run(
         app,
         host=config.server_host,
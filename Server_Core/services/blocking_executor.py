@@ -0,0 +1,36 @@
+# File: services/blocking_executor.py
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class BlockingExecutor:
+    """
+    The one place where blocking work (shared memory reads, process scans, filesystem access,
+    HTML parsing) runs. A fixed number of worker threads keeps the event loop free for WebSockets.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bms-blocking")
+        self._in_flight = 0
+        self._completed = 0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `func(*args, **kwargs)` on a worker thread and awaits the result."""
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("Blocking executor shut down.")
+
+    def stats(self) -> Dict[str, Any]:
+        # in_flight above max_workers means calls are queued waiting for a free thread.
+        return {"max_workers": self.max_workers, "in_flight": self._in_flight, "completed": self._completed}
@@ -1,22 +1,13 @@
 # File: services/briefing_service.py - CORRECTED
 import re
-import time
 import logging
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from config.settings import ConfigManager
-from adapters.bms_adapter import BMSAdapter
 
 logger = logging.getLogger(__name__)
 
-class BriefingCache:
-    def __init__(self, ttl_seconds: int): self.ttl_seconds = ttl_seconds; self._cache: Dict[str, Any] = {}; self._cache_time: float = 0
-    def get(self) -> Optional[Dict[str, Any]]:
-        if time.time() - self._cache_time < self.ttl_seconds: return self._cache
-        return None
-    def set(self, data: Dict[str, Any]): self._cache = data; self._cache_time = time.time()
-
 class BriefingParser:
     SECTION_HEADERS = ["Mission Overview:", "Pilot Roster:", "Package Elements:", "Threat Analysis:", "Steerpoints:", "Comm Ladder:", "Iff", "Link 16", "Ordnance:", "Weather:", "Support:", "Emergency Procedures:"]
     @staticmethod
@@ -86,54 +77,47 @@ class BriefingParser:
         return {"pages": [p for p in pages if p["sections"]]}
 
 class BriefingService:
+    """Parsed briefing.txt, kept in memory. BriefingWatcher calls refresh() when the briefings directory changes."""
+    BRIEFING_FILE = "briefing.txt"
+
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
         self.parser = BriefingParser()
-        self.cache = BriefingCache(config_manager.load_config().file_cache_ttl_seconds)
-        self._last_file_path: Optional[str] = None
-        self._last_file_mtime: float = 0.0
+        self._data: Optional[Dict[str, Any]] = None
+        self._error = "Briefing file not found"
+        self._key: Optional[Tuple[str, int, int]] = None
+        self.hits = 0    # refresh() calls that found briefing.txt unchanged
+        self.misses = 0  # ...and those that had to re-parse it
 
-    def _find_briefing_file(self, bms_adapter: BMSAdapter) -> Optional[str]:
-        briefing_file_path = None
+    def refresh(self, briefings_dir: Optional[Path]) -> bool:
+        """Re-parses briefing.txt if it appeared, disappeared or was modified. Returns True if the data changed. Blocking."""
+        briefing_path = briefings_dir / self.BRIEFING_FILE if briefings_dir else None
         try:
-            if bms_adapter.is_connected():
-                all_data = bms_adapter.get_all_data()
-                if all_data and (live_dir := all_data.get("BmsBriefingsDirectory")):
-                    briefing_path = Path(live_dir.strip()) / "briefing.txt"
-                    if briefing_path.is_file():
-                        briefing_file_path = str(briefing_path)
-        except Exception: pass
-
-        if not briefing_file_path:
-            # cached = self.config_manager.get_cached_paths().briefing_file_path
-            # if cached and Path(cached).is_file(): briefing_file_path = cached
-            pass
-        
-        return briefing_file_path
-
-    def get_briefing_data(self, bms_adapter: BMSAdapter) -> Dict[str, Any]:
-        briefing_file_path = self._find_briefing_file(bms_adapter)
-        if not briefing_file_path:
-            return {"success": False, "error": "Briefing file not found"}
+            stat = briefing_path.stat() if briefing_path else None
+        except OSError:
+            stat = None
+        if stat is None:
+            changed = self._key is not None
+            self._data, self._error, self._key = None, "Briefing file not found", None
+            return changed
 
+        key = (str(briefing_path), stat.st_mtime_ns, stat.st_size)
+        if key == self._key:
+            self.hits += 1
+            return False
+        self.misses += 1
+        self._key = key
         try:
-            current_mtime = Path(briefing_file_path).stat().st_mtime
-            if briefing_file_path == self._last_file_path and current_mtime == self._last_file_mtime:
-                cached_data = self.cache.get()
-                if cached_data:
-                    logger.info("Returning cached briefing data.")
-                    return {"success": True, "data": cached_data, "cached": True}
-
-            logger.info(f"Parsing new or updated briefing file: {briefing_file_path}")
-            content = Path(briefing_file_path).read_text(encoding='utf-8', errors='ignore')
-            parsed_data = self.parser.parse_briefing(content)
-            self.cache.set(parsed_data)
-            self._last_file_path = briefing_file_path
-            self._last_file_mtime = current_mtime
-            
-            # self.config_manager.update_cached_paths(briefing_file_path, None)
-
-            return {"success": True, "data": parsed_data, "cached": False}
+            logger.info(f"Parsing new or updated briefing file: {briefing_path}")
+            content = briefing_path.read_text(encoding='utf-8', errors='ignore')
+            self._data = self.parser.parse_briefing(content)
+            # self.config_manager.update_cached_paths(str(briefing_path), None)
         except Exception as e:
             logger.error(f"Failed to process briefing file: {e}")
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            self._data, self._error = None, str(e)
+        return True
+
+    def get_briefing_data(self) -> Dict[str, Any]:
+        if self._data is None:
+            return {"success": False, "error": self._error}
+        return {"success": True, "data": self._data, "cached": True}
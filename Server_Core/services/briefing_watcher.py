@@ -0,0 +1,92 @@
+# File: services/briefing_watcher.py
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Union
+
+from adapters.bms_adapter import BMSAdapter
+from adapters.frame_ring import RingFrameSource
+from services.blocking_executor import BlockingExecutor
+from services.briefing_service import BriefingService
+from services.file_watcher import DirectoryWatcher, open_watcher
+from services.html_briefing_service import HtmlBriefingService
+from services.path_service import PathService
+from services.websocket_manager import WebSocketManager
+
+logger = logging.getLogger(__name__)
+
+class BriefingWatcher:
+    """
+    Keeps the briefing services current: watches the briefings directory, re-parses briefing.txt and the
+    newest .html in the background when they change and tells WebSocket clients with a "briefing_updated" message.
+    """
+    RETARGET_INTERVAL = 5.0  # How often the directory itself is re-resolved (BMS may switch theatre or install)
+    SETTLE_DELAY = 0.25      # BMS writes several files per briefing; let it finish before re-reading
+
+    def __init__(self, path_service: PathService, bms_source: Union[BMSAdapter, RingFrameSource], briefing_service: BriefingService, html_briefing_service: HtmlBriefingService,
+                 websocket_manager: WebSocketManager, executor: BlockingExecutor, poll_interval: float):
+        self.path_service = path_service
+        self.bms_source = bms_source
+        self.briefing_service = briefing_service
+        self.html_briefing_service = html_briefing_service
+        self.websocket_manager = websocket_manager
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.directory: Optional[Path] = None
+        self._watcher: Optional[DirectoryWatcher] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="briefing-watcher")
+
+    async def stop(self):
+        if self._task is None: return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._close_watcher()
+
+    def _close_watcher(self):
+        if self._watcher: self._watcher.close(); self._watcher = None
+
+    async def _run(self):
+        while True:
+            try:
+                directory = await self.executor.run(self.path_service.find_briefings_dir, self.bms_source)
+                if directory != self.directory:
+                    await self._retarget(directory)
+                if self._watcher is None:
+                    await asyncio.sleep(self.RETARGET_INTERVAL)
+                    continue
+                try:
+                    await asyncio.wait_for(self._watcher.wait(), self.RETARGET_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+                await asyncio.sleep(self.SETTLE_DELAY)
+                await self._reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error("Briefing watcher iteration failed", exc_info=True)
+                await asyncio.sleep(self.RETARGET_INTERVAL)
+
+    async def _retarget(self, directory: Optional[Path]):
+        self._close_watcher()
+        self.directory = directory
+        if directory is not None:
+            # Watch first, then read, so a change in between is not missed.
+            self._watcher = await open_watcher(directory, self.executor, self.poll_interval)
+            logger.info(f"Watching briefings directory {directory} ({type(self._watcher).__name__}).")
+        else:
+            logger.warning("No briefings directory found; briefings are unavailable until BMS provides one.")
+        await self._reload()
+
+    async def _reload(self):
+        text_changed = await self.executor.run(self.briefing_service.refresh, self.directory)
+        html_changed = await self.executor.run(self.html_briefing_service.refresh, self.directory)
+        if text_changed or html_changed:
+            self.websocket_manager.broadcast_control({"type": "briefing_updated", "text": text_changed, "html": html_changed})
@@ -0,0 +1,156 @@
+# File: services/drawing_stream.py
+import asyncio
+import itertools
+import logging
+import struct
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import WebSocket
+
+from adapters.bms_adapter import BMSAdapter
+from adapters.frame_ring import RingFrameSource
+from services.snapshot_consumers import SnapshotConsumers
+from services.tick_scheduler import TickScheduler
+from services.websocket_manager import ClientConnection
+
+logger = logging.getLogger(__name__)
+
+class DrawingFrame:
+    """
+    One binary /ws/drawing message:
+        header   : magic 'BMSD' (4 bytes), seq (u32), flags (u8, bit 0 = drawing data present), 3 pad bytes
+        body     : the DrawingData area as BMS wrote it: u32 VersionNum, then for HUD, RWR and HMS a u32 length,
+                   the command bytes and a NUL
+    The body is sent unparsed, so building a frame is one concatenation.
+    """
+    MAGIC = b"BMSD"
+    HEADER = struct.Struct("<4sIB3x")
+
+    def __init__(self, seq: int, raw: Optional[bytes]):
+        self.seq = seq
+        self.created_at = time.monotonic()
+        self.payload = self.HEADER.pack(self.MAGIC, seq & 0xFFFFFFFF, 1 if raw is not None else 0) + (raw or b"")
+
+class DrawingClient(ClientConnection):
+    """
+    A /ws/drawing client: the outbox, rate limit and delivery stats of a flight data client, but every frame is the
+    same prebuilt binary payload and the interval never goes below the stream's own.
+    """
+    MAX_INTERVAL = 1.0
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket: WebSocket, interval: float, min_interval: float):
+        self.min_interval = min_interval
+        super().__init__(websocket, interval=interval)
+
+    def set_interval(self, interval: float):
+        super().set_interval(interval)
+        self.interval = max(self.interval, self.min_interval)
+
+    def render(self, frame: DrawingFrame) -> bytes:
+        return frame.payload
+
+    def describe(self) -> Dict[str, Any]:
+        address = self.websocket.client
+        return {"id": self.id, "client": f"{address.host}:{address.port}" if address else None, "interval": self.interval, **self.stats.to_dict()}
+
+class DrawingStream:
+    """
+    Serves the DrawingData area to /ws/drawing clients, separately from the flight data stream: at up to 1 / `interval`
+    Hz, only while someone is connected, and only sending when the command buffers changed. The area is not read here:
+    while clients are connected the sampler includes it in its snapshots, at least every `interval`.
+    """
+    NAME = "drawing"
+
+    def __init__(self, bms_source: Union[BMSAdapter, RingFrameSource], consumers: SnapshotConsumers, interval: float, max_connections: int):
+        self.bms_source = bms_source
+        self.consumers = consumers
+        self.interval = interval  # Also the smallest interval a client may ask for
+        self.scheduler = TickScheduler(interval)
+        self.max_connections = max_connections
+        self.clients: List[DrawingClient] = []
+        self.latest_frame: Optional[DrawingFrame] = None
+        self.frames_published = 0
+        self.reads_skipped = 0
+        self._last_raw: Optional[bytes] = None
+        self._seq = 0
+        self._has_clients = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="drawing-stream")
+
+    async def stop(self):
+        if self._task is None: return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def connect(self, websocket: WebSocket, interval: float) -> Optional[DrawingClient]:
+        if len(self.clients) >= self.max_connections:
+            await websocket.close(code=1008, reason="Too many connections")
+            return None
+        await websocket.accept()
+        client = DrawingClient(websocket, interval, self.interval)
+        self.clients.append(client)
+        self.consumers.demand(self.NAME, self.interval, {"drawing"})
+        self._has_clients.set()
+        if self.latest_frame: client.offer(self.latest_frame)
+        logger.info(f"Drawing WebSocket #{client.id} connected at {client.interval}s. Active: {len(self.clients)}")
+        return client
+
+    def disconnect(self, client: DrawingClient):
+        if client in self.clients:
+            self.clients.remove(client)
+            if not self.clients:
+                self._has_clients.clear()
+                self.consumers.release(self.NAME)
+            logger.info(f"Drawing WebSocket #{client.id} disconnected. Active: {len(self.clients)}")
+
+    def handle_message(self, client: DrawingClient, message: Any):
+        # The only client message is {"type": "set_rate", "interval": <seconds>}, like on /ws/flight_data.
+        if isinstance(message, dict) and message.get("type") == "set_rate":
+            try:
+                client.set_interval(message.get("interval", 0.0))
+            except (TypeError, ValueError):
+                client.offer_control({"type": "error", "error": "'interval' must be a number of seconds."})
+                return
+            client.offer_control({"type": "rate", "interval": client.interval})
+        else:
+            client.offer_control({"type": "error", "error": "Unsupported message type. Expected 'set_rate'."})
+
+    async def _run(self):
+        while True:
+            if not self.clients:
+                await self._has_clients.wait()
+                self.scheduler.reset()
+            # Deadlines missed while the loop was busy are skipped, not caught up with a burst of frames.
+            await self.scheduler.wait()
+            try:
+                self.sample()
+            except Exception:
+                logger.error("Unexpected error in drawing stream", exc_info=True)
+
+    def sample(self) -> Optional[DrawingFrame]:
+        """Looks at the drawing area in the latest snapshot; a frame is published only if the bytes differ from the last one."""
+        snapshot = self.bms_source.latest_snapshot()
+        raw = snapshot.extra_raw.get("drawing") if snapshot else None
+        if raw == self._last_raw and self.latest_frame is not None:
+            self.reads_skipped += 1
+            return None
+        self._last_raw = raw
+        self._seq += 1
+        frame = self.latest_frame = DrawingFrame(self._seq, raw)
+        for client in self.clients:
+            client.offer(frame)
+        self.frames_published += 1
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        return {"interval": self.interval, "scheduler": self.scheduler.stats(), "frames_published": self.frames_published, "reads_skipped": self.reads_skipped,
+                "seq": self._seq, "clients": [client.describe() for client in self.clients]}
@@ -0,0 +1,103 @@
+# File: services/file_watcher.py
+import abc
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from services.blocking_executor import BlockingExecutor
+
+logger = logging.getLogger(__name__)
+
+class DirectoryWatcher(abc.ABC):
+    """Waits for changes to the files directly inside one directory."""
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    @abc.abstractmethod
+    async def wait(self):
+        """Returns once something in the directory may have changed. Safe to cancel."""
+
+    def close(self):
+        pass
+
+class InotifyWatcher(DirectoryWatcher):
+    """Linux inotify through ctypes. The descriptor is registered with the event loop, so waiting costs no thread."""
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    # Completed writes and renames, not every IN_MODIFY, so a file being written triggers once.
+    MASK = 0x008 | 0x040 | 0x080 | 0x100 | 0x200 | 0x400 | 0x800  # CLOSE_WRITE, MOVED_FROM/TO, CREATE, DELETE, DELETE_SELF, MOVE_SELF
+    _libc = None
+
+    def __init__(self, directory: Path):
+        super().__init__(directory)
+        if InotifyWatcher._libc is None:
+            InotifyWatcher._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK) < 0:
+            errno = ctypes.get_errno(); os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(self._fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(self._fd)
+        # Only "something changed" matters, so the queued events are drained without being parsed.
+        try:
+            while os.read(self._fd, 4096): pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        if self._fd >= 0: os.close(self._fd); self._fd = -1
+
+class PollingWatcher(DirectoryWatcher):
+    """Portable fallback: compares (mtime, size) of the directory's files every `interval` seconds."""
+    def __init__(self, directory: Path, executor: BlockingExecutor, interval: float):
+        super().__init__(directory)
+        self.executor = executor
+        self.interval = interval
+        self._snapshot: Optional[Dict[str, Tuple[int, int]]] = None
+        self._next_poll_at = 0.0
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return {e.name: (e.stat().st_mtime_ns, e.stat().st_size) for e in entries if e.is_file()}
+        except OSError:
+            return {}
+
+    async def prime(self):
+        self._snapshot = await self.executor.run(self._take_snapshot)
+        self._next_poll_at = time.monotonic() + self.interval
+
+    async def wait(self):
+        while True:
+            # Scheduled by deadline, so a caller that cancels and re-waits does not keep pushing the next scan back.
+            await asyncio.sleep(max(0.0, self._next_poll_at - time.monotonic()))
+            self._next_poll_at = time.monotonic() + self.interval
+            snapshot = await self.executor.run(self._take_snapshot)
+            if snapshot != self._snapshot:
+                self._snapshot = snapshot
+                return
+
+async def open_watcher(directory: Path, executor: BlockingExecutor, poll_interval: float) -> DirectoryWatcher:
+    """inotify where available, polling otherwise. The returned watcher already tracks the current state."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable for {directory} ({e}), falling back to polling.")
+    watcher = PollingWatcher(directory, executor, poll_interval)
+    await watcher.prime()
+    return watcher
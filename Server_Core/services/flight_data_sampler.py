@@ -0,0 +1,194 @@
+# File: services/flight_data_sampler.py
+import asyncio
+import logging
+import time
+from typing import AbstractSet, Dict, Any, Optional, Tuple, Union
+
+from adapters.bms_adapter import BMSAdapter, FlightSnapshot
+from adapters.frame_ring import RingFrameSource
+from config.settings import TickOverrunPolicy
+from services.blocking_executor import BlockingExecutor
+from services.flight_frame import FlightFrame, diff_fields
+from services.metrics import PipelineMetrics
+from services.snapshot_consumers import SnapshotConsumers
+from services.tick_scheduler import SimCadence, TickScheduler
+from services.wire_formats import PackedLayouts
+from services.websocket_manager import WebSocketManager
+
+logger = logging.getLogger(__name__)
+
+class FlightDataSampler:
+    """
+    Reads BMS shared memory once per tick and fans the frame out to all WebSocket clients. Ticks are on absolute
+    deadlines (see TickScheduler), so the read, decode and broadcast do not add to the period.
+
+    This tick is the only place the server takes snapshots. It runs faster than `interval` while one of `consumers`
+    (recorder, drawing stream) needs that; clients still get a frame only every `interval`.
+
+    In adaptive mode the interval follows the sim's own FlightData update rate, as seen from which reads changed:
+    about two reads per sim update, within [min_interval, interval], and back to `interval` while the sim is paused.
+    """
+    # Without clients, shared memory is only probed (nothing decoded) this often, to keep health status current.
+    IDLE_PROBE_INTERVAL = 1.0
+    # While shared memory does not change, clients get a keepalive this often instead of repeated frames.
+    KEEPALIVE_INTERVAL = 1.0
+    # Adaptive mode re-evaluates the interval this often.
+    ADAPT_INTERVAL = 1.0
+    # STATUS clients hear whether BMS is readable at most this often (at least as often as the idle probes run).
+    STATUS_INTERVAL = 1.0
+
+    def __init__(self, bms_adapter: Union[BMSAdapter, RingFrameSource], websocket_manager: WebSocketManager, executor: BlockingExecutor, interval: float, keyframe_interval: int,
+                 metrics: Optional[PipelineMetrics] = None, overrun_policy: TickOverrunPolicy = TickOverrunPolicy.SKIP,
+                 adaptive: bool = False, min_interval: Optional[float] = None):
+        self.bms_adapter = bms_adapter
+        self.consumers = SnapshotConsumers()
+        self.executor = executor
+        self.websocket_manager = websocket_manager
+        self.interval = interval
+        self.max_interval = interval
+        self.min_interval = min(min_interval or interval, interval)
+        self.adaptive = adaptive
+        self.scheduler = TickScheduler(interval, overrun_policy)
+        self.cadence = SimCadence()
+        self._adapted_at = 0.0
+        self.keyframe_interval = keyframe_interval
+        self.metrics = metrics
+        self.packed_layouts = PackedLayouts(bms_adapter.field_specs())
+        self.latest_frame: Optional[FlightFrame] = None
+        self.bms_connected = False
+        self._last_read_at = 0.0
+        self._last_success_at: Optional[float] = None  # Unix time of the last read that reached shared memory
+        self._status_sent_at = 0.0
+        self._seq = 0
+        # Raw bytes and field set of the last published read; an identical read is skipped.
+        self._last_raw: Optional[bytes] = None
+        self._last_fields: Optional[AbstractSet[str]] = None
+        self._last_sent_at = 0.0
+        self._publish_at = 0.0  # Monotonic time the next frame is due
+        self.frames_published = 0
+        self.frames_skipped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="flight-data-sampler")
+            logger.info(f"Flight data sampler started with interval {self.interval}s ({self.scheduler.policy.value} on overrun"
+                        f"{f', adaptive down to {self.min_interval}s' if self.adaptive else ''}).")
+
+    async def stop(self):
+        if self._task is None: return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Flight data sampler stopped.")
+
+    async def _run(self):
+        while True:
+            await self.scheduler.wait()
+            try:
+                if self.websocket_manager.active_connections or self.consumers.active:
+                    await self.sample()
+                    if self.adaptive: self._adapt()
+                elif time.monotonic() - self._last_read_at >= self.IDLE_PROBE_INTERVAL:
+                    await self.probe()
+            except Exception:
+                logger.error("Unexpected error in flight data sampler", exc_info=True)
+            self._retime()
+
+    def _retime(self):
+        """Ticks every `interval`, or faster while a consumer needs snapshots more often. Only moves the grid on a change."""
+        interval = min(self.interval, self.consumers.interval() or self.interval)
+        if interval != self.scheduler.interval: self.scheduler.set_interval(interval)
+
+    def _read(self, fields: Optional[AbstractSet[str]], due: bool, last_raw: Optional[bytes]) -> Tuple[Optional[FlightSnapshot], Optional[bytes], Optional[Dict[str, Any]]]:
+        """Worker thread: takes the tick's snapshot and, if a frame is due, decodes it unless unchanged (see decode_changed)."""
+        snapshot = self.bms_adapter.take_snapshot(frozenset(fields or ()) | self.consumers.areas())
+        if snapshot is None or not due: return snapshot, None, None
+        raw, data = self.bms_adapter.decode_changed(snapshot, fields, last_raw)
+        return snapshot, raw, data
+
+    async def sample(self) -> Optional[FlightFrame]:
+        """
+        Takes one snapshot (on a worker thread), hands it to the consumers and, when a frame is due, broadcasts it.
+        Returns None if no frame was due or the raw memory was identical to the last published read: nothing is decoded or sent.
+        """
+        # Only the union of all client subscriptions is decoded. A changed subscription always needs a fresh decode.
+        fields = self.websocket_manager.requested_fields()
+        now = time.monotonic()
+        due = bool(self.websocket_manager.active_connections) and now >= self._publish_at - self.scheduler.interval / 2
+        can_skip = self.latest_frame is not None and fields == self._last_fields
+        started = time.perf_counter()
+        snapshot, raw, data = await self.executor.run(self._read, fields, due, self._last_raw if can_skip else None)
+        if self.metrics and snapshot is not None: self.metrics.sample.observe(time.perf_counter() - started)
+        sampled_at = snapshot.sampled_at if snapshot else time.time()
+        self._record_read(snapshot is not None, sampled_at)
+        if snapshot is not None and self.consumers.listening: await self.executor.run(self.consumers.notify, snapshot)
+        if not due: return None
+        self._publish_at = now + self.interval
+        unchanged = raw == self._last_raw
+        if raw is not None: self.cadence.observe(not unchanged, self._last_read_at)
+        if can_skip and unchanged:  # Unchanged memory, or still disconnected
+            self.frames_skipped += 1
+            if time.monotonic() - self._last_sent_at >= self.KEEPALIVE_INTERVAL:
+                # The last frame's data was still current at this read, which the client uses for its staleness check.
+                self.websocket_manager.broadcast_control({"type": "keepalive", "seq": self._seq, "sampled_at": sampled_at})
+                self._last_sent_at = time.monotonic()
+            return None
+        self._last_raw, self._last_fields = raw, fields
+        return self.publish(data, sampled_at)
+
+    def _adapt(self):
+        """Moves the interval towards half the sim's update period; faster while every read sees new data."""
+        now = time.monotonic()
+        if now - self._adapted_at < self.ADAPT_INTERVAL: return
+        self._adapted_at = now
+        ratio = self.cadence.change_ratio()
+        if ratio is None: return
+        if ratio == 0.0: target = self.max_interval  # Sim paused or in the UI
+        elif ratio >= 0.95: target = self.interval * 0.8  # Reading no faster than the sim writes: probe downwards
+        elif self.cadence.period: target = self.cadence.period / 2
+        else: return
+        target = min(max(target, self.min_interval), self.max_interval)
+        if abs(target - self.interval) / self.interval < 0.1: return  # Not worth moving the schedule
+        logger.debug(f"Sampler interval {self.interval:.3f}s -> {target:.3f}s (sim period {self.cadence.period}, change ratio {ratio:.2f}).")
+        self.interval = target
+        self._retime()
+
+    async def probe(self) -> bool:
+        """Checks that shared memory is readable without decoding any field; the snapshot keeps latest_snapshot() current."""
+        snapshot = await self.executor.run(self.bms_adapter.take_snapshot, frozenset())
+        self._record_read(snapshot is not None, snapshot.sampled_at if snapshot else time.time())
+        return self.bms_connected
+
+    def _record_read(self, connected: bool, sampled_at: float):
+        self._last_read_at = time.monotonic()
+        if connected: self._last_success_at = sampled_at
+        if connected != self.bms_connected:
+            logger.info(f"BMS shared memory is now {'available' if connected else 'unavailable'}.")
+        self.bms_connected = connected
+        if self._last_read_at - self._status_sent_at >= self.STATUS_INTERVAL:
+            self._status_sent_at = self._last_read_at
+            self.websocket_manager.broadcast_status({"type": "status", "bms_connected": connected, "seq": self._seq, "sampled_at": self._last_success_at})
+
+    def publish(self, data: Optional[Dict[str, Any]], sampled_at: Optional[float] = None) -> FlightFrame:
+        """Wraps sampled data (read at Unix time `sampled_at`) into the next frame and hands it to every client. Runs on the event loop."""
+        self._seq += 1
+        previous: Optional[Dict[str, Any]] = self.latest_frame.data if self.latest_frame else None
+        # Periodic keyframes let delta clients resync even if a patch was lost on the client side.
+        is_keyframe = self._seq % self.keyframe_interval == 0
+        frame = FlightFrame(self._seq, data, diff_fields(previous, data), is_keyframe, self.packed_layouts, sampled_at)
+        self.latest_frame = frame
+        self.websocket_manager.broadcast(frame)
+        self.frames_published += 1
+        self._last_sent_at = time.monotonic()
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.frames_published + self.frames_skipped
+        period = self.cadence.period
+        return {"interval": self.interval, "frames_published": self.frames_published, "frames_skipped": self.frames_skipped,
+                "skipped_ratio": round(self.frames_skipped / total, 3) if total else None, "seq": self._seq,
+                "adaptive": self.adaptive, "sim_rate": round(1 / period, 2) if period else None, "scheduler": self.scheduler.stats(), "consumers": self.consumers.stats()}
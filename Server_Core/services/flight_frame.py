@@ -0,0 +1,82 @@
+# File: services/flight_frame.py
+import time
+from enum import Enum
+from typing import AbstractSet, Dict, Any, Optional, Tuple, Union
+
+from services.wire_formats import PackedLayouts, WireFormat, encode_message
+
+class StreamMode(str, Enum):
+    FULL = "full"    # Legacy: the whole merged dict on every tick
+    DELTA = "delta"  # A keyframe first, then only the fields that changed
+    STATUS = "status"  # No frames: server events and a status message per second, for connection indicators
+
+_MISSING = object()
+
+def project(data: Optional[Dict[str, Any]], fields: Optional[AbstractSet[str]]) -> Optional[Dict[str, Any]]:
+    """Restricts a frame dict to a subscription's fields (None = all fields)."""
+    if data is None or fields is None: return data
+    return {key: value for key, value in data.items() if key in fields}
+
+def diff_fields(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Returns the fields of `current` whose values differ from `previous`, or None if no patch is possible."""
+    if previous is None or current is None: return None
+    return {key: value for key, value in current.items() if previous.get(key, _MISSING) != value}
+
+class FlightFrame:
+    """
+    One sampled frame. Every wire representation is encoded at most once, on first use.
+    Every representation carries `seq` (increasing by one per published frame, so gaps are dropped frames) and
+    `sampled_at`, the Unix time of the shared memory read, so a client can tell how old what it shows is.
+    """
+    def __init__(self, seq: int, data: Optional[Dict[str, Any]], changes: Optional[Dict[str, Any]], is_keyframe: bool, layouts: Optional[PackedLayouts] = None,
+                 sampled_at: Optional[float] = None):
+        self.seq = seq
+        self.data = data
+        self.changes = changes
+        self.is_keyframe = is_keyframe
+        now = time.time()
+        self.sampled_at = sampled_at or now
+        # The same instant on the monotonic clock, for lag measurements on this server
+        self.created_at = time.monotonic() - max(0.0, now - self.sampled_at)
+        self.layouts = layouts
+        self._encoded: Dict[Tuple[str, Optional[AbstractSet[str]], WireFormat], Union[str, bytes]] = {}
+
+    def can_patch(self, previous: Optional["FlightFrame"]) -> bool:
+        """A delta needs the frame last sent to the client as its base; that need not be the preceding frame."""
+        return not self.is_keyframe and self.data is not None and previous is not None and previous.data is not None
+
+    def encode_delta(self, previous: "FlightFrame", fields: Optional[AbstractSet[str]] = None, wire_format: WireFormat = WireFormat.JSON) -> Union[str, bytes]:
+        """
+        Encodes the fields that changed since `previous`. Against the preceding frame that is the shared `changes`;
+        a client that skipped frames (rate limit, full outbox) gets the diff against the last frame it was sent.
+        """
+        key = (f"delta:{previous.seq}", fields, wire_format)
+        payload = self._encoded.get(key)
+        if payload is None:
+            if previous.seq == self.seq - 1 and self.changes is not None: changes = project(self.changes, fields)
+            else: changes = diff_fields(project(previous.data, fields), project(self.data, fields))
+            payload = encode_message(wire_format, {"type": "delta", "seq": self.seq, "sampled_at": self.sampled_at, "success": True, "data": changes})
+            self._encoded[key] = payload
+        return payload
+
+    def encode(self, kind: str, fields: Optional[AbstractSet[str]] = None, wire_format: WireFormat = WireFormat.JSON) -> Union[str, bytes]:
+        """Encodes the frame for one wire kind, subscription and format. Clients sharing all three share the payload."""
+        key = (kind, fields, wire_format)
+        payload = self._encoded.get(key)
+        if payload is None:
+            if wire_format == WireFormat.PACKED:
+                # Packed frames are always complete; the layout already selects the subscribed fields.
+                payload = self.layouts.get(fields).pack(self.seq, self.data, self.sampled_at)
+            else:
+                payload = encode_message(wire_format, self._build_message(kind, fields))
+            self._encoded[key] = payload
+        return payload
+
+    def _build_message(self, kind: str, fields: Optional[AbstractSet[str]]) -> Dict[str, Any]:
+        data = project(self.data, fields)
+        # A subscription-limited frame may legitimately be empty, so "no data" means None only.
+        connected = self.data is not None
+        base = {"success": connected, "data": data, "error": "" if connected else "No data from BMS", "seq": self.seq, "sampled_at": self.sampled_at}
+        if kind == "full": return base
+        if kind == "keyframe": return {"type": "keyframe", **base}
+        raise ValueError(f"Unknown frame kind: {kind}")
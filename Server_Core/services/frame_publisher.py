@@ -0,0 +1,112 @@
+# File: services/frame_publisher.py
+import asyncio
+import logging
+import marshal
+from pathlib import Path
+from typing import AbstractSet, Optional, Tuple
+
+from adapters.bms_adapter import BMSAdapter
+from adapters.frame_ring import FrameRing, pack_frame
+from adapters.replay_adapter import ReplayAdapter
+from config.settings import ConfigManager, TickOverrunPolicy
+from falcon_memreader import DrawingData, StringData
+from services.blocking_executor import BlockingExecutor
+from services.recording_service import RecordingService
+from services.snapshot_consumers import SnapshotConsumers
+from services.tick_scheduler import TickScheduler
+
+logger = logging.getLogger(__name__)
+
+ReplayOptions = Tuple[Path, float, bool, float]  # path, speed, loop, start (as given on the command line)
+
+class FramePublisher:
+    """
+    The one reader of BMS shared memory when the server runs several worker processes: decodes every field a
+    client can subscribe to once per changed read, and writes it into the frame ring for the workers. The extra
+    areas only while a worker's clients subscribe to them (see FrameRing.want_areas): OSB and Intellivibe decoded
+    with the rest, the drawing area raw, at least every `drawing_interval`. The heartbeat is written every tick.
+    Like FlightDataSampler, its tick is the only place this process takes snapshots, at least as often as `consumers` ask.
+    """
+    RING_SLOTS = 8
+    RING_SLOT_SIZE = 1024 * 1024 + DrawingData.area_size_max  # A full frame with all strings is well below 1 MB
+
+    def __init__(self, bms_adapter: BMSAdapter, ring: FrameRing, executor: BlockingExecutor, interval: float, drawing_interval: float,
+                 overrun_policy: TickOverrunPolicy = TickOverrunPolicy.SKIP):
+        self.bms_adapter = bms_adapter
+        self.ring = ring
+        self.executor = executor
+        self.interval = interval
+        self.drawing_interval = drawing_interval
+        self.scheduler = TickScheduler(interval, overrun_policy)
+        self.consumers = SnapshotConsumers()
+        self.fields: AbstractSet[str] = frozenset([*bms_adapter.field_names(), *StringData.id])
+        self._last_raw: Optional[bytes] = None
+        self._last_data = b""  # Marshalled flight data of the last frame, reused when only the drawing area changed
+        self._last_drawing: Optional[bytes] = None
+        self.frames_published = 0
+
+    async def run(self):
+        logger.info(f"Frame publisher writing to ring {self.ring.name} every {self.scheduler.interval}s.")
+        while True:
+            await self.scheduler.wait()
+            try:
+                await self.publish()
+            except Exception:
+                logger.error("Unexpected error in frame publisher", exc_info=True)
+            interval = min(self.interval, self.consumers.interval() or self.interval)
+            if interval != self.scheduler.interval: self.scheduler.set_interval(interval)
+
+    async def publish(self) -> bool:
+        """One snapshot; returns True if a new frame went into the ring."""
+        wanted = self.ring.wanted_areas()
+        if "drawing" in wanted: self.consumers.demand("drawing", self.drawing_interval, {"drawing"})
+        else: self.consumers.release("drawing")
+        fields = self.fields | (wanted - {"drawing"})  # The drawing area goes into the ring raw, not decoded
+        snapshot = await self.executor.run(self.bms_adapter.take_snapshot, fields | self.consumers.areas())
+        self.ring.set_status(snapshot is not None)
+        if snapshot is None: return False
+        raw, data = await self.executor.run(self.bms_adapter.decode_changed, snapshot, fields, self._last_raw)
+        drawing = snapshot.extra_raw.get("drawing")
+        published = data is not None or drawing != self._last_drawing
+        if data is not None:
+            self._last_data = marshal.dumps(data)  # Plain dicts, lists, strings and numbers; same interpreter on both ends
+            self._last_raw = raw
+        if published:
+            self.ring.publish(pack_frame(self._last_data, drawing), snapshot.sampled_at)
+            self._last_drawing = drawing
+            self.frames_published += 1
+        if self.consumers.listening: await self.executor.run(self.consumers.notify, snapshot)
+        return published
+
+def run_publisher(base_dir: Path, ring_name: str, replay: Optional[ReplayOptions] = None):
+    """Entry point of the publisher process (multiprocessing target, so it must stay importable at module level)."""
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: [%(name)s] :: %(message)s")
+    config = ConfigManager(base_dir).load_config()
+    if replay:
+        bms_adapter: BMSAdapter = ReplayAdapter(*replay, config.circuit_breaker_failure_threshold, config.circuit_breaker_reset_timeout)
+    else:
+        bms_adapter = BMSAdapter(failure_threshold=config.circuit_breaker_failure_threshold, reset_timeout=config.circuit_breaker_reset_timeout)
+    ring = FrameRing.attach(ring_name)
+    executor = BlockingExecutor(2)
+    # Adaptive worker samplers may go down to sampler_min_interval, so the ring has to be fed that fast.
+    interval = config.sampler_min_interval if config.sampler_adaptive else config.websocket_update_interval
+    publisher = FramePublisher(bms_adapter, ring, executor, interval, config.drawing_stream_interval, config.sampler_overrun_policy)
+    # The recorder runs here too: this is the process that reads shared memory continuously.
+    recording_service = RecordingService(publisher.consumers, executor, base_dir / config.recorder_directory, config.recorder_interval,
+                                         config.recorder_max_file_mb * 1024 * 1024)
+
+    async def main():
+        if config.recorder_enabled: recording_service.start()
+        try:
+            await publisher.run()
+        finally:
+            await recording_service.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown()
+        bms_adapter.close()
+        ring.close()
@@ -0,0 +1,72 @@
+# File: services/health_service.py
+import hashlib
+import json
+import logging
+import socket
+import time
+from enum import Enum
+from typing import Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+class ServerStatus(str, Enum): RUNNING = "RUNNING"; WARNING = "WARNING"; ERROR = "ERROR"
+class BmsStatus(str, Enum): CONNECTED = "CONNECTED"; NOT_CONNECTED = "NOT_CONNECTED"
+
+def get_server_ip() -> str:
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM); s.connect(("8.8.8.8", 80)); ip = s.getsockname()[0]; s.close(); return ip
+    except Exception: return "127.0.0.1"
+
+class ServerAddressResolver:
+    """Resolves the LAN address once and again only when the set of network interface addresses changes."""
+    def __init__(self, check_interval: float = 10.0):
+        self.check_interval = check_interval
+        self._fingerprint: Optional[int] = None
+        self._checked_at = 0.0
+        self._ip = "127.0.0.1"
+
+    @staticmethod
+    def _interfaces_fingerprint() -> Optional[int]:
+        try:
+            return hash(tuple(sorted((name, addr.address) for name, addrs in psutil.net_if_addrs().items() for addr in addrs)))
+        except Exception:
+            return None
+
+    def get_ip(self) -> str:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval: return self._ip
+        self._checked_at = now
+        fingerprint = self._interfaces_fingerprint()
+        if fingerprint is None or fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._ip = get_server_ip()
+            logger.info(f"Network interfaces changed, server address is now {self._ip}")
+        return self._ip
+
+class HealthService:
+    """
+    Builds the /api/health response from state that is already known (the sampler's connection
+    status and the cached server address) and keeps the encoded body and its ETag until that state changes.
+    """
+    def __init__(self, server_port: int, address_resolver: ServerAddressResolver):
+        self.server_port = server_port
+        self.address_resolver = address_resolver
+        self._key: Optional[Tuple[bool, str]] = None
+        self._body = b""
+        self._etag = ""
+
+    def get(self, bms_connected: bool) -> Tuple[bytes, str]:
+        """Returns the encoded health body and its ETag."""
+        key = (bms_connected, self.address_resolver.get_ip())
+        if key != self._key:
+            self._key = key
+            self._body = json.dumps({
+                "server_status": ServerStatus.RUNNING if bms_connected else ServerStatus.WARNING,
+                "bms_status": BmsStatus.CONNECTED if bms_connected else BmsStatus.NOT_CONNECTED,
+                "server_address": f"http://{key[1]}:{self.server_port}",
+                "server_message": "OK" if bms_connected else "BMS Shared Memory not available. Is the simulator in 3D?"
+            }).encode()
+            self._etag = f'"{hashlib.sha1(self._body).hexdigest()[:16]}"'
+        return self._body, self._etag
@@ -0,0 +1,87 @@
+# File: services/html_briefing_service.py
+import gzip
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from fastapi import HTTPException
+
+# Optional: brotli is preferred over gzip when the package is installed and the client accepts it.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+class CachedBriefing(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+    etag: str
+    last_modified: float
+    variants: Dict[Optional[str], bytes]  # Content-Encoding (None = identity) -> body
+
+class HtmlBriefingService:
+    """
+    Holds the <body> of the newest HTML briefing, pre-compressed. BriefingWatcher calls refresh() when the
+    briefings directory changes; requests only ever read the cached result.
+    """
+    ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+    def __init__(self):
+        self._cached: Optional[CachedBriefing] = None
+        self._error: Tuple[int, str] = (404, "BMS Briefings directory not found. Is Falcon BMS installed?")
+        self.hits = 0    # refresh() calls that found the newest briefing unchanged
+        self.misses = 0  # ...and those that had to re-parse it
+
+    @staticmethod
+    def _latest_html(briefings_dir: Path) -> Optional[os.DirEntry]:
+        # One scandir instead of glob + getmtime per file: on Windows the stat comes with the listing.
+        with os.scandir(briefings_dir) as entries:
+            html_files = [e for e in entries if e.name.lower().endswith(".html") and e.is_file()]
+        return max(html_files, key=lambda e: e.stat().st_mtime_ns, default=None)
+
+    @staticmethod
+    def _build(entry: os.DirEntry, stat: os.stat_result) -> Optional[CachedBriefing]:
+        with open(entry.path, 'r', encoding='utf-8', errors='ignore') as f:
+            soup = BeautifulSoup(f, 'lxml')
+        body_tag = soup.find('body')
+        if not body_tag:
+            logger.error(f"Could not find <body> tag in briefing file: {entry.path}")
+            return None
+        body = body_tag.decode_contents().encode("utf-8")
+        variants: Dict[Optional[str], bytes] = {None: body, "gzip": gzip.compress(body, compresslevel=6)}
+        if brotli: variants["br"] = brotli.compress(body, quality=6)
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        logger.info(f"Parsed HTML briefing {entry.path} ({len(body)} bytes, gzip {len(variants['gzip'])} bytes).")
+        return CachedBriefing(entry.path, stat.st_mtime_ns, stat.st_size, etag, stat.st_mtime, variants)
+
+    def refresh(self, briefings_dir: Optional[Path]) -> bool:
+        """Re-parses the newest briefing if it is a different or modified file. Returns True if the served content changed. Blocking."""
+        previous = self._cached
+        if not briefings_dir or not briefings_dir.is_dir():
+            self._cached, self._error = None, (404, "BMS Briefings directory not found. Is Falcon BMS installed?")
+            return previous is not None
+        entry = self._latest_html(briefings_dir)
+        if entry is None:
+            logger.warning(f"No HTML briefing files found in: {briefings_dir}")
+            self._cached, self._error = None, (404, "No HTML briefing files found.")
+            return previous is not None
+        stat = entry.stat()
+        if previous and (previous.path, previous.mtime_ns, previous.size) == (entry.path, stat.st_mtime_ns, stat.st_size):
+            self.hits += 1
+            return False
+        self.misses += 1
+        self._cached = self._build(entry, stat)
+        if self._cached is None: self._error = (500, "Could not find <body> tag in briefing file.")
+        return (previous.etag if previous else None) != (self._cached.etag if self._cached else None)
+
+    def get(self) -> CachedBriefing:
+        """The cached briefing; raises the reason it is missing as an HTTPException."""
+        if self._cached is None:
+            raise HTTPException(status_code=self._error[0], detail=self._error[1])
+        return self._cached
@@ -0,0 +1,36 @@
+# File: services/http_cache.py
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names this ETag (weak comparison, as for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header: return False
+    if header.strip() == "*": return True
+    strip_weak = lambda tag: tag.strip().removeprefix("W/")
+    return strip_weak(etag) in (strip_weak(tag) for tag in header.split(","))
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Conditional GET check: If-None-Match wins when present, otherwise If-Modified-Since (second resolution)."""
+    if "if-none-match" in request.headers: return etag_matches(request, etag)
+    header = request.headers.get("if-modified-since")
+    if not header: return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def pick_encoding(request: Request, available: Iterable[str]) -> Optional[str]:
+    """The first of `available` (in server preference order) that Accept-Encoding allows, or None for identity."""
+    accepted = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        try: quality = float(params.strip().removeprefix("q=")) if params else 1.0
+        except ValueError: quality = 0.0
+        if name: accepted[name.strip().lower()] = quality
+    return next((encoding for encoding in available if accepted.get(encoding, accepted.get("*", 0.0)) > 0), None)
@@ -0,0 +1,40 @@
+# File: services/kneeboard_list_service.py
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Tuple
+
+from config.settings import ConfigManager
+from services.static_assets import StaticAssetIndex
+
+class KneeboardListService:
+    """
+    Pre-serialized /api/kneeboards/{board} responses. A board's body and ETag are rebuilt only when
+    settings.json is reloaded or a kneeboard file's versioned URL may have changed.
+    """
+    def __init__(self, config_manager: ConfigManager, static_assets: StaticAssetIndex):
+        self.config_manager = config_manager
+        self.static_assets = static_assets
+        self._cache: Dict[str, Tuple[Tuple[int, int], bytes, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, board_name: str) -> bytes:
+        items = getattr(self.config_manager.load_config().kneeboards, board_name, [])
+        return json.dumps({"success": True, "items": [
+            {"path": self.static_assets.versioned_url(f"/user_data/kneeboards/{Path(item.path).name}"), "type": "pdf" if Path(item.path).suffix.lower() == ".pdf" else "image"}
+            for item in items if item.enabled
+        ]}, separators=(",", ":")).encode()
+
+    def get(self, board_name: str) -> Tuple[bytes, str]:
+        """Returns the encoded list for "left" or "right" and its ETag."""
+        self.config_manager.load_config()  # Picks up edits to settings.json (rate-limited stat)
+        key = (self.config_manager.version, self.static_assets.generation)
+        cached = self._cache.get(board_name)
+        if cached is None or cached[0] != key:
+            self.misses += 1
+            body = self._build(board_name)
+            cached = self._cache[board_name] = (key, body, f'"{hashlib.sha1(body).hexdigest()[:16]}"')
+        else:
+            self.hits += 1
+        return cached[1], cached[2]
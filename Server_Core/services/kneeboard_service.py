@@ -1,15 +1,20 @@
 # File: services/kneeboard_service.py
 import os
-import winreg
 import platform
-import hashlib
-import time
 import logging
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
-from typing import Optional, Dict, List, Tuple
+from typing import Any, Optional, Dict, List, NamedTuple, Tuple
 
-from config.settings import ConfigManager
+from config.settings import ConfigManager, KneeboardImageFormat, ServerConfig
+
+try:
+    import winreg
+except ImportError:  # Not on Windows: no registry, so no BMS install to find
+    winreg = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +24,6 @@ WIN_REG_KEY = rf"SOFTWARE\WOW6432Node\Benchmark Sims\Falcon BMS {BMS_VERSION}"
 DDS_OBJECTS_DIR = os.path.join("Data", "TerrData", "Objects", "KoreaObj")
 INIT_DDS = 7982
 DDS_COUNT = 16
-OUT_EXT = "png"
 
 class KneeboardService:
     def __init__(self, base_app_dir: Path, config_manager: ConfigManager):
@@ -27,10 +31,13 @@ class KneeboardService:
         self.config_manager = config_manager
         self.bms_base_dir: Optional[Path] = self._find_bms_base_dir()
         self.dds_dir: Optional[Path] = self.bms_base_dir / DDS_OBJECTS_DIR if self.bms_base_dir else None
+        self._refresh_lock = threading.Lock()  # One conversion at a time, even if several requests trigger it
+        self.hits = 0    # DDS files found unchanged by a refresh, so not converted
+        self.misses = 0  # DDS files (re)converted
 
     def _find_bms_base_dir(self) -> Optional[Path]:
         # The search logic remains the same
-        if platform.system() != "Windows": return None
+        if platform.system() != "Windows" or winreg is None: return None
         try:
             con = winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE)
             key = winreg.OpenKey(con, WIN_REG_KEY)
@@ -40,75 +47,148 @@ class KneeboardService:
         except Exception: pass
         return None
 
-    def _get_dds_files_hash(self) -> Optional[str]:
-        """Creates an MD5 hash from the names, sizes, and modification times of all DDS files."""
-        if not self.dds_dir or not self.dds_dir.is_dir(): return None
-        try:
-            file_info = []
-            for i in range(INIT_DDS, INIT_DDS + DDS_COUNT):
-                dds_file = self.dds_dir / f"{i}.dds"
-                if dds_file.exists():
-                    stat = dds_file.stat()
-                    file_info.append(f"{dds_file.name}:{stat.st_size}:{stat.st_mtime}")
-            
-            if not file_info: return None
-            return hashlib.md5("".join(sorted(file_info)).encode()).hexdigest()
-        except Exception as e:
-            logger.error(f"Error calculating DDS files hash: {e}")
-            return None
-
-    def _write_cropped_png(self, img: Image.Image, dims: tuple, target_path: Path, scale_factor: float):
-        # The conversion logic remains the same
-        try:
-            cropped = img.crop(dims)
-            if scale_factor != 1.0:
-                original_width, original_height = cropped.size
-                new_width = int(original_width * scale_factor)
-                final_image = cropped.resize((new_width, original_height), Image.Resampling.LANCZOS)
-            else:
-                final_image = cropped
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            final_image.save(target_path, format=OUT_EXT)
-        except Exception as e:
-            logger.error(f"Failed to write image {target_path}: {e}")
+    def _scan_dds_files(self) -> Dict[str, Tuple[int, int]]:
+        """(size, mtime_ns) of every kneeboard DDS file that exists."""
+        found = {}
+        for i in range(INIT_DDS, INIT_DDS + DDS_COUNT):
+            try:
+                stat = (self.dds_dir / f"{i}.dds").stat()
+            except OSError:
+                continue
+            found[f"{i}.dds"] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def _output_paths(self, dds_name: str, profile: "OutputProfile") -> Tuple[Path, Path]:
+        """Full-size left and right outputs of one DDS; width variants sit next to them as <name>@<width>w.<ext>."""
+        stem = Path(dds_name).stem
+        return self.base_app_dir / "Left" / f"L_{stem}.{profile.extension}", self.base_app_dir / "Right" / f"R_{stem}.{profile.extension}"
 
     def refresh_kneeboards(self) -> dict:
-        """Updates the kneeboards, but only if the source DDS files have changed."""
+        """Converts the DDS files that changed since their last conversion; unchanged files are skipped individually."""
         if not self.dds_dir:
             return {"success": False, "error": "BMS DDS directory not found."}
+        with self._refresh_lock:
+            return self._refresh_locked()
 
-        # --- 1. Check if an update is needed ---
-        cached_paths = self.config_manager.get_cached_paths()
-        current_hash = self._get_dds_files_hash()
+    def _refresh_locked(self) -> dict:
+        # --- 1. Find the files whose (size, mtime) or output profile changed, or whose images are missing ---
+        config = self.config_manager.load_config()
+        profile = OutputProfile.from_config(config)
+        manifest = self.config_manager.get_cached_paths().kneeboard_manifest
+        current = {name: (size, mtime_ns, profile.signature) for name, (size, mtime_ns) in self._scan_dds_files().items()}
+        pending = [name for name, state in current.items()
+                   if tuple(manifest.get(name, ())) != state or not all(p.is_file() for p in self._output_paths(name, profile))]
 
-        if current_hash and current_hash == cached_paths.kneeboard_files_hash:
+        self.hits += len(current) - len(pending)
+        self.misses += len(pending)
+        if not pending:
             logger.info("Kneeboard DDS files have not changed. Skipping conversion.")
             return {"success": True, "message": "Images are already up to date.", "cached": True}
 
-        logger.info("Kneeboard DDS files have changed. Starting conversion...")
+        # --- 2. Convert them, one work item per file ---
+        logger.info(f"Converting {len(pending)} of {len(current)} kneeboard DDS files ({profile.signature})...")
+        jobs = [(str(self.dds_dir / name), *map(str, self._output_paths(name, profile)), profile) for name in pending]
+        workers = min(len(jobs), config.kneeboard_conversion_workers or os.cpu_count() or 1)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                errors = list(pool.map(convert_dds, *zip(*jobs)))
+        else:
+            errors = [convert_dds(*job) for job in jobs]
 
-        # --- 2. If needed, perform the conversion ---
-        config = self.config_manager.load_config()
-        scale_factor = config.kneeboard_scale_width
-        left_dir, right_dir = self.base_app_dir / "Left", self.base_app_dir / "Right"
-        converted_count = 0
-        
-        for i in range(INIT_DDS, INIT_DDS + DDS_COUNT):
-            source_dds = self.dds_dir / f"{i}.dds"
-            if not source_dds.is_file(): continue
-            try:
-                with Image.open(source_dds) as img:
-                    width, height = img.size
-                    self._write_cropped_png(img, (0, 0, width // 2, height), left_dir / f"L_{i}.{OUT_EXT}", scale_factor)
-                    self._write_cropped_png(img, (width // 2, 0, width, height), right_dir / f"R_{i}.{OUT_EXT}", scale_factor)
-                    converted_count += 1
-            except Exception as e:
-                logger.error(f"Failed to process {source_dds}: {e}")
-
-        # --- 3. Update the hash in the cache ---
-        self.config_manager.update_cached_paths(
-            cached_paths.briefing_file_path or "", # Preserve the old briefing path
-            current_hash
-        )
-
-        return {"success": True, "message": f"Converted {converted_count} DDS files.", "cached": False}
\ No newline at end of file
+        # --- 3. Remember what was converted; failed files are retried next time ---
+        new_manifest = {name: state for name, state in current.items() if name not in pending}
+        for name, error in zip(pending, errors):
+            if error: logger.error(f"Failed to process {name}: {error}")
+            else: new_manifest[name] = current[name]
+        self.config_manager.update_cached_paths(kneeboard_manifest=new_manifest)
+
+        converted_count = sum(1 for error in errors if not error)
+        return {"success": True, "message": f"Converted {converted_count} DDS files.", "cached": False}
+
+    def list_pages(self, side: str, width: Optional[int] = None) -> List[str]:
+        """
+        URL paths of the converted pages of one side ("Left" or "Right"), in page order. With `width`, each page
+        is the smallest variant at least that wide (the full-size image if no variant is wide enough). Only widths of
+        the current profile count, in case files of an older profile are still on disk.
+        """
+        profile = OutputProfile.from_config(self.config_manager.load_config())
+        widths = set(profile.variant_widths)
+        pattern = re.compile(rf"^{side[0]}_(\d+)(?:@(\d+)w)?\.{profile.extension}$")
+        variants: Dict[int, Dict[Optional[int], str]] = {}
+        try:
+            with os.scandir(self.base_app_dir / side) as entries:
+                for entry in entries:
+                    if (match := pattern.match(entry.name)) and (not match[2] or int(match[2]) in widths):
+                        variants.setdefault(int(match[1]), {})[int(match[2]) if match[2] else None] = entry.name
+        except OSError:
+            return []
+        pages = []
+        for page in sorted(variants):
+            by_width = variants[page]
+            fitting = sorted(w for w in by_width if w is not None and width is not None and w >= width)
+            name = by_width[fitting[0]] if fitting else by_width.get(None) or by_width[max(w for w in by_width if w is not None)]
+            pages.append(f"/{side}/{name}")
+        return pages
+
+class OutputProfile(NamedTuple):
+    """How converted pages are encoded. A plain tuple, so it can be sent to the worker processes."""
+    image_format: str
+    scale_factor: float
+    png_compress_level: int
+    webp_quality: int
+    variant_widths: Tuple[int, ...]
+
+    @classmethod
+    def from_config(cls, config: ServerConfig) -> "OutputProfile":
+        return cls(config.kneeboard_image_format.value, config.kneeboard_scale_width, config.kneeboard_png_compress_level,
+                   config.kneeboard_webp_quality, tuple(sorted(set(config.kneeboard_variant_widths))))
+
+    @property
+    def extension(self) -> str:
+        return "png" if self.image_format == KneeboardImageFormat.PNG else "webp"
+
+    @property
+    def signature(self) -> str:
+        """Changes whenever the output would, so a profile change re-converts every file."""
+        return f"{self.image_format}:{self.scale_factor}:{self.png_compress_level}:{self.webp_quality}:{','.join(map(str, self.variant_widths))}"
+
+    def save_options(self) -> Dict[str, Any]:
+        if self.image_format == KneeboardImageFormat.PNG:
+            return {"format": "png", "compress_level": self.png_compress_level}
+        if self.image_format == KneeboardImageFormat.WEBP_LOSSLESS:
+            return {"format": "webp", "lossless": True, "quality": self.webp_quality}
+        return {"format": "webp", "quality": self.webp_quality}
+
+def _write_page(img: Image.Image, dims: tuple, target_path: Path, profile: OutputProfile):
+    cropped = img.crop(dims)
+    if profile.scale_factor != 1.0:
+        original_width, original_height = cropped.size
+        new_width = int(original_width * profile.scale_factor)
+        final_image = cropped.resize((new_width, original_height), Image.Resampling.LANCZOS)
+    else:
+        final_image = cropped
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    options = profile.save_options()
+    final_image.save(target_path, **options)
+    full_width, full_height = final_image.size
+    written = set()
+    for width in profile.variant_widths:
+        if width >= full_width: break  # Never upscale; the full-size page already covers wider screens
+        variant = final_image.resize((width, max(1, round(full_height * width / full_width))), Image.Resampling.LANCZOS)
+        variant_path = target_path.with_name(f"{target_path.stem}@{width}w{target_path.suffix}")
+        variant.save(variant_path, **options)
+        written.add(variant_path)
+    # Variants of a previous profile would otherwise still be listed and served.
+    for stale in target_path.parent.glob(f"{target_path.stem}@*w{target_path.suffix}"):
+        if stale not in written: stale.unlink(missing_ok=True)
+
+def convert_dds(source_dds: str, left_path: str, right_path: str, profile: OutputProfile) -> Optional[str]:
+    """Splits one DDS into its left and right kneeboard pages. Runs in a worker process; returns an error message or None."""
+    try:
+        with Image.open(source_dds) as img:
+            width, height = img.size
+            _write_page(img, (0, 0, width // 2, height), Path(left_path), profile)
+            _write_page(img, (width // 2, 0, width, height), Path(right_path), profile)
+        return None
+    except Exception as e:
+        return str(e)
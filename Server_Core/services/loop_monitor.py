@@ -0,0 +1,54 @@
+# File: services/loop_monitor.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class EventLoopMonitor:
+    """
+    Measures event loop lag: how much later than requested a short sleep actually wakes up.
+    Anything blocking the loop (a synchronous file read, a parse, a slow handler) shows up here directly.
+    """
+    def __init__(self, interval: float = 0.25, window: int = 240, warn_threshold: float = 0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="event-loop-monitor")
+
+    async def stop(self):
+        if self._task is None: return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self._samples.append(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms.")
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        percentile = lambda p: round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2) if samples else None
+        return {
+            "interval_ms": self.interval * 1000, "samples": len(samples), "last_lag_ms": round(self.last_lag * 1000, 2),
+            "p50_lag_ms": percentile(0.50), "p99_lag_ms": percentile(0.99), "window_max_lag_ms": round(samples[-1] * 1000, 2) if samples else None,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
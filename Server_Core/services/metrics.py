@@ -0,0 +1,91 @@
+# File: services/metrics.py
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# Seconds; fine at the low end, where the per-frame stages live, up to the lag of a stalled client.
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Samples = Union[float, Dict[Tuple[Tuple[str, str], ...], float]]  # One value, or label set -> value
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels: return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Histogram:
+    """
+    A Prometheus-style histogram. observe() is one bisect and two increments under a lock,
+    cheap enough to call for every frame and every send.
+    """
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot: above the largest bucket (+Inf)
+        self._sum = 0.0
+        self._lock = threading.Lock()  # Observed from worker threads as well as the event loop
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines += [f'{self.name}_bucket{{le="+Inf"}} {cumulative}', f"{self.name}_sum {total!r}", f"{self.name}_count {cumulative}"]
+        return lines
+
+class PipelineMetrics:
+    """Per-stage timings of the flight data path: shared memory -> decode -> encode -> each client's socket."""
+    def __init__(self):
+        self.read = Histogram("bms_bridge_shm_read_seconds", "Copying FlightData and FlightData2 out of shared memory.")
+        self.decode = Histogram("bms_bridge_decode_seconds", "Decoding the copied areas into the subscribed fields.")
+        self.sample = Histogram("bms_bridge_sample_seconds", "Whole sampler read as seen from the event loop, including the worker thread hop.")
+        self.encode = Histogram("bms_bridge_encode_seconds", "Rendering a frame for one client (cached encodings are shared between clients).")
+        self.send = Histogram("bms_bridge_send_seconds", "One WebSocket send call to one client.")
+        self.frame_lag = Histogram("bms_bridge_frame_lag_seconds", "Sample time to send completed, per client and frame.")
+        self.display_latency = Histogram("bms_bridge_display_latency_seconds", "Sample time to the client's ack of the frame (clients that send acks).")
+
+    def histograms(self) -> List[Histogram]:
+        return [self.read, self.decode, self.sample, self.encode, self.send, self.frame_lag, self.display_latency]
+
+class MetricsRegistry:
+    """
+    Renders /api/metrics in the Prometheus text format. Histograms are recorded as things happen; gauges and
+    counters are callbacks that read existing state (stats dicts, cache counters) only when scraped.
+    """
+    def __init__(self, pipeline: Optional[PipelineMetrics] = None):
+        self.pipeline = pipeline or PipelineMetrics()
+        self._collectors: List[Tuple[str, str, str, Callable[[], Samples]]] = []
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Samples]):
+        self._collectors.append((name, "gauge", help_text, collect))
+
+    def counter(self, name: str, help_text: str, collect: Callable[[], Samples]):
+        self._collectors.append((name, "counter", help_text, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self.pipeline.histograms():
+            lines += histogram.render()
+        for name, kind, help_text, collect in self._collectors:
+            samples = collect()
+            if samples is None: continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if isinstance(samples, dict):
+                lines += [f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples.items()]
+            else:
+                lines.append(f"{name} {_format_value(samples)}")
+        return "\n".join(lines) + "\n"
@@ -1,10 +1,15 @@
-import winreg
 import platform
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 import logging
 
 from adapters.bms_adapter import BMSAdapter
+from adapters.frame_ring import RingFrameSource
+
+try:
+    import winreg
+except ImportError:  # Not on Windows: no registry, so BMS is only found through shared memory (or a replay)
+    winreg = None
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +22,7 @@ class PathService:
         self._bms_base_dir_from_registry: Optional[Path] = self._find_bms_base_dir_from_registry()
 
     def _find_bms_base_dir_from_registry(self) -> Optional[Path]:
-        if platform.system() != "Windows":
+        if platform.system() != "Windows" or winreg is None:
             return None
         try:
             with winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE) as hkey:
@@ -34,19 +39,20 @@ class PathService:
         
         return None
 
-    def find_briefings_dir(self, bms_adapter: BMSAdapter) -> Optional[Path]:
-        flight_data = bms_adapter.get_all_data()
-        if flight_data and (live_dir_str := flight_data.get("BmsBriefingsDirectory")):
+    def find_briefings_dir(self, bms_source: Union[BMSAdapter, RingFrameSource]) -> Optional[Path]:
+        # The sampler's latest snapshot already holds the decoded strings; shared memory is not read here.
+        snapshot = bms_source.latest_snapshot()
+        if snapshot and snapshot.strings and (live_dir_str := snapshot.strings.get("BmsBriefingsDirectory")):
             live_dir = Path(live_dir_str.strip())
             if live_dir.is_dir():
-                logger.info(f"Found live briefings directory from Shared Memory: {live_dir}")
+                logger.debug(f"Found live briefings directory from Shared Memory: {live_dir}")
                 return live_dir
 
         if self._bms_base_dir_from_registry:
             offline_dir = self._bms_base_dir_from_registry / self.BRIEFINGS_SUBPATH
             if offline_dir.is_dir():
-                logger.info(f"Using cached briefings directory from registry: {offline_dir}")
+                logger.debug(f"Using cached briefings directory from registry: {offline_dir}")
                 return offline_dir
         
-        logger.error("Could not find briefing directory via Shared Memory or Registry.")
+        logger.debug("Could not find briefing directory via Shared Memory or Registry.")
         return None
\ No newline at end of file
@@ -0,0 +1,81 @@
+# File: services/recording_service.py
+import ctypes
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from adapters.bms_adapter import FlightSnapshot
+from adapters.flight_recorder import FlightRecorder
+from falcon_memreader import FlightData, FlightData2
+from services.blocking_executor import BlockingExecutor
+from services.snapshot_consumers import SnapshotConsumers
+
+logger = logging.getLogger(__name__)
+
+class RecordingService:
+    """
+    Records the snapshots the sampler takes, one every `interval`, without reading shared memory itself: while running
+    it is one of the sampler's consumers. StringData goes into the recording whenever the snapshot's copy of it changes.
+    """
+    NAME = "recorder"
+
+    def __init__(self, consumers: SnapshotConsumers, executor: BlockingExecutor, directory: Path, interval: float, max_file_size: int):
+        self.consumers = consumers
+        self.executor = executor
+        self.directory = directory
+        self.interval = interval
+        self.max_file_size = max_file_size
+        self.snapshots_skipped = 0  # Snapshots that came sooner than `interval` after the last recorded one
+        self._recorder: Optional[FlightRecorder] = None
+        self._recorded_strings: Optional[bytes] = None
+        self._next_at = 0.0
+        self._lock = threading.Lock()  # record() runs on worker threads, stop() on the event loop
+
+    def start(self):
+        if self._recorder is None:
+            self._recorder = FlightRecorder(self.directory, ctypes.sizeof(FlightData), ctypes.sizeof(FlightData2), self.max_file_size)
+            self._recorded_strings, self._next_at = None, 0.0
+            self.consumers.add_listener(self.record)
+            self.consumers.demand(self.NAME, self.interval)
+            logger.info(f"Flight recorder started: {1 / self.interval:.0f} Hz into {self.directory}.")
+
+    async def stop(self):
+        if self._recorder is None: return
+        await self.executor.run(self._stop)
+
+    def _stop(self):
+        self.consumers.release(self.NAME)
+        self.consumers.remove_listener(self.record)
+        with self._lock:
+            if self._recorder: self._recorder.close()
+            self._recorder = None
+
+    def record(self, snapshot: FlightSnapshot):
+        """Snapshot listener: appends the snapshot's FlightData + FlightData2 copy to the recording. Blocking."""
+        with self._lock:
+            recorder = self._recorder
+            if recorder is None: return
+            # The tick may run faster than the recorder asked for (clients, drawing stream); a little jitter is fine.
+            if snapshot.taken_at < self._next_at - self.interval / 2:
+                self.snapshots_skipped += 1
+                return
+            self._next_at = snapshot.taken_at + self.interval
+            strings = snapshot.strings_raw if snapshot.strings_raw != self._recorded_strings else None
+            raw = memoryview(snapshot.raw)
+            try:
+                recorder.record(raw[:recorder.flight_data_size], raw[recorder.flight_data_size:], strings, snapshot.sampled_at)
+            except OSError as e:  # Disk full, directory gone...
+                logger.error(f"Flight recording failed, recorder stopped: {e}")
+                recorder.close()
+                self._recorder = None
+                self.consumers.release(self.NAME)
+                self.consumers.remove_listener(self.record)
+                return
+            self._recorded_strings = snapshot.strings_raw
+
+    def stats(self) -> Dict[str, Any]:
+        recorder = self._recorder
+        return {"running": recorder is not None, "interval": self.interval, "snapshots_skipped": self.snapshots_skipped,
+                "frames_recorded": recorder.frames_recorded if recorder else 0, "files_written": recorder.files_written if recorder else 0,
+                "current_file": str(recorder.current_file) if recorder and recorder.current_file else None}
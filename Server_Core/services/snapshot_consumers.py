@@ -0,0 +1,62 @@
+# File: services/snapshot_consumers.py
+import logging
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from adapters.bms_adapter import FlightSnapshot
+
+logger = logging.getLogger(__name__)
+
+SnapshotListener = Callable[[FlightSnapshot], None]
+
+class SnapshotConsumers:
+    """
+    Readers of BMS shared memory besides the flight data clients (the recorder, the drawing stream). They never read
+    it themselves: each one states how often it needs a snapshot and which extra areas, and the one tick that reads
+    shared memory (FlightDataSampler, or FramePublisher with several workers) takes snapshots at the fastest rate
+    asked for. Listeners get every snapshot on the worker thread that took it; everyone else uses latest_snapshot().
+
+    Demands and listeners are replaced as a whole on every change, so the tick and the worker threads can read them
+    while the event loop changes them.
+    """
+    def __init__(self):
+        self._demands: Dict[str, Tuple[float, FrozenSet[str]]] = {}
+        self._listeners: Tuple[SnapshotListener, ...] = ()
+
+    def demand(self, name: str, interval: float, areas: Iterable[str] = ()):
+        """Asks for a snapshot at least every `interval` seconds, including the extra `areas`, until release(name)."""
+        self._demands = {**self._demands, name: (interval, frozenset(areas))}
+
+    def release(self, name: str):
+        self._demands = {key: value for key, value in self._demands.items() if key != name}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._demands)
+
+    def interval(self) -> Optional[float]:
+        """Shortest interval demanded; None without demands."""
+        return min((interval for interval, _ in self._demands.values()), default=None)
+
+    def areas(self) -> FrozenSet[str]:
+        return frozenset().union(*(areas for _, areas in self._demands.values()))
+
+    def add_listener(self, listener: SnapshotListener):
+        self._listeners = (*self._listeners, listener)
+
+    def remove_listener(self, listener: SnapshotListener):
+        self._listeners = tuple(item for item in self._listeners if item != listener)
+
+    @property
+    def listening(self) -> bool:
+        return bool(self._listeners)
+
+    def notify(self, snapshot: FlightSnapshot):
+        """Hands a new snapshot to every listener. Blocking; runs on a worker thread."""
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                logger.error("Snapshot listener failed", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: {"interval": interval, "areas": sorted(areas)} for name, (interval, areas) in self._demands.items()}
@@ -0,0 +1,164 @@
+# File: services/static_assets.py
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from services.blocking_executor import BlockingExecutor
+
+# Optional: brotli variants are only built when the package is installed.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+class StaticAsset(NamedTuple):
+    url_path: str  # Relative to the server root, e.g. "static/js/app.js"
+    path: Path
+    size: int
+    mtime_ns: int
+    etag: str
+    version: str   # Short content hash used in ?v= URLs
+    media_type: Optional[str]
+    variants: Dict[Optional[str], bytes]  # Content-Encoding (None = identity) -> body; empty = served from disk
+
+class StaticAssetIndex:
+    """
+    Every file under the allowed static paths, resolved, hashed and (for small text assets) held in memory
+    pre-compressed. Built at startup and kept current by a background rescan; requests only do a dict lookup.
+    """
+    IN_MEMORY_LIMIT = 2 * 1024 * 1024
+    COMPRESSIBLE = {".js", ".mjs", ".css", ".html", ".json", ".svg", ".webmanifest", ".txt", ".map", ".ftl"}
+    MEDIA_TYPES = {".mjs": "application/javascript", ".webmanifest": "application/manifest+json"}
+    ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+    _URL_ATTRIBUTE = re.compile(r'((?:href|src)=")/([^"?#]+)"')
+
+    def __init__(self, base_dir: Path, allowed_paths: Iterable[str], template_path: Path, executor: BlockingExecutor, rescan_interval: float):
+        self.base_dir = base_dir.resolve()
+        self.roots = [(self.base_dir / p).resolve() for p in allowed_paths]
+        self.template_path = template_path
+        self.executor = executor
+        self.rescan_interval = rescan_interval
+        self._assets: Dict[str, StaticAsset] = {}
+        self._index_page: Tuple[bytes, str] = (b"", "")
+        self._template_key: Optional[Tuple[int, int]] = None
+        self.generation = 0  # Increases whenever an asset (and so possibly a versioned URL) changes
+        self.hits = 0    # get() lookups answered from the index
+        self.misses = 0  # ...and those that were not (new file, or not a file at all)
+        self._task: Optional[asyncio.Task] = None
+
+    def _is_allowed(self, path: Path) -> bool:
+        return any(path == root or path.is_relative_to(root) for root in self.roots)
+
+    def _build_asset(self, url_path: str, path: Path, stat: os.stat_result) -> StaticAsset:
+        suffix = path.suffix.lower()
+        media_type = self.MEDIA_TYPES.get(suffix) or mimetypes.guess_type(path.name)[0]
+        digest = hashlib.sha1()
+        variants: Dict[Optional[str], bytes] = {}
+        if suffix in self.COMPRESSIBLE and stat.st_size <= self.IN_MEMORY_LIMIT:
+            body = path.read_bytes()
+            digest.update(body)
+            variants = {None: body, "gzip": gzip.compress(body, compresslevel=9)}
+            if brotli: variants["br"] = brotli.compress(body, quality=11)
+        else:
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024): digest.update(chunk)
+        version = digest.hexdigest()[:12]
+        return StaticAsset(url_path, path, stat.st_size, stat.st_mtime_ns, f'"{version}"', version, media_type, variants)
+
+    def rebuild(self) -> bool:
+        """Rescans the allowed paths; unchanged files (same size and mtime) are reused, not re-hashed. Returns True if anything changed. Blocking."""
+        previous = self._assets
+        assets: Dict[str, StaticAsset] = {}
+        for root in self.roots:
+            for directory, _, files in os.walk(root):
+                for name in files:
+                    url_path = (Path(directory) / name).relative_to(self.base_dir).as_posix()
+                    try:
+                        # Same check as add(): a symlink out of the allowed paths is not served.
+                        path = (Path(directory) / name).resolve()
+                        if not self._is_allowed(path): continue
+                        stat = path.stat()
+                    except (OSError, RuntimeError):
+                        continue
+                    old = previous.get(url_path)
+                    assets[url_path] = old if old and (old.size, old.mtime_ns) == (stat.st_size, stat.st_mtime_ns) else self._build_asset(url_path, path, stat)
+        changed = assets.keys() != previous.keys() or any(assets[k] is not previous[k] for k in assets)
+        if changed:
+            self._assets = assets
+            self.generation += 1
+            logger.info(f"Static asset index: {len(assets)} files.")
+        try:
+            template_stat = self.template_path.stat()
+            template_key = (template_stat.st_size, template_stat.st_mtime_ns)
+        except OSError:
+            template_key = None
+        if changed or template_key != self._template_key:
+            self._template_key = template_key
+            self._render_index_page()
+        return changed
+
+    def add(self, url_path: str) -> Optional[StaticAsset]:
+        """Slow path for a file that appeared since the last rescan: the old resolve-and-check, then it is indexed. Blocking."""
+        try:
+            path = (self.base_dir / url_path).resolve()
+            if not self._is_allowed(path) or not path.is_file(): return None
+            asset = self._build_asset(url_path, path, path.stat())
+        except (OSError, ValueError):
+            return None
+        self._assets = {**self._assets, url_path: asset}  # Copy-on-write: a rescan may be reading the old dict
+        self.generation += 1
+        return asset
+
+    def get(self, url_path: str) -> Optional[StaticAsset]:
+        asset = self._assets.get(url_path)
+        if asset is None: self.misses += 1
+        else: self.hits += 1
+        return asset
+
+    def versioned_url(self, url: str) -> str:
+        """"/static/app.js" -> "/static/app.js?v=<hash>" for indexed files, so they can be cached as immutable."""
+        asset = self._assets.get(url.lstrip("/"))
+        return f"{url}?v={asset.version}" if asset else url
+
+    def _render_index_page(self):
+        try:
+            template = self.template_path.read_text(encoding="utf-8")
+        except OSError as e:
+            logger.error(f"Could not read {self.template_path}: {e}")
+            return
+        page = self._URL_ATTRIBUTE.sub(lambda m: f'{m[1]}{self.versioned_url("/" + m[2])}"', template).encode("utf-8")
+        self._index_page = (page, f'"{hashlib.sha1(page).hexdigest()[:16]}"')
+
+    def index_page(self) -> Tuple[bytes, str]:
+        """index.html with its asset links versioned, and its ETag."""
+        return self._index_page
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="static-asset-index")
+
+    async def stop(self):
+        if self._task is None: return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        # The first build happens in lifespan, before requests are served.
+        while True:
+            await asyncio.sleep(self.rescan_interval)
+            try:
+                await self.executor.run(self.rebuild)
+            except Exception:
+                logger.error("Static asset rescan failed", exc_info=True)
@@ -0,0 +1,59 @@
+# File: services/subscriptions.py
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Named slices of the merged FlightData + FlightData2 + StringData dict, for common client pages.
+FIELD_GROUPS: Dict[str, List[str]] = {
+    "ded": ["DEDLines", "Invert"],
+    "pfl": ["PFLLines", "PFLInvert"],
+    "rwr": ["RwrObjectCount", "RWRsymbol", "bearing", "missileActivity", "missileLaunch", "selected", "lethality", "newDetection", "RwrInfo"],
+    "fuel": ["internalFuel", "externalFuel", "fuelFlow", "fuelFlow2", "fwd", "aft", "total", "bingoFuel", "epuFuel"],
+    "engine": ["rpm", "rpm2", "ftit", "ftit2", "nozzlePos", "nozzlePos2", "oilPressure", "oilPressure2", "hydPressureA", "hydPressureB"],
+    "flight": ["x", "y", "z", "pitch", "roll", "yaw", "kias", "mach", "vt", "gs", "alpha", "beta", "RALT", "currentHeading", "latitude", "longitude"],
+    "lights": ["lightBits", "lightBits2", "lightBits3", "hsiBits", "altBits", "powerBits", "blinkBits", "bettyBits", "miscBits"],
+    "radio": ["UFCTChan", "AUXTChan", "uhf_panel_preset", "uhf_panel_frequency", "radio2_preset", "radio2_frequency", "tacanInfo", "tacan_ils_frequency"],
+    "pilots": ["pilotsOnline", "pilotsCallsign", "pilotsStatus"],
+    # Extra shared memory areas, each one nested field; only read while someone subscribes to them.
+    "osb": ["osb"],
+    "intellivibe": ["intellivibe"],
+    "drawing": ["drawing"],
+}
+
+class SubscriptionError(ValueError):
+    """Raised when a client subscribes to fields or groups that do not exist."""
+
+class SubscriptionCatalog:
+    """
+    Validates subscription requests and interns the resulting field sets, so every client
+    with the same subscription shares one frozenset and with it one cached projection per frame.
+    `area_fields` are opt-in: they are not part of "everything" and must be subscribed to by name or group.
+    """
+    def __init__(self, known_fields: Iterable[str], string_fields: Iterable[str], area_fields: Iterable[str] = ()):
+        self.area_fields: FrozenSet[str] = frozenset(area_fields)
+        self.default_fields: FrozenSet[str] = frozenset(known_fields) | frozenset(string_fields)
+        self.known_fields: FrozenSet[str] = self.default_fields | self.area_fields
+        self.groups: Dict[str, FrozenSet[str]] = {name: frozenset(fields) for name, fields in FIELD_GROUPS.items()}
+        self.groups["strings"] = frozenset(string_fields)
+        for name, fields in self.groups.items():
+            if unknown := fields - self.known_fields:
+                logger.warning(f"Field group '{name}' references unknown fields: {sorted(unknown)}")
+        self._interned: Dict[FrozenSet[str], FrozenSet[str]] = {}
+
+    def resolve(self, fields: Optional[Iterable[str]] = None, groups: Optional[Iterable[str]] = None) -> Optional[FrozenSet[str]]:
+        """Returns the interned field set for a request, or None for 'everything'."""
+        if not all(isinstance(names, (list, tuple, set, frozenset)) and all(isinstance(name, str) for name in names)
+                   for names in (fields or [], groups or [])):
+            raise SubscriptionError("'fields' and 'groups' must be lists of names.")
+        fields, groups = list(fields or []), list(groups or [])
+        if not fields and not groups: return None
+        if unknown_groups := [g for g in groups if g not in self.groups]:
+            raise SubscriptionError(f"Unknown field groups: {unknown_groups}")
+        if unknown_fields := [f for f in fields if f not in self.known_fields]:
+            raise SubscriptionError(f"Unknown fields: {unknown_fields}")
+        requested = frozenset(fields).union(*(self.groups[g] for g in groups)) & self.known_fields
+        return self._interned.setdefault(requested, requested)
+
+    def describe(self) -> Dict[str, List[str]]:
+        return {name: sorted(fields & self.known_fields) for name, fields in self.groups.items()}
@@ -0,0 +1,88 @@
+# File: services/tick_scheduler.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from config.settings import TickOverrunPolicy
+
+class TickScheduler:
+    """
+    Ticks on absolute deadlines of the monotonic clock (start + n * interval), so time spent in the tick body
+    does not stretch the period. When a tick body overruns past one or more deadlines, `policy` decides:
+    SKIP drops the missed ticks and stays on the grid, CATCH_UP runs them back to back (at most `max_catch_up`).
+    """
+    RATE_WINDOW = 50  # Ticks the achieved rate is measured over
+
+    def __init__(self, interval: float, policy: TickOverrunPolicy = TickOverrunPolicy.SKIP, max_catch_up: int = 3):
+        self.interval = interval
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.ticks = 0
+        self.missed = 0    # Deadlines dropped by SKIP (or beyond max_catch_up)
+        self.overruns = 0  # Ticks that started after the following deadline had already passed
+        self._next: Optional[float] = None
+        self._tick_times: Deque[float] = deque(maxlen=self.RATE_WINDOW)
+
+    def reset(self):
+        """Starts a new grid at the next wait(), e.g. after an idle period."""
+        self._next = None
+        self._tick_times.clear()
+
+    def set_interval(self, interval: float):
+        """Changes the period from the last tick on; the next deadline moves accordingly."""
+        if self._next is not None and self._tick_times:
+            self._next = self._tick_times[-1] + interval
+        self.interval = interval
+
+    async def wait(self):
+        """Returns at the next deadline (immediately on the first call)."""
+        now = time.monotonic()
+        if self._next is None:
+            self._next = now
+        delay = self._next - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+            now = time.monotonic()
+        elif -delay >= self.interval:
+            self.overruns += 1
+            behind = int(-delay // self.interval)  # Whole deadlines already passed besides this one
+            allowed = 0 if self.policy == TickOverrunPolicy.SKIP else min(behind, self.max_catch_up)
+            self.missed += behind - allowed
+            self._next += (behind - allowed) * self.interval
+        self._next += self.interval
+        self.ticks += 1
+        self._tick_times.append(now)
+
+    def achieved_rate(self) -> Optional[float]:
+        if len(self._tick_times) < 2: return None
+        span = self._tick_times[-1] - self._tick_times[0]
+        return (len(self._tick_times) - 1) / span if span > 0 else None
+
+    def stats(self) -> Dict[str, Any]:
+        achieved = self.achieved_rate()
+        return {"interval": self.interval, "target_rate": round(1 / self.interval, 2), "achieved_rate": round(achieved, 2) if achieved else None,
+                "policy": self.policy.value, "ticks": self.ticks, "missed": self.missed, "overruns": self.overruns}
+
+class SimCadence:
+    """
+    Estimates how often BMS rewrites FlightData from the sampler's reads: the smoothed time between reads that
+    saw changed bytes, and the share of recent reads that did. Gaps over PAUSE_GAP (sim paused, in the UI) are ignored.
+    """
+    PAUSE_GAP = 1.0
+    SMOOTHING = 0.2
+
+    def __init__(self, window: int = 20):
+        self.period: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._recent: Deque[bool] = deque(maxlen=window)
+
+    def observe(self, changed: bool, now: float):
+        self._recent.append(changed)
+        if not changed: return
+        if self._last_change is not None and (gap := now - self._last_change) < self.PAUSE_GAP:
+            self.period = gap if self.period is None else self.period + self.SMOOTHING * (gap - self.period)
+        self._last_change = now
+
+    def change_ratio(self) -> Optional[float]:
+        return sum(self._recent) / len(self._recent) if len(self._recent) == self._recent.maxlen else None
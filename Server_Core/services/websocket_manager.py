@@ -0,0 +1,291 @@
+# File: services/websocket_manager.py
+import asyncio
+import itertools
+import json
+import logging
+import math
+import time
+from collections import deque
+from typing import AbstractSet, Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from services.flight_frame import FlightFrame, StreamMode
+from services.wire_formats import WireFormat, encode_json
+from services.metrics import PipelineMetrics
+from services.subscriptions import SubscriptionCatalog, SubscriptionError
+
+logger = logging.getLogger(__name__)
+
+class ConnectionStats:
+    """Per-connection delivery counters, exposed through /api/diagnostics/connections."""
+    LAG_SMOOTHING = 0.2
+
+    def __init__(self):
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.last_lag: Optional[float] = None
+        self.avg_lag: Optional[float] = None
+        self.max_lag = 0.0
+        self.last_send_duration: Optional[float] = None
+        # Filled only for clients that send {"type": "ack", "seq": N} after showing a frame.
+        self.acks = 0
+        self.frames_not_acked = 0  # Sent, but a later frame was acknowledged first: the client skipped or lost it
+        self.last_ack_latency: Optional[float] = None
+        self.avg_ack_latency: Optional[float] = None
+        self.max_ack_latency = 0.0
+
+    def record_send(self, frame: FlightFrame, size: int, started: float, finished: float):
+        # Lag = sample time -> send completed: time spent in the outbox plus the socket write.
+        lag = finished - frame.created_at
+        self.frames_sent += 1
+        self.bytes_sent += size
+        self.last_lag = lag
+        self.avg_lag = lag if self.avg_lag is None else self.avg_lag + self.LAG_SMOOTHING * (lag - self.avg_lag)
+        self.max_lag = max(self.max_lag, lag)
+        self.last_send_duration = finished - started
+
+    def record_ack(self, latency: float):
+        # Ack latency = sample time -> the client's ack arrived: end-to-end age of what the client displayed.
+        self.acks += 1
+        self.last_ack_latency = latency
+        self.avg_ack_latency = latency if self.avg_ack_latency is None else self.avg_ack_latency + self.LAG_SMOOTHING * (latency - self.avg_ack_latency)
+        self.max_ack_latency = max(self.max_ack_latency, latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        to_ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        return {
+            "connected_at": self.connected_at, "frames_sent": self.frames_sent, "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent, "last_lag_ms": to_ms(self.last_lag), "avg_lag_ms": to_ms(self.avg_lag),
+            "max_lag_ms": to_ms(self.max_lag), "last_send_duration_ms": to_ms(self.last_send_duration),
+            "acks": self.acks, "frames_not_acked": self.frames_not_acked, "last_ack_latency_ms": to_ms(self.last_ack_latency),
+            "avg_ack_latency_ms": to_ms(self.avg_ack_latency), "max_ack_latency_ms": to_ms(self.max_ack_latency),
+        }
+
+class ClientConnection:
+    """
+    A connected WebSocket client with a single-slot outbox for sampled frames.
+    A client that cannot keep up (or asked for a lower rate) skips frames: only the newest one is sent.
+    Frames need `seq` and `created_at`; render() turns one into this client's payload (see DrawingClient).
+    """
+    MAX_INTERVAL = 10.0
+    ACK_WINDOW = 64  # Sent frames remembered for matching acks
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket: WebSocket, mode: StreamMode = StreamMode.FULL, fields: Optional[AbstractSet[str]] = None, interval: float = 0.0,
+                 wire_format: WireFormat = WireFormat.JSON, metrics: Optional[PipelineMetrics] = None):
+        self.id = next(self._ids)
+        self.metrics = metrics
+        self.websocket = websocket
+        self.mode = mode
+        self.wire_format = wire_format
+        self.fields = fields  # None = every field
+        self.interval = 0.0   # Minimum seconds between frames; 0 = every sampled frame
+        self.set_interval(interval)
+        self.stats = ConnectionStats()
+        self.last_sent: Optional[FlightFrame] = None  # Base of the next delta
+        self._pending: Optional[FlightFrame] = None
+        self._control: Deque[str] = deque()
+        self._unacked: Deque[Tuple[int, float]] = deque(maxlen=self.ACK_WINDOW)  # (seq, created_at) of sent frames
+        self._wakeup = asyncio.Event()
+        self._next_frame_at = 0.0
+
+    def offer(self, frame: FlightFrame):
+        """Queues a frame for sending. An unsent older frame is replaced (and counted as dropped)."""
+        if self._pending is not None: self.stats.frames_dropped += 1
+        self._pending = frame
+        self._wakeup.set()
+
+    def offer_control(self, message: Dict[str, Any]):
+        """Queues a protocol reply. These are rare and small, so they are never dropped. Always JSON text."""
+        self._control.append(encode_json(message))
+        self._wakeup.set()
+
+    async def next_payload(self) -> Tuple[Union[str, bytes], Optional[FlightFrame]]:
+        """Waits for something to send: control replies first, then the newest frame once the client's interval allows it."""
+        while True:
+            if self._control:
+                return self._control.popleft(), None
+            now = time.monotonic()
+            if self._pending is not None and now >= self._next_frame_at:
+                frame, self._pending = self._pending, None
+                self._next_frame_at = now + self.interval
+                return self.render(frame), frame
+            self._wakeup.clear()
+            timeout = self._next_frame_at - now if self._pending is not None else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def render(self, frame: FlightFrame) -> Union[str, bytes]:
+        """Picks the wire representation this client needs for the given frame."""
+        previous, self.last_sent = self.last_sent, frame
+        started = time.perf_counter()
+        if self.mode != StreamMode.DELTA: payload = frame.encode("full", self.fields, self.wire_format)
+        elif frame.can_patch(previous): payload = frame.encode_delta(previous, self.fields, self.wire_format)
+        else: payload = frame.encode("keyframe", self.fields, self.wire_format)
+        if self.metrics: self.metrics.encode.observe(time.perf_counter() - started)
+        return payload
+
+    def sent(self, frame: FlightFrame):
+        self._unacked.append((frame.seq, frame.created_at))
+
+    def acknowledge(self, seq: int) -> Optional[float]:
+        """Matches an ack to a sent frame; returns its sample-to-ack latency, or None for an unknown or repeated seq."""
+        while self._unacked and self._unacked[0][0] < seq:
+            self._unacked.popleft()
+            self.stats.frames_not_acked += 1
+        if not self._unacked or self._unacked[0][0] != seq: return None
+        latency = time.monotonic() - self._unacked.popleft()[1]
+        self.stats.record_ack(latency)
+        return latency
+
+    def subscribe(self, fields: Optional[AbstractSet[str]]):
+        self.fields = fields
+        # The client's view of the data changed shape, so a delta client needs a fresh keyframe.
+        self.last_sent = None
+
+    def set_interval(self, interval: float):
+        interval = float(interval)
+        if not math.isfinite(interval): raise ValueError(f"Interval must be a finite number of seconds, got {interval}.")
+        self.interval = min(max(interval, 0.0), self.MAX_INTERVAL)
+        self._next_frame_at = 0.0
+
+    async def send_loop(self):
+        """Sends whatever next_payload() hands out until the socket fails."""
+        while True:
+            payload, frame = await self.next_payload()
+            started = time.monotonic()
+            if isinstance(payload, bytes): await self.websocket.send_bytes(payload)
+            else: await self.websocket.send_text(payload)
+            if frame is None: continue
+            finished = time.monotonic()
+            self.sent(frame)
+            self.stats.record_send(frame, len(payload), started, finished)
+            if self.metrics:
+                self.metrics.send.observe(finished - started)
+                self.metrics.frame_lag.observe(finished - frame.created_at)
+
+    async def receive_loop(self, handle_message: Callable[["ClientConnection", Any], None]):
+        """Parses client messages and hands them to `handle_message`; anything that is not JSON gets an error reply."""
+        while True:
+            text = await self.websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                self.offer_control({"type": "error", "error": "Messages must be JSON."})
+                continue
+            handle_message(self, message)
+
+    def describe(self) -> Dict[str, Any]:
+        address = self.websocket.client
+        return {
+            "id": self.id, "client": f"{address.host}:{address.port}" if address else None, "mode": self.mode.value,
+            "format": self.wire_format.value, "interval": self.interval, "fields": len(self.fields) if self.fields is not None else None, **self.stats.to_dict(),
+        }
+
+class WebSocketManager:
+    def __init__(self, max_connections: int, catalog: SubscriptionCatalog, metrics: Optional[PipelineMetrics] = None):
+        self.max_connections = max_connections
+        self.catalog = catalog
+        self.metrics = metrics
+        self.active_connections: List[ClientConnection] = []
+        # STATUS clients get no frames, so they neither count against max_connections (they have a limit of their
+        # own) nor keep the sampler reading; see broadcast_status.
+        self.status_clients: List[ClientConnection] = []
+        self.latest_status: Optional[Dict[str, Any]] = None
+        self._requested_fields: Optional[AbstractSet[str]] = None
+        self._requested_fields_dirty = True
+
+    async def connect(self, websocket: WebSocket, mode: StreamMode = StreamMode.FULL, fields: Optional[AbstractSet[str]] = None, interval: float = 0.0,
+                      wire_format: WireFormat = WireFormat.JSON, subprotocol: Optional[str] = None) -> Optional[ClientConnection]:
+        clients = self.status_clients if mode == StreamMode.STATUS else self.active_connections
+        if len(clients) >= self.max_connections:
+            await websocket.close(code=1008, reason="Too many connections")
+            return None
+        await websocket.accept(subprotocol=subprotocol)
+        client = ClientConnection(websocket, mode, fields, interval, wire_format, self.metrics)
+        clients.append(client)
+        if mode == StreamMode.STATUS:
+            if self.latest_status: client.offer_control(self.latest_status)
+            logger.info(f"Status WebSocket #{client.id} connected. Status connections: {len(self.status_clients)}")
+            return client
+        self._requested_fields_dirty = True
+        logger.info(f"WebSocket #{client.id} connected ({mode.value} mode, {wire_format.value}). Active connections: {len(self.active_connections)}")
+        return client
+
+    def disconnect(self, client: ClientConnection):
+        if client in self.status_clients:
+            self.status_clients.remove(client)
+            logger.info(f"Status WebSocket #{client.id} disconnected. Status connections: {len(self.status_clients)}")
+        elif client in self.active_connections:
+            self.active_connections.remove(client)
+            self._requested_fields_dirty = True
+            logger.info(f"WebSocket #{client.id} disconnected. Active connections: {len(self.active_connections)}")
+
+    def broadcast(self, frame: FlightFrame):
+        """Hands the same frame to every client. Never awaits a socket."""
+        for client in self.active_connections:
+            client.offer(frame)
+
+    def broadcast_control(self, message: Dict[str, Any]):
+        """Sends a server event (e.g. "briefing_updated") to every client, ahead of any pending frame."""
+        for client in itertools.chain(self.active_connections, self.status_clients):
+            client.offer_control(message)
+
+    def broadcast_status(self, message: Dict[str, Any]):
+        """Sends the sampler's periodic status to the STATUS clients; the newest one also greets new ones."""
+        self.latest_status = message
+        for client in self.status_clients:
+            client.offer_control(message)
+
+    def requested_fields(self) -> Optional[AbstractSet[str]]:
+        """
+        Union of all client subscriptions, i.e. what the sampler has to decode (None = everything). Extra shared memory
+        areas are not part of "everything", so if they are subscribed next to an "everything" client the union is spelled out.
+        """
+        if self._requested_fields_dirty:
+            subscriptions = [client.fields for client in self.active_connections]
+            areas = frozenset().union(*(fields & self.catalog.area_fields for fields in subscriptions if fields is not None))
+            if not subscriptions or any(fields is None for fields in subscriptions):
+                self._requested_fields = self.catalog.default_fields | areas if areas else None
+            else:
+                self._requested_fields = frozenset().union(*subscriptions)
+            self._requested_fields_dirty = False
+        return self._requested_fields
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [client.describe() for client in itertools.chain(self.active_connections, self.status_clients)]
+
+    def handle_message(self, client: ClientConnection, message: Any):
+        """Applies a client -> server protocol message."""
+        message_type = message.get("type") if isinstance(message, dict) else None
+        if message_type == "subscribe":
+            try:
+                fields = self.catalog.resolve(message.get("fields"), message.get("groups"))
+            except SubscriptionError as e:
+                client.offer_control({"type": "error", "error": str(e)})
+                return
+            client.subscribe(fields)
+            self._requested_fields_dirty = True
+            client.offer_control({"type": "subscribed", "fields": sorted(fields) if fields is not None else None})
+        elif message_type == "set_rate":
+            try:
+                client.set_interval(message.get("interval", 0.0))
+            except (TypeError, ValueError):
+                client.offer_control({"type": "error", "error": "'interval' must be a number of seconds."})
+                return
+            client.offer_control({"type": "rate", "interval": client.interval})
+        elif message_type == "ack":
+            # Optional, sent by the client once a frame is on screen. Not answered, to keep it cheap.
+            seq = message.get("seq")
+            if not isinstance(seq, int) or isinstance(seq, bool):
+                client.offer_control({"type": "error", "error": "'seq' must be the integer seq of a received frame."})
+                return
+            latency = client.acknowledge(seq)
+            if latency is not None and self.metrics: self.metrics.display_latency.observe(latency)
+        else:
+            client.offer_control({"type": "error", "error": "Unsupported message type. Expected 'subscribe', 'set_rate' or 'ack'."})
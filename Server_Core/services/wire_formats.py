@@ -0,0 +1,127 @@
+# File: services/wire_formats.py
+import json
+import logging
+import struct
+import zlib
+from enum import Enum
+from typing import AbstractSet, Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Optional binary encoders. JSON and the packed layout work without them.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+class WireFormat(str, Enum):
+    JSON = "json"        # Default: text frames, same shape as send_json
+    MSGPACK = "msgpack"  # Same messages as JSON, MessagePack-encoded (needs the msgpack package)
+    CBOR = "cbor"        # Same messages as JSON, CBOR-encoded (needs the cbor2 package)
+    PACKED = "packed"    # Fixed little-endian layout for numeric fields, decodable with a DataView
+
+    @property
+    def subprotocol(self) -> str:
+        return f"bms.{self.value}"
+
+    @property
+    def is_available(self) -> bool:
+        return not ((self == WireFormat.MSGPACK and msgpack is None) or (self == WireFormat.CBOR and cbor2 is None))
+
+def negotiate_format(requested: Optional[str], offered_subprotocols: List[str]) -> Tuple[WireFormat, Optional[str]]:
+    """
+    Picks the wire format from the `format` query parameter or, failing that, the first
+    supported `bms.<format>` WebSocket subprotocol. Returns the format and the subprotocol to accept.
+    Raises ValueError for unknown or unavailable formats.
+    """
+    if requested:
+        wire_format = WireFormat(requested)
+        if not wire_format.is_available: raise ValueError(f"Wire format '{wire_format.value}' is not installed on the server.")
+        return wire_format, (wire_format.subprotocol if wire_format.subprotocol in offered_subprotocols else None)
+    for wire_format in WireFormat:
+        if wire_format.subprotocol in offered_subprotocols and wire_format.is_available:
+            return wire_format, wire_format.subprotocol
+    return WireFormat.JSON, None
+
+def encode_json(message: Dict[str, Any]) -> str:
+    # Same encoding as Starlette's send_json.
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+def encode_message(wire_format: WireFormat, message: Dict[str, Any]) -> Union[str, bytes]:
+    if wire_format == WireFormat.JSON: return encode_json(message)
+    if wire_format == WireFormat.MSGPACK: return msgpack.packb(message, use_bin_type=True)
+    if wire_format == WireFormat.CBOR: return cbor2.dumps(message)
+    raise ValueError(f"{wire_format.value} frames are built with PackedLayout, not encode_message")
+
+# struct code -> DataView accessor name
+_DATAVIEW_TYPES = {"f": "Float32", "d": "Float64", "b": "Int8", "B": "Uint8", "?": "Uint8", "h": "Int16", "H": "Uint16",
+                   "i": "Int32", "I": "Uint32", "q": "BigInt64", "Q": "BigUint64"}
+
+class PackedLayout:
+    """
+    Fixed binary layout for one field set. A packed frame is:
+        header   : magic 'BMSP' (4 bytes), layout id (u32), seq (u32), flags (u8, bit 0 = BMS data present), 3 pad bytes,
+                   sample time (f64, Unix seconds)
+        numeric  : every numeric field in layout order, little-endian, arrays flattened row by row
+        strings  : u32 byte length + UTF-8 JSON object of the string fields
+    The offsets are published by /api/flight_data/layout; a client checks the layout id before decoding.
+    """
+    MAGIC = b"BMSP"
+    HEADER = struct.Struct("<4sIIB3xd")
+
+    def __init__(self, specs: Dict[str, Tuple[str, List[int]]]):
+        self.numeric: List[Tuple[str, int, bool]] = []  # (name, value count, is nested)
+        self.string_fields: List[str] = []
+        self.description: List[Dict[str, Any]] = []
+        codes, offset = ["<"], self.HEADER.size
+        for name, (code, dims) in specs.items():
+            if code == "s":
+                self.string_fields.append(name)
+                continue
+            count = 1
+            for dim in dims: count *= dim
+            codes.append(f"{count}{code}")
+            self.numeric.append((name, count, len(dims) > 1))
+            self.description.append({"name": name, "type": _DATAVIEW_TYPES[code], "offset": offset, "count": count, "shape": dims})
+            offset += struct.calcsize(f"<{count}{code}")
+        self._struct = struct.Struct("".join(codes))
+        self.strings_offset = offset
+        self.layout_id = zlib.crc32(encode_json({"fields": self.description, "strings": self.string_fields}).encode())
+
+    def pack(self, seq: int, data: Optional[Dict[str, Any]], sampled_at: float = 0.0) -> bytes:
+        values: List[Any] = []
+        for name, count, nested in self.numeric:
+            value = data.get(name) if data is not None else None
+            if value is None: values.extend([0] * count)  # Not sampled (no BMS data or outside the decoded subset)
+            elif nested: values.extend(v for row in value for v in row)
+            elif isinstance(value, list): values.extend(value)
+            else: values.append(value)
+        strings = encode_json({name: data[name] for name in self.string_fields if name in data}).encode() if data is not None else b"{}"
+        header = self.HEADER.pack(self.MAGIC, self.layout_id, seq & 0xFFFFFFFF, 1 if data is not None else 0, sampled_at)
+        return b"".join((header, self._struct.pack(*values), struct.pack("<I", len(strings)), strings))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "layout_id": self.layout_id, "byte_order": "little", "header_size": self.HEADER.size,
+            "header": [{"name": "magic", "type": "ascii", "offset": 0, "count": 4}, {"name": "layout_id", "type": "Uint32", "offset": 4},
+                       {"name": "seq", "type": "Uint32", "offset": 8}, {"name": "flags", "type": "Uint8", "offset": 12},
+                       {"name": "sampled_at", "type": "Float64", "offset": 16}],
+            "fields": self.description, "strings_offset": self.strings_offset, "string_fields": self.string_fields,
+        }
+
+class PackedLayouts:
+    """Builds one PackedLayout per distinct subscription set, on first use."""
+    def __init__(self, specs: Dict[str, Tuple[str, List[int]]]):
+        self.specs = specs
+        self._layouts: Dict[Optional[AbstractSet[str]], PackedLayout] = {}
+
+    def get(self, fields: Optional[AbstractSet[str]]) -> PackedLayout:
+        layout = self._layouts.get(fields)
+        if layout is None:
+            specs = self.specs if fields is None else {name: spec for name, spec in self.specs.items() if name in fields}
+            layout = self._layouts[fields] = PackedLayout(specs)
+        return layout
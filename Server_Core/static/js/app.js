@@ -11,6 +11,7 @@ class BMSBridgeApp {
             retryDelay: 1000,
             websocketReconnectDelay: 5000,
             healthCheckInterval: 15000,
+            staleDataThreshold: 3000, // ms without a status message reporting readable BMS data before the data is flagged as stale
             pdfRenderScale: 2.0 // Higher scale for better quality on high-res screens
         };
         this.init();
@@ -41,6 +42,8 @@ class BMSBridgeApp {
             healthCheckTimer: null,
             isLoading: false,
             websocketReconnectTimer: null,
+            lastDataAt: null, // When the last status message reporting readable BMS data arrived (local clock)
+            freshnessTimer: null,
             pdfLibrary: null // To store the loaded pdf.js library
         };
     }
@@ -60,6 +63,7 @@ class BMSBridgeApp {
     init() {
         this._loadPdfLibrary();
         this._startHealthCheck();
+        this._connectFlightData();
         this._setupTabNavigation();
         const firstTab = document.querySelector('.tab-button');
         if (firstTab) firstTab.click();
@@ -114,6 +118,43 @@ class BMSBridgeApp {
         this.state.isConnected = connected;
         this.elements.connectionIndicator.className = connected ? 'status-indicator connected' : 'status-indicator disconnected';
         this.elements.connectionText.textContent = connected ? 'BMS Connected' : 'BMS Disconnected';
+        if (connected) this._checkDataFreshness();
+    }
+
+    _connectFlightData() {
+        // Only used to know how fresh the data is and to hear about new briefings, so it asks for the status stream:
+        // no frames, does not count against the server's connection limit and does not keep the sampler reading.
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const ws = new WebSocket(`${protocol}://${window.location.host}/ws/flight_data?mode=status`);
+        this.state.websocket = ws;
+        ws.onmessage = (event) => {
+            let message;
+            try { message = JSON.parse(event.data); } catch (e) { return; }
+            if (message.type === 'status') {
+                if (message.bms_connected) this.state.lastDataAt = Date.now();
+            } else if (message.type === 'briefing_updated') {
+                // BMS wrote a new briefing; an open briefing tab shows it without the pilot reloading.
+                const briefingTab = document.querySelector('.tab-button[data-tab="briefing"]');
+                if (message.html && briefingTab && this.state.currentTab === 'briefing') this.loadHtmlBriefing(briefingTab);
+            }
+        };
+        ws.onclose = () => {
+            if (this.state.websocket === ws) this.state.websocket = null;
+            clearTimeout(this.state.websocketReconnectTimer);
+            this.state.websocketReconnectTimer = setTimeout(() => this._connectFlightData(), this.config.websocketReconnectDelay);
+        };
+        if (!this.state.freshnessTimer) {
+            this.state.freshnessTimer = setInterval(() => this._checkDataFreshness(), 1000);
+        }
+    }
+
+    _checkDataFreshness() {
+        if (!this.state.isConnected) return;
+        const age = this.state.lastDataAt === null ? null : Date.now() - this.state.lastDataAt;
+        const stale = age === null || age > this.config.staleDataThreshold;
+        this.elements.connectionIndicator.className = stale ? 'status-indicator stale' : 'status-indicator connected';
+        this.elements.connectionText.textContent = !stale ? 'BMS Connected'
+            : age === null ? 'BMS Connected (no live data)' : `BMS Connected (data ${Math.round(age / 1000)}s old)`;
     }
 
     _loadStateFromStorage() {
@@ -204,7 +245,7 @@ class BMSBridgeApp {
         this.showLoading('Loading Briefing...');
         
         try {
-            const response = await fetch('/api/briefing/html');
+            const response = await fetch('/api/briefing/html', { cache: 'no-cache' });
             
             if (!response.ok) {
                 const errorText = await response.text();
@@ -0,0 +1,228 @@
+# File: tests/test_snapshot_consistency.py
+"""
+BMSAdapter snapshots against a writer thread that rewrites file-backed mmaps standing in for the BMS areas.
+
+Copies made by threads of one interpreter never overlap (each slice copy runs under the GIL), so the torn-read tests
+wrap an area to let the writer land a frame exactly between the copy and its check, as BMS does from another core.
+
+Run from Server_Core:  python -m pytest tests
+"""
+import ctypes
+import mmap
+import struct
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from adapters.bms_adapter import BMSAdapter
+from adapters.flight_recorder import EXTENSION, CaptureReader
+from falcon_memreader import DrawingData, FlightData, FlightData2, StringData
+from services.recording_service import RecordingService
+from services.snapshot_consumers import SnapshotConsumers
+
+SIZES = (ctypes.sizeof(FlightData), ctypes.sizeof(FlightData2))
+
+def frame_bytes(size: int, frame: int) -> bytes:
+    """A whole area of one repeated u32 frame counter, so a copy holding more than one value is torn."""
+    return frame.to_bytes(4, "little") * (size // 4) + bytes(size % 4)
+
+def frames_in(raw: bytes) -> tuple:
+    """The frame counters found in the FlightData and in the FlightData2 part of a copy."""
+    first, second = raw[:SIZES[0] - SIZES[0] % 4], raw[SIZES[0]:SIZES[0] + SIZES[1] - SIZES[1] % 4]
+    return tuple(set(memoryview(part).cast("I")) for part in (first, second))
+
+def string_area(values: dict) -> bytes:
+    entries = b"".join(struct.pack("<2I", index, len(value)) + value + b"\0" for index, value in enumerate(values.values()))
+    return struct.pack("<3I", 1, len(values), len(entries)) + entries
+
+def drawing_area(*commands: bytes) -> bytes:
+    return struct.pack("<I", 1) + b"".join(struct.pack("<I", len(command)) + command + b"\0" for command in commands)
+
+class Writer(threading.Thread):
+    """Writes the next frame into every area, on request (write_now) or back to back until stopped (hammer)."""
+    def __init__(self, areas, hammer: bool = False):
+        super().__init__(daemon=True)
+        self.areas = areas
+        self.hammer = hammer
+        self.frame = 0
+        self.strings = None  # Replaces the StringData area on the next requested write
+        self.drawing = None  # ...and the DrawingData area
+        self._requested = threading.Event()
+        self._written = threading.Event()
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.is_set():
+            if not self.hammer:
+                if not self._requested.wait(0.05): continue
+                self._requested.clear()
+            self.frame += 1
+            for name, area in self.areas.items():
+                if name in ("strings", "drawing"):
+                    payload = getattr(self, name)
+                    if payload is not None: area[:len(payload)] = payload
+                else:
+                    area[:] = frame_bytes(len(area), self.frame)  # One memcpy per area, like BMS
+            self._written.set()
+
+    def write_now(self):
+        """Has the thread write one frame, and waits until it has."""
+        self._written.clear()
+        self._requested.set()
+        assert self._written.wait(5)
+
+    def stop(self):
+        self._stopping.set()
+        self.join(5)
+
+class WriteAfterCopy:
+    """An area whose first slice at least `min_length` long is followed by a write from the writer thread before it is returned."""
+    def __init__(self, area: mmap.mmap, writer: Writer, min_length: int = 1):
+        self.area = area
+        self.writer = writer
+        self.min_length = min_length
+        self.armed = True
+
+    @property
+    def closed(self) -> bool:
+        return self.area.closed
+
+    def close(self):
+        self.area.close()
+
+    def __len__(self):
+        return len(self.area)
+
+    def __getitem__(self, key):
+        copy = self.area[key]
+        if self.armed and len(copy) >= self.min_length:
+            self.armed = False
+            self.writer.write_now()
+        return copy
+
+@pytest.fixture
+def areas(tmp_path):
+    """File-backed mappings of FlightData, FlightData2 and StringData, frame 0 with a first set of strings."""
+    mapped, files = {}, []
+    for name, size in (("flight_data", SIZES[0]), ("flight_data_2", SIZES[1]), ("strings", StringData.area_size_max)):
+        path = tmp_path / name
+        path.write_bytes(bytes(size))
+        files.append(open(path, "r+b"))
+        mapped[name] = mmap.mmap(files[-1].fileno(), size)
+    first = string_area({"BmsExe": b"Falcon BMS.exe", "KeyFile": b"BMS - Full"})
+    mapped["strings"][:len(first)] = first
+    yield mapped
+    for area in mapped.values(): area.close()
+    for file in files: file.close()
+
+def make_adapter(areas, writer=None, wrap=()) -> BMSAdapter:
+    adapter = BMSAdapter(failure_threshold=5, reset_timeout=60)
+    for name, attribute in (("flight_data", "flight_data_area"), ("flight_data_2", "flight_data_2_area"), ("strings", "string_data_area")):
+        area = areas[name]
+        if name in wrap: area = WriteAfterCopy(area, writer, min_length=32 if name == "strings" else 1)
+        setattr(adapter, attribute, area)
+    adapter._is_connected = True  # Mapped by hand instead of by tag name
+    return adapter
+
+def test_write_during_copy_is_retried(areas):
+    writer = Writer(areas)
+    writer.start()
+    try:
+        adapter = make_adapter(areas, writer, wrap=("flight_data",))
+        snapshot = adapter.take_snapshot(frozenset())
+    finally:
+        writer.stop()
+    assert adapter.torn_reads == 1 and adapter.torn_accepted == 0
+    assert frames_in(snapshot.raw) == ({1}, {1})  # The retry copied the frame written meanwhile
+
+def test_write_during_string_copy_is_retried(areas):
+    writer = Writer(areas)
+    writer.strings = string_area({"BmsExe": b"Falcon BMS.exe", "KeyFile": b"BMS - Full", "BmsBasedir": b"D:\\Falcon BMS 4.37"})
+    writer.start()
+    try:
+        adapter = make_adapter(areas, writer, wrap=("strings",))
+        snapshot = adapter.take_snapshot(frozenset())
+    finally:
+        writer.stop()
+    assert adapter.torn_reads >= 1
+    assert snapshot.strings == {"BmsExe": "Falcon BMS.exe", "KeyFile": "BMS - Full", "BmsBasedir": "D:\\Falcon BMS 4.37"}
+    assert snapshot.strings_raw == writer.strings
+
+def test_write_during_drawing_copy_is_retried(areas):
+    areas["drawing"] = mmap.mmap(-1, DrawingData.area_size_max)
+    first = drawing_area(b"line 0 0 1 1", b"", b"")
+    areas["drawing"][:len(first)] = first
+    writer = Writer({"drawing": areas["drawing"]})
+    writer.drawing = drawing_area(b"line 0 0 2 2\ncircle 1 1 5", b"contact 3 4", b"")
+    writer.start()
+    try:
+        adapter = make_adapter(areas)
+        adapter._extra_areas["drawing"] = WriteAfterCopy(areas["drawing"], writer, min_length=16)
+        snapshot = adapter.take_snapshot(frozenset({"drawing"}))
+    finally:
+        writer.stop()
+    assert adapter.torn_reads >= 1 and adapter.torn_dropped == 0
+    assert snapshot.extra_raw["drawing"] == writer.drawing
+    assert adapter.decode_snapshot(snapshot, frozenset({"drawing"}))["drawing"]["RWR_commands"] == "contact 3 4"
+
+def test_drawing_running_past_its_area_is_dropped(areas):
+    areas["drawing"] = mmap.mmap(-1, DrawingData.area_size_max)
+    broken = struct.pack("<2I", 1, DrawingData.area_size_max)  # The first command string would run past the area
+    areas["drawing"][:len(broken)] = broken
+    adapter = make_adapter(areas)
+    adapter._extra_areas["drawing"] = areas["drawing"]
+    snapshot = adapter.take_snapshot(frozenset({"drawing"}))
+    assert "drawing" not in snapshot.extra_raw
+    assert adapter.torn_dropped == 1
+
+def test_snapshots_stay_consistent_under_a_writer_thread(areas):
+    writer = Writer(areas, hammer=True)
+    writer.start()
+    try:
+        adapter = make_adapter(areas)
+        snapshots = [adapter.take_snapshot(frozenset()) for _ in range(200)]
+    finally:
+        writer.stop()
+    assert writer.frame > 1
+    # Each area is one frame. The two areas may be a frame apart: BMS writes them one after the other, and a copy
+    # taken between those writes is stable, so no check on the reader side can tell it from a real frame.
+    assert all(len(frames) == 1 for snapshot in snapshots for frames in frames_in(snapshot.raw))
+    assert [snapshot.seq for snapshot in snapshots] == list(range(1, 201))
+    assert adapter.latest_snapshot() is snapshots[-1]
+
+def test_latest_snapshot_does_not_wait_for_the_read_lock(areas):
+    adapter = make_adapter(areas)
+    snapshot = adapter.take_snapshot(frozenset())
+    seen = []
+    with adapter._read_lock:  # As during a slow copy on the sampler's worker thread
+        reader = threading.Thread(target=lambda: seen.append(adapter.latest_snapshot()))
+        reader.start()
+        reader.join(1)
+    assert seen == [snapshot]
+    assert adapter.decode_snapshot(snapshot, frozenset({"KeyFile"})) == {"KeyFile": "BMS - Full"}
+
+def test_recorder_writes_the_snapshot_copies(areas, tmp_path):
+    adapter = make_adapter(areas)
+    recording_service = RecordingService(SnapshotConsumers(), None, tmp_path / "recordings", 0.02, 1024 * 1024)
+    recording_service.start()
+    first = adapter.take_snapshot(frozenset())
+    recording_service.record(first)
+    areas["flight_data"][:] = frame_bytes(SIZES[0], 7)
+    areas["flight_data_2"][:] = frame_bytes(SIZES[1], 7)
+    second = adapter.take_snapshot(frozenset())
+    recording_service.record(second._replace(taken_at=first.taken_at + 0.02))
+    recording_service._stop()
+
+    reader = CaptureReader(next((tmp_path / "recordings").glob(f"*{EXTENSION}")))
+    try:
+        assert reader.frame_count == 2
+        (_, raw_1, strings_offset_1), (_, raw_2, strings_offset_2) = reader.read(0), reader.read(1)
+        assert (bytes(raw_1), bytes(raw_2)) == (first.raw, second.raw)
+        assert strings_offset_1 == strings_offset_2  # StringData did not change, so it was recorded once
+        assert bytes(reader.read_strings(strings_offset_1)) == first.strings_raw
+    finally:
+        reader.close()